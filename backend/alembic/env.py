@@ -17,7 +17,8 @@ config = context.config
 
 # Interpret the config file for Python logging
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    # disable_existing_loggers=False: env.py also runs in-process from database.init_db
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 
 # Set the database URL in the alembic.ini file
 config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
@@ -25,6 +26,13 @@ config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
 # Add your model's MetaData object here for 'autogenerate' support
 target_metadata = Base.metadata
 
+def include_object(object, name, type_, reflected, compare_to):
+    # جداول فهرس البحث FTS5 (invoices_fts وجداولها الداخلية) تنشأ بـ DDL خام وليست في الـ metadata،
+    # فلا يقترح autogenerate حذفها
+    if type_ == "table" and reflected and compare_to is None and name.startswith("invoices_fts"):
+        return False
+    return True
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode."""
     url = config.get_main_option("sqlalchemy.url")
@@ -33,6 +41,8 @@ def run_migrations_offline():
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
+        render_as_batch=url.startswith("sqlite"),
     )
 
     with context.begin_transaction():
@@ -48,7 +58,11 @@ def run_migrations_online():
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # SQLite لا يدعم ALTER TABLE بالكامل، لذا تستخدم عمليات batch
+            render_as_batch=connection.dialect.name == "sqlite",
         )
 
         with context.begin_transaction():
@@ -0,0 +1,172 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from search_index import POSTGRESQL_SEARCH_DDL, SQLITE_SEARCH_DDL, SQLITE_SEARCH_TRIGGERS
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('username', sa.String(), nullable=True),
+        sa.Column('hashed_password', sa.String(), nullable=True),
+        sa.Column('full_name', sa.String(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('is_superuser', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table(
+        'clients',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('phone', sa.String(), nullable=True),
+        sa.Column('address', sa.String(), nullable=True),
+        sa.Column('tax_number', sa.String(), nullable=True, unique=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_clients_id', 'clients', ['id'])
+    op.create_index('ix_clients_name', 'clients', ['name'])
+    op.create_index('ix_clients_email', 'clients', ['email'], unique=True)
+
+    op.create_table(
+        'suppliers',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('phone', sa.String(), nullable=True),
+        sa.Column('address', sa.String(), nullable=True),
+        sa.Column('tax_number', sa.String(), nullable=True, unique=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_suppliers_id', 'suppliers', ['id'])
+    op.create_index('ix_suppliers_name', 'suppliers', ['name'])
+    op.create_index('ix_suppliers_email', 'suppliers', ['email'], unique=True)
+
+    op.create_table(
+        'items',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('code', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('unit_type', sa.String(), nullable=True),
+        sa.Column('price', sa.Float(), nullable=True),
+        sa.Column('tax_rate', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_items_id', 'items', ['id'])
+    op.create_index('ix_items_name', 'items', ['name'])
+    op.create_index('ix_items_code', 'items', ['code'], unique=True)
+
+    op.create_table(
+        'taxes',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('rate', sa.Float(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_taxes_id', 'taxes', ['id'])
+    op.create_index('ix_taxes_name', 'taxes', ['name'])
+
+    op.create_table(
+        'invoices',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('invoice_number', sa.String(), nullable=True),
+        sa.Column('client_name', sa.String(), nullable=True),
+        sa.Column('client_email', sa.String(), nullable=True),
+        sa.Column('client_phone', sa.String(), nullable=True),
+        sa.Column('client_address', sa.String(), nullable=True),
+        sa.Column('client_type', sa.String(), nullable=True),
+        sa.Column('client_tax_number', sa.String(), nullable=True),
+        sa.Column('issue_date', sa.DateTime(), nullable=True),
+        sa.Column('due_date', sa.DateTime(), nullable=True),
+        sa.Column('amount', sa.Float(), nullable=True),
+        sa.Column('tax_amount', sa.Float(), nullable=True),
+        sa.Column('total_amount', sa.Float(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('payment_method', sa.String(), nullable=True),
+        sa.Column('notes', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('client_id', sa.Integer(), sa.ForeignKey('clients.id'), nullable=True),
+        sa.Column('supplier_id', sa.Integer(), sa.ForeignKey('suppliers.id'), nullable=True),
+        sa.Column('eta_submission_id', sa.String(), nullable=True, unique=True),
+        sa.Column('eta_status', sa.String(), nullable=True),
+        sa.Column('eta_response', sa.JSON(), nullable=True),
+        sa.Column('eta_submission_date', sa.DateTime(), nullable=True),
+        sa.Column('eta_validation_date', sa.DateTime(), nullable=True),
+        sa.Column('eta_cancellation_date', sa.DateTime(), nullable=True),
+        sa.Column('eta_cancellation_reason', sa.String(), nullable=True),
+        sa.Column('activity_code', sa.String(), nullable=True),
+    )
+    op.create_index('ix_invoices_id', 'invoices', ['id'])
+    op.create_index('ix_invoices_invoice_number', 'invoices', ['invoice_number'], unique=True)
+    op.create_index('ix_invoices_client_name', 'invoices', ['client_name'])
+
+    op.create_table(
+        'invoice_items',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('invoice_id', sa.Integer(), sa.ForeignKey('invoices.id'), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('item_code', sa.String(), nullable=True),
+        sa.Column('item_type', sa.String(), nullable=True),
+        sa.Column('unit_type', sa.String(), nullable=True),
+        sa.Column('quantity', sa.Float(), nullable=True),
+        sa.Column('unit_price', sa.Float(), nullable=True),
+        sa.Column('total', sa.Float(), nullable=True),
+        sa.Column('discount_rate', sa.Float(), nullable=True),
+        sa.Column('discount_amount', sa.Float(), nullable=True),
+        sa.Column('tax_rate', sa.Float(), nullable=True),
+        sa.Column('tax_amount', sa.Float(), nullable=True),
+    )
+    op.create_index('ix_invoice_items_id', 'invoice_items', ['id'])
+
+    # فهرس البحث النصي
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        for statement in POSTGRESQL_SEARCH_DDL:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in SQLITE_SEARCH_TRIGGERS:
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS invoices_fts')
+
+    op.drop_table('invoice_items')
+    op.drop_table('invoices')
+    op.drop_table('taxes')
+    op.drop_table('items')
+    op.drop_table('suppliers')
+    op.drop_table('clients')
+    op.drop_table('users')
@@ -0,0 +1,27 @@
+"""composite indexes for hot invoice queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # قائمة الفواتير للمستخدم مع تصفية الحالة
+    op.create_index('ix_invoices_user_status', 'invoices', ['user_id', 'status'])
+    # فواتير المستخدم ضمن فترة زمنية
+    op.create_index('ix_invoices_user_issue_date', 'invoices', ['user_id', 'issue_date'])
+
+
+def downgrade():
+    op.drop_index('ix_invoices_user_issue_date', table_name='invoices')
+    op.drop_index('ix_invoices_user_status', table_name='invoices')
@@ -0,0 +1,49 @@
+"""invoice daily rollups for the dashboard summary
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'invoice_daily_rollups',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('eta_status', sa.String(), nullable=False),
+        sa.Column('invoice_count', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('tax_amount', sa.Float(), nullable=False),
+        sa.Column('total_amount', sa.Float(), nullable=False),
+        sa.UniqueConstraint('user_id', 'day', 'status', 'eta_status', name='uq_invoice_daily_rollups_key'),
+    )
+    op.create_index('ix_invoice_daily_rollups_id', 'invoice_daily_rollups', ['id'])
+
+    # تعبئة الملخص من الفواتير الموجودة
+    day = 'date(issue_date)' if op.get_bind().dialect.name == 'sqlite' else 'CAST(issue_date AS DATE)'
+    op.execute(
+        "INSERT INTO invoice_daily_rollups "
+        "(user_id, day, status, eta_status, invoice_count, amount, tax_amount, total_amount) "
+        f"SELECT user_id, {day}, coalesce(status, ''), coalesce(eta_status, ''), count(*), "
+        "coalesce(sum(amount), 0), coalesce(sum(tax_amount), 0), coalesce(sum(total_amount), 0) "
+        "FROM invoices WHERE user_id IS NOT NULL AND issue_date IS NOT NULL "
+        f"GROUP BY user_id, {day}, coalesce(status, ''), coalesce(eta_status, '')"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_invoice_daily_rollups_id', table_name='invoice_daily_rollups')
+    op.drop_table('invoice_daily_rollups')
@@ -0,0 +1,28 @@
+"""invoice version column for ETags and change feeds
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    op.create_index('ix_invoices_user_updated_at', 'invoices', ['user_id', 'updated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_invoices_user_updated_at', table_name='invoices')
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,61 @@
+"""store money columns as integer piastres
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from search_index import restore_sqlite_search_triggers
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+MONEY_COLUMNS = {
+    'invoices': ['amount', 'tax_amount', 'total_amount'],
+    'invoice_items': ['total', 'discount_amount', 'tax_amount'],
+    'invoice_daily_rollups': ['amount', 'tax_amount', 'total_amount'],
+}
+
+def upgrade():
+    for table, columns in MONEY_COLUMNS.items():
+        # التحويل إلى قروش قبل تغيير النوع حتى لا تضيع الكسور
+        op.execute(
+            f"UPDATE {table} SET "
+            + ", ".join(f"{column} = ROUND({column} * 100)" for column in columns)
+        )
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(
+                    column,
+                    type_=sa.BigInteger(),
+                    existing_type=sa.Float(),
+                    postgresql_using=f"{column}::bigint",
+                )
+    # batch_alter_table يعيد إنشاء جدول invoices على SQLite فتضيع triggers فهرس البحث
+    restore_sqlite_search_triggers(op)
+
+
+def downgrade():
+    for table, columns in MONEY_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(
+                    column,
+                    type_=sa.Float(),
+                    existing_type=sa.BigInteger(),
+                    postgresql_using=f"{column}::double precision",
+                )
+        op.execute(
+            f"UPDATE {table} SET "
+            + ", ".join(f"{column} = {column} / 100.0" for column in columns)
+        )
+    # batch_alter_table يعيد إنشاء جدول invoices على SQLite فتضيع triggers فهرس البحث
+    restore_sqlite_search_triggers(op)
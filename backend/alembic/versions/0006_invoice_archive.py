@@ -0,0 +1,58 @@
+"""partitioned invoice archive tier
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite: جداول الفترات و view الأرشيف تنشئها خدمة الأرشفة عند الحاجة
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.create_table(
+        'invoices_archive',
+        sa.Column('invoice_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('invoice_number', sa.String(), nullable=False),
+        sa.Column('client_name', sa.String()),
+        sa.Column('client_tax_number', sa.String()),
+        sa.Column('issue_date', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String()),
+        sa.Column('eta_status', sa.String()),
+        sa.Column('eta_submission_id', sa.String()),
+        sa.Column('amount', sa.BigInteger()),
+        sa.Column('tax_amount', sa.BigInteger()),
+        sa.Column('total_amount', sa.BigInteger()),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('invoice_id', 'issue_date'),
+        postgresql_partition_by='RANGE (issue_date)',
+    )
+    op.create_index('ix_invoices_archive_user_issue_date', 'invoices_archive', ['user_id', 'issue_date'])
+    op.create_index('ix_invoices_archive_invoice_number', 'invoices_archive', ['invoice_number'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # جداول الفترات التي أنشأتها خدمة الأرشفة
+        partitions = bind.execute(sa.text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'invoices_archive_p%'"
+        )).scalars().all()
+        op.execute("DROP VIEW IF EXISTS invoices_archive")
+        for name in partitions:
+            op.drop_table(name)
+        return
+    op.drop_table('invoices_archive')
@@ -0,0 +1,115 @@
+"""move raw ETA responses to the eta_events table
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+import json
+import zlib
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+from search_index import restore_sqlite_search_triggers
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+invoices = sa.table(
+    'invoices',
+    sa.column('id', sa.Integer()),
+    sa.column('eta_status', sa.String()),
+    sa.column('eta_response', sa.JSON()),
+    sa.column('eta_submission_date', sa.DateTime()),
+    sa.column('updated_at', sa.DateTime()),
+)
+
+eta_events = sa.table(
+    'eta_events',
+    sa.column('id', sa.Integer()),
+    sa.column('invoice_id', sa.Integer()),
+    sa.column('event_type', sa.String()),
+    sa.column('status', sa.String()),
+    sa.column('created_at', sa.DateTime()),
+    sa.column('payload', sa.LargeBinary()),
+)
+
+def upgrade():
+    op.create_table(
+        'eta_events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('invoice_id', sa.Integer(), sa.ForeignKey('invoices.id'), nullable=False),
+        sa.Column('event_type', sa.String(), nullable=False),
+        sa.Column('status', sa.String()),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+    )
+    op.create_index('ix_eta_events_id', 'eta_events', ['id'])
+    op.create_index('ix_eta_events_invoice_id', 'eta_events', ['invoice_id'])
+
+    # نقل الردود الموجودة كحدث واحد لكل فاتورة
+    bind = op.get_bind()
+    result = bind.execute(
+        sa.select(
+            invoices.c.id, invoices.c.eta_status, invoices.c.eta_response,
+            invoices.c.eta_submission_date, invoices.c.updated_at,
+        ).where(invoices.c.eta_response.isnot(None)).execution_options(stream_results=True)
+    )
+    while True:
+        rows = result.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        events = [
+            {
+                'invoice_id': row.id,
+                'event_type': 'error' if row.eta_status == 'error' else 'submission',
+                'status': row.eta_status,
+                'created_at': row.eta_submission_date or row.updated_at or datetime.utcnow(),
+                'payload': zlib.compress(json.dumps(row.eta_response, ensure_ascii=False).encode('utf-8'), 6),
+            }
+            for row in rows
+            if row.eta_response is not None
+        ]
+        if events:
+            bind.execute(eta_events.insert(), events)
+
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.drop_column('eta_response')
+    # batch_alter_table يعيد إنشاء جدول invoices على SQLite فتضيع triggers فهرس البحث
+    restore_sqlite_search_triggers(op)
+
+
+def downgrade():
+    with op.batch_alter_table('invoices') as batch_op:
+        batch_op.add_column(sa.Column('eta_response', sa.JSON(), nullable=True))
+    # batch_alter_table يعيد إنشاء جدول invoices على SQLite فتضيع triggers فهرس البحث
+    restore_sqlite_search_triggers(op)
+
+    # استعادة آخر رد لكل فاتورة
+    bind = op.get_bind()
+    latest = (
+        sa.select(sa.func.max(eta_events.c.id))
+        .group_by(eta_events.c.invoice_id)
+        .scalar_subquery()
+    )
+    rows = bind.execute(
+        sa.select(eta_events.c.invoice_id, eta_events.c.payload).where(eta_events.c.id.in_(latest))
+    ).fetchall()
+    for row in rows:
+        bind.execute(
+            invoices.update().where(invoices.c.id == row.invoice_id).values(
+                eta_response=json.loads(zlib.decompress(row.payload).decode('utf-8'))
+            )
+        )
+
+    op.drop_index('ix_eta_events_invoice_id', table_name='eta_events')
+    op.drop_index('ix_eta_events_id', table_name='eta_events')
+    op.drop_table('eta_events')
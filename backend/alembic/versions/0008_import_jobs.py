@@ -0,0 +1,46 @@
+"""import jobs with resumable checkpoints
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'import_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('file_name', sa.String()),
+        sa.Column('file_path', sa.String(), nullable=False),
+        sa.Column('file_hash', sa.String(64), nullable=False),
+        sa.Column('file_type', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('last_row', sa.Integer(), nullable=False),
+        sa.Column('invoices_imported', sa.Integer(), nullable=False),
+        sa.Column('invoices_skipped', sa.Integer(), nullable=False),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_import_jobs_id', 'import_jobs', ['id'])
+    op.create_index('ix_import_jobs_user_id', 'import_jobs', ['user_id'])
+    op.create_index('ix_import_jobs_file_hash', 'import_jobs', ['file_hash'])
+
+
+def downgrade():
+    op.drop_index('ix_import_jobs_file_hash', table_name='import_jobs')
+    op.drop_index('ix_import_jobs_user_id', table_name='import_jobs')
+    op.drop_index('ix_import_jobs_id', table_name='import_jobs')
+    op.drop_table('import_jobs')
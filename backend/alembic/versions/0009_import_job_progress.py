@@ -0,0 +1,34 @@
+"""import job progress columns
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+COUNTER_COLUMNS = ['start_row', 'error_count', 'eta_submitted', 'eta_failed']
+
+
+def upgrade():
+    op.add_column('import_jobs', sa.Column('file_size', sa.Integer(), nullable=True))
+    op.add_column('import_jobs', sa.Column('started_at', sa.DateTime(), nullable=True))
+    for column in COUNTER_COLUMNS:
+        op.add_column('import_jobs', sa.Column(column, sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('import_jobs') as batch_op:
+        for column in reversed(COUNTER_COLUMNS):
+            batch_op.drop_column(column)
+        batch_op.drop_column('started_at')
+        batch_op.drop_column('file_size')
@@ -0,0 +1,28 @@
+"""submit imported invoices to ETA from the import job
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'import_jobs',
+        sa.Column('submit_to_eta', sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('import_jobs') as batch_op:
+        batch_op.drop_column('submit_to_eta')
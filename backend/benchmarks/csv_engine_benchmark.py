@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+قياس سرعة قراءة ملفات CSV الكبيرة عند الاستيراد
+
+ينشئ ملف مبيعات بعدد كبير من الصفوف (مليونا صف افتراضيًا)، ثم يقارن بين محركي
+ExcelImportService._read_csv:
+- pandas: pd.read_csv بأنواع نصية صريحة واستنتاج نوع الأعمدة الرقمية
+- pyarrow: تحليل متعدد الـ threads بأنواع أعمدة صريحة من تعيين الأعمدة
+
+ولكل محرك يقيس زمن التحليل وزمن التجميع بعده (نوع الأعمدة الناتج يؤثر على التجميع).
+
+pyarrow غير مضمنة في requirements.txt؛ ثبتها (pip install pyarrow) لقياس محرك Arrow.
+
+الاستخدام (من مجلد backend):
+    python benchmarks/csv_engine_benchmark.py --rows 2000000 --items-per-invoice 5
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings  # noqa: E402
+from import_grouping_benchmark import write_sample_file  # noqa: E402
+from services.excel_import_service import ExcelImportService  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="قياس سرعة قراءة ملفات CSV عند الاستيراد")
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--items-per-invoice", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3, help="عدد مرات التكرار لكل محرك (يؤخذ الأسرع)")
+    args = parser.parse_args()
+
+    service = ExcelImportService()
+    with tempfile.TemporaryDirectory(prefix="csv-bench-") as tmp_dir:
+        path = os.path.join(tmp_dir, "sales.csv")
+        write_sample_file(path, args.rows, args.items_per_invoice)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"file: {args.rows} rows, {size_mb:.1f} MB")
+
+        print(f"{'engine':<8} {'parse s':>9} {'group s':>9} {'total s':>9} {'rows/s':>11} {'invoices':>9}")
+        for engine in ("pandas", "pyarrow"):
+            settings.IMPORT_CSV_ENGINE = engine
+            try:
+                service._csv_engine()
+            except ValueError as e:
+                print(f"{engine:<8} skipped: {e}")
+                continue
+
+            best = None
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                df = service._read_csv(path, "sales")
+                parsed = time.perf_counter()
+                actual_mapping = service._map_columns(df, service._get_column_mapping("sales"))
+                invoices = service._group_items_by_invoice(df, actual_mapping, "sales")
+                grouped = time.perf_counter()
+                run = (parsed - started, grouped - parsed, len(invoices))
+                if best is None or sum(run[:2]) < sum(best[:2]):
+                    best = run
+                del df, invoices
+
+            parse, group, count = best
+            total = parse + group
+            print(f"{engine:<8} {parse:>9.2f} {group:>9.2f} {total:>9.2f} {args.rows / total:>11.0f} {count:>9}")
+
+
+if __name__ == "__main__":
+    main()
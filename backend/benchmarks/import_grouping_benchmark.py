@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+قياس سرعة تجميع بنود الفواتير عند الاستيراد
+
+ينشئ ملف CSV بعدد كبير من الصفوف (100 ألف افتراضيًا)، ثم يقارن بين:
+- legacy: التجميع القديم (groupby ثم iterrows مع float() لكل قيمة)
+- columnar: ExcelImportService._group_items_by_invoice الحالي (معالجة على مستوى الأعمدة)
+
+الاستخدام (من مجلد backend):
+    python benchmarks/import_grouping_benchmark.py --rows 100000 --items-per-invoice 5
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from services.excel_import_service import ExcelImportService  # noqa: E402
+
+
+def write_sample_file(path: str, rows: int, items_per_invoice: int) -> None:
+    """إنشاء ملف مبيعات بالأعمدة العربية الافتراضية"""
+    invoice_index = [i // items_per_invoice for i in range(rows)]
+    pd.DataFrame({
+        'رقم الفاتورة': [f"INV-{i:07d}" for i in invoice_index],
+        'تاريخ الإصدار': ['2025-05-17'] * rows,
+        'اسم العميل': [f"عميل {i % 1000}" for i in invoice_index],
+        'الرقم الضريبي للعميل': [f"{100000000 + i % 1000}" for i in invoice_index],
+        'عنوان العميل': ['القاهرة'] * rows,
+        'وصف المنتج': [f"منتج {i % 50}" for i in range(rows)],
+        'كود المنتج': [f"SKU{i % 50:03d}" for i in range(rows)],
+        'الكمية': [(i % 7) + 1 for i in range(rows)],
+        'سعر الوحدة': [100.5] * rows,
+        'الخصم': [0] * rows,
+        'نسبة الضريبة': [14] * rows,
+        'الإجمالي': [114.57] * rows,
+    }).to_csv(path, index=False)
+
+
+def legacy_group(df: pd.DataFrame, actual_mapping: dict) -> list:
+    """نسخة من التجميع القديم (فرع المبيعات) للمقارنة فقط"""
+    invoices = []
+    for invoice_number, group in df.groupby(actual_mapping['invoice_number']):
+        invoice = {'invoice_number': invoice_number}
+        first_row = group.iloc[0]
+        for field in ['issue_date', 'client_name', 'client_tax_number', 'client_address']:
+            if field in actual_mapping and actual_mapping[field] in first_row:
+                invoice[field] = first_row[actual_mapping[field]]
+        invoice['items'] = []
+        for _, row in group.iterrows():
+            item = {}
+            for field in ['item_description', 'item_code', 'quantity', 'unit_price', 'discount', 'tax_rate', 'total']:
+                if field in actual_mapping and actual_mapping[field] in row:
+                    item[field] = row[actual_mapping[field]]
+            for numeric_field in ['quantity', 'unit_price', 'discount', 'tax_rate']:
+                if numeric_field in item:
+                    try:
+                        item[numeric_field] = float(item[numeric_field])
+                    except (ValueError, TypeError):
+                        item[numeric_field] = 0
+            invoice['items'].append(item)
+        invoices.append(invoice)
+    return invoices
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="قياس سرعة تجميع بنود الفواتير")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--items-per-invoice", type=int, default=5)
+    parser.add_argument("--skip-legacy", action="store_true", help="عدم تشغيل التجميع القديم (بطيء جدًا)")
+    args = parser.parse_args()
+
+    service = ExcelImportService()
+    with tempfile.TemporaryDirectory(prefix="import-bench-") as tmp_dir:
+        path = os.path.join(tmp_dir, "sales.csv")
+        write_sample_file(path, args.rows, args.items_per_invoice)
+        df = pd.read_csv(path)
+
+    actual_mapping = service._map_columns(df, service._get_column_mapping('sales'))
+
+    print(f"{'mode':<10} {'rows':>8} {'invoices':>9} {'seconds':>9} {'rows/s':>11}")
+    modes = [("columnar", lambda: service._group_items_by_invoice(df, actual_mapping, 'sales'))]
+    if not args.skip_legacy:
+        modes.insert(0, ("legacy", lambda: legacy_group(df, actual_mapping)))
+    for mode, group in modes:
+        started = time.perf_counter()
+        invoices = group()
+        elapsed = time.perf_counter() - started
+        print(f"{mode:<10} {len(df):>8} {len(invoices):>9} {elapsed:>9.2f} {len(df) / elapsed:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+قياس إنتاجية تسجيل الدخول وتأثير bcrypt على حلقة الأحداث
+
+يقارن بين التحقق المباشر من كلمة المرور داخل حلقة الأحداث (authenticate_user)
+والتحقق عبر مجموعة الخيوط (authenticate_user_async)، ويقيس لكل منهما:
+- عدد عمليات تسجيل الدخول في الثانية
+- أقصى تأخير لحلقة الأحداث (المدة التي تعطلت فيها بقية الطلبات)
+
+الاستخدام (من مجلد backend):
+    python benchmarks/login_benchmark.py --logins 200 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# استخدام قاعدة بيانات مؤقتة منفصلة عن قاعدة بيانات التطبيق
+_db_dir = tempfile.mkdtemp(prefix="login-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import models  # noqa: E402
+import security  # noqa: E402
+
+USERNAME = "bench_user"
+PASSWORD = "bench-password"
+
+
+def setup_database() -> None:
+    """إنشاء الجداول ومستخدم الاختبار"""
+    database.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        db.add(models.User(
+            email="bench@example.com",
+            username=USERNAME,
+            hashed_password=security.get_password_hash(PASSWORD),
+            full_name="Benchmark User",
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _monitor_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """قياس أقصى تأخير لحلقة الأحداث أثناء التشغيل"""
+    max_lag = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, time.perf_counter() - started - interval)
+    return max_lag
+
+
+async def run_mode(mode: str, logins: int, concurrency: int) -> dict:
+    """تشغيل عدد من عمليات تسجيل الدخول المتزامنة بأحد الوضعين (inline أو pool)"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login_once() -> None:
+        async with semaphore:
+            if mode == "inline":
+                db = database.SessionLocal()
+                try:
+                    user = security.authenticate_user(db, USERNAME, PASSWORD)
+                finally:
+                    db.close()
+            else:
+                user = await security.authenticate_user_async(USERNAME, PASSWORD)
+            assert user, "فشل تسجيل الدخول أثناء القياس"
+
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_monitor_loop_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(login_once() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    max_lag = await monitor
+
+    return {
+        "mode": mode,
+        "logins": logins,
+        "seconds": elapsed,
+        "logins_per_second": logins / elapsed,
+        "max_loop_lag_ms": max_lag * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="قياس إنتاجية تسجيل الدخول")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_database()
+    print(f"bcrypt rounds={security.settings.BCRYPT_ROUNDS} workers={security.settings.PASSWORD_HASH_WORKERS}")
+    print(f"{'mode':<8} {'logins':>7} {'seconds':>9} {'logins/s':>10} {'max loop lag (ms)':>18}")
+    for mode in ("inline", "pool"):
+        result = asyncio.run(run_mode(mode, args.logins, args.concurrency))
+        print(
+            f"{result['mode']:<8} {result['logins']:>7} {result['seconds']:>9.2f} "
+            f"{result['logins_per_second']:>10.1f} {result['max_loop_lag_ms']:>18.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+قياس زمن الإقلاع البارد للواجهة الخلفية
+
+يشغل عملية Python جديدة في كل مرة (كما يحدث عند إعادة تشغيل عامل uvicorn) ويقيس:
+- زمن استيراد main (تحميل التطبيق)
+- زمن init_db (فحص إصدار المخطط) على قاعدة بيانات محدثة
+- هل تم استيراد المكتبات الثقيلة (pandas, matplotlib, seaborn) أثناء الإقلاع
+
+الاستخدام (من مجلد backend):
+    python benchmarks/startup_benchmark.py --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# يعمل داخل العملية الفرعية ويطبع النتائج كـ JSON
+CHILD_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+import database
+database.init_db()
+initialized = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "init_db_ms": (initialized - imported) * 1000,
+    "heavy_modules": sorted(m for m in ("pandas", "matplotlib", "seaborn") if m in sys.modules),
+}))
+"""
+
+
+def run_child(env: dict) -> dict:
+    """تشغيل عملية إقلاع واحدة وإرجاع قياساتها"""
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT],
+        cwd=BACKEND_DIR,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="قياس زمن الإقلاع البارد")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix="startup-bench-")
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    env.setdefault("SECRET_KEY", "benchmark-secret")
+    # قاعدة بيانات مؤقتة بعملية واحدة، فيمكن تطبيق الترحيلات عند الإقلاع الأول
+    env["AUTO_MIGRATE"] = "True"
+
+    # التشغيل الأول يطبق الترحيلات على قاعدة البيانات الفارغة ولا يدخل في القياس
+    first = run_child(env)
+    print(f"first boot (with migrations): import={first['import_ms']:.0f}ms init_db={first['init_db_ms']:.0f}ms")
+
+    results = [run_child(env) for _ in range(args.runs)]
+    for key in ("import_ms", "init_db_ms"):
+        values = [result[key] for result in results]
+        print(
+            f"{key:<12} median={statistics.median(values):8.1f}  "
+            f"min={min(values):8.1f}  max={max(values):8.1f}"
+        )
+    heavy = sorted({module for result in results for module in result["heavy_modules"]})
+    print(f"heavy modules loaded at startup: {', '.join(heavy) if heavy else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
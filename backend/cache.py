@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# قيمة مميزة للتفريق بين "غير موجود" والقيمة None
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    ذاكرة تخزين مؤقت داخل العملية بمدة صلاحية وحد أقصى للعناصر
+
+    آمنة للاستخدام من عدة خيوط، وتحذف أقدم العناصر استخدامًا (LRU) عند
+    امتلائها، وتحتفظ بعدادات الإصابة والإخفاق لأغراض المراقبة.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        """
+        تهيئة الذاكرة المؤقتة
+
+        Args:
+            ttl_seconds: مدة صلاحية العنصر بالثواني
+            max_entries: الحد الأقصى لعدد العناصر المخزنة
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        قراءة عنصر من الذاكرة المؤقتة
+
+        Returns:
+            القيمة المخزنة، أو default إذا لم تكن موجودة أو انتهت صلاحيتها
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        تخزين عنصر في الذاكرة المؤقتة
+
+        Args:
+            key: المفتاح
+            value: القيمة
+            ttl_seconds: مدة صلاحية خاصة بهذا العنصر (اختياري)
+        """
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """حذف عنصر من الذاكرة المؤقتة إن وجد"""
+        with self._lock:
+            if self._data.pop(key, _MISSING) is not _MISSING:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """حذف جميع العناصر"""
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        الحصول على إحصائيات الذاكرة المؤقتة
+
+        Returns:
+            قاموس يحتوي على عدد الإصابات والإخفاقات ونسبة الإصابة والحجم الحالي
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
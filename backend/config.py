@@ -8,6 +8,35 @@ load_dotenv()
 class Settings(BaseSettings):
     # Database settings
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+    # Off by default: with several workers each one would run the upgrade at startup and race the others
+    AUTO_MIGRATE: bool = os.getenv("AUTO_MIGRATE", "False").lower() == "true"
+    
+    # SQLite production profile (WAL, pragmas, single writer + reader pool)
+    SQLITE_TUNED: bool = os.getenv("SQLITE_TUNED", "True").lower() == "true"
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    SQLITE_READ_POOL_SIZE: int = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+    
+    # Connection pool settings (PostgreSQL; the timeout also applies to the SQLite pools)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    
+    # Read replica settings (comma-separated URLs; empty = read from the primary)
+    DATABASE_REPLICA_URLS: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+    REPLICA_HEALTH_CHECK_SECONDS: float = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "10"))
+    REPLICA_STICKY_SECONDS: float = float(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+    
+    # Archive settings (closed, ETA-validated invoices older than the retention window)
+    ARCHIVE_RETENTION_DAYS: int = int(os.getenv("ARCHIVE_RETENTION_DAYS", "730"))
+    ARCHIVE_BATCH_SIZE: int = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+    ARCHIVE_INVOICE_STATUSES: str = os.getenv("ARCHIVE_INVOICE_STATUSES", "paid,closed,cancelled")
+    ARCHIVE_ETA_STATUSES: str = os.getenv("ARCHIVE_ETA_STATUSES", "Valid,Cancelled")
+    ARCHIVE_RUN_STALE_SECONDS: int = int(os.getenv("ARCHIVE_RUN_STALE_SECONDS", "600"))  # a "running" archive with no finished batch for this long can be reclaimed
     
     # JWT settings
     SECRET_KEY: str = os.getenv("SECRET_KEY", "")
@@ -15,6 +44,28 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
     
+    # Authentication cache settings
+    AUTH_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+    
+    # Password hashing settings
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+    
+    # Server-sent events settings
+    SSE_HEARTBEAT_SECONDS: int = int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+    SSE_QUEUE_SIZE: int = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+    
+    # Import settings
+    IMPORT_CHUNK_ROWS: int = int(os.getenv("IMPORT_CHUNK_ROWS", "5000"))
+    IMPORT_WORKERS: int = int(os.getenv("IMPORT_WORKERS", "0"))  # 0 = one process per CPU core
+    IMPORT_DB_BATCH_SIZE: int = int(os.getenv("IMPORT_DB_BATCH_SIZE", "1000"))  # invoices per insert transaction
+    IMPORT_CSV_ENGINE: str = os.getenv("IMPORT_CSV_ENGINE", "auto")  # auto, pyarrow or pandas
+    IMPORT_UPLOAD_DIR: str = os.getenv("IMPORT_UPLOAD_DIR", "./uploads/imports")
+    IMPORT_UPLOAD_CHUNK_BYTES: int = int(os.getenv("IMPORT_UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+    IMPORT_JOB_WORKERS: int = int(os.getenv("IMPORT_JOB_WORKERS", "4"))  # concurrent background imports
+    IMPORT_JOB_STALE_SECONDS: int = int(os.getenv("IMPORT_JOB_STALE_SECONDS", "600"))  # a "running" job with no checkpoint for this long can be reclaimed
+    
     # Email settings
     SMTP_TLS: bool = os.getenv("SMTP_TLS", "True").lower() == "true"
     SMTP_PORT: int = int(os.getenv("SMTP_PORT", "587"))
@@ -28,12 +79,24 @@ class Settings(BaseSettings):
     COMPANY_PHONE: str = os.getenv("COMPANY_PHONE", "")
     COMPANY_EMAIL: str = os.getenv("COMPANY_EMAIL", "")
     COMPANY_TAX_NUMBER: str = os.getenv("COMPANY_TAX_NUMBER", "")
+    # Issuer address and activity code sent with every ETA document
+    COMPANY_BRANCH_ID: str = os.getenv("COMPANY_BRANCH_ID", "0")
+    COMPANY_GOVERNATE: str = os.getenv("COMPANY_GOVERNATE", "")
+    COMPANY_CITY: str = os.getenv("COMPANY_CITY", "")
+    COMPANY_STREET: str = os.getenv("COMPANY_STREET", "")
+    COMPANY_BUILDING_NUMBER: str = os.getenv("COMPANY_BUILDING_NUMBER", "")
+    DEFAULT_ACTIVITY_CODE: str = os.getenv("DEFAULT_ACTIVITY_CODE", "")
     
     # ETA Settings
     ETA_API_URL: str = os.getenv("ETA_API_URL", "https://api.eta.gov.eg")
     ETA_CLIENT_ID: str = os.getenv("ETA_CLIENT_ID", "")
     ETA_CLIENT_SECRET: str = os.getenv("ETA_CLIENT_SECRET", "")
     ETA_ENVIRONMENT: str = os.getenv("ETA_ENVIRONMENT", "production")  # production or testing
+    # Import-to-ETA pipeline: bulk submissions are cut by document count or payload size, whichever comes first
+    ETA_BULK_MAX_DOCUMENTS: int = int(os.getenv("ETA_BULK_MAX_DOCUMENTS", "100"))
+    ETA_BULK_MAX_BYTES: int = int(os.getenv("ETA_BULK_MAX_BYTES", str(8 * 1024 * 1024)))
+    ETA_IMPORT_QUEUE_SIZE: int = int(os.getenv("ETA_IMPORT_QUEUE_SIZE", "500"))  # prepared documents buffered ahead of the submitter
+    ETA_BATCH_LINGER_SECONDS: float = float(os.getenv("ETA_BATCH_LINGER_SECONDS", "2"))  # send a partial batch when the reader falls behind
     
     # Invoice Settings
     DEFAULT_CURRENCY: str = os.getenv("DEFAULT_CURRENCY", "EGP")
@@ -1,28 +1,346 @@
-from sqlalchemy import create_engine
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from fastapi import Request
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.pool import QueuePool
 from config import settings
 
-# Create SQLite database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _is_sqlite_file(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and url.rstrip("/") not in ("sqlite:", "sqlite://")
+
+def _sqlite_pragmas(read_only: bool):
+    def apply(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            # WAL يسمح للقراء بالعمل بالتوازي مع الكاتب، ويبقى مفعلًا في ملف قاعدة البيانات
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return apply
+
+def create_database_engine(url: str, read_only: bool = False):
+    """Create an engine tuned for the backend behind ``url``"""
+    if _is_sqlite_file(url) and settings.SQLITE_TUNED:
+        # Production SQLite profile: one writer connection (writes queue in the pool instead of
+        # failing with "database is locked") and a pool of query-only reader connections.
+        # Write sessions must not stay checked out across slow work (bcrypt, ETA calls)
+        sqlite_engine = create_engine(
+            url,
+            connect_args={
+                "check_same_thread": False,
+                "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+            },
+            poolclass=QueuePool,
+            pool_size=settings.SQLITE_READ_POOL_SIZE if read_only else 1,
+            max_overflow=0,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+        event.listen(sqlite_engine, "connect", _sqlite_pragmas(read_only=read_only))
+        return sqlite_engine
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False})
+    # PostgreSQL (and other server databases): tuned connection pool
+    return create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+SQLITE_TUNED = settings.SQLITE_TUNED and _is_sqlite_file(settings.DATABASE_URL)
 
-# Create SessionLocal class
+engine = create_database_engine(settings.DATABASE_URL)
+read_engine = create_database_engine(settings.DATABASE_URL, read_only=True) if SQLITE_TUNED else engine
+
+# Create SessionLocal class (writes) and ReadSessionLocal (read-only endpoints)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 # Create Base class
 Base = declarative_base()
 
-# Create all tables
+# Replication lag in seconds; 0 on a replica that has replayed everything it received
+# (pg_last_xact_replay_timestamp alone keeps growing on an idle primary)
+POSTGRESQL_REPLICA_LAG_SQL = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+class _Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_database_engine(url, read_only=True)
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.healthy = True
+        self.lag_seconds = 0.0
+        self.checked_at = 0.0
+        self.reads = 0
+        self.check_lock = threading.Lock()
+
+class ReplicaRouter:
+    """
+    Route read-only sessions to read replicas
+
+    Replicas are used round-robin; each one is health-checked (and its replication lag measured
+    on PostgreSQL) at most every ``check_interval`` seconds, and skipped while it is down or
+    lagging more than ``max_lag_seconds``. Requests whose client committed a write in the last
+    ``sticky_seconds`` (see LAST_WRITE_COOKIE) read from the primary so they always see their
+    own changes. With no replicas, or none usable, reads fall back to ``fallback`` (ReadSessionLocal).
+    """
+
+    def __init__(self, urls: List[str], fallback: Callable, max_lag_seconds: float,
+                 check_interval: float, sticky_seconds: float):
+        self.replicas = [_Replica(url) for url in urls]
+        self.fallback = fallback
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        self._round_robin = itertools.count()
+        self.primary_reads = 0
+        self.sticky_reads = 0
+
+    def _check(self, replica: _Replica) -> None:
+        # Only one request re-checks a replica; the others keep using the last result
+        if time.monotonic() - replica.checked_at < self.check_interval or not replica.check_lock.acquire(blocking=False):
+            return
+        try:
+            with replica.engine.connect() as connection:
+                if connection.dialect.name == "postgresql":
+                    replica.lag_seconds = float(connection.execute(text(POSTGRESQL_REPLICA_LAG_SQL)).scalar() or 0)
+                else:
+                    connection.execute(text("SELECT 1"))
+                    replica.lag_seconds = 0.0
+            replica.healthy = replica.lag_seconds <= self.max_lag_seconds
+            if not replica.healthy:
+                logger.warning(f"Replica {replica.engine.url!r} is {replica.lag_seconds:.1f}s behind; skipping it")
+        except Exception as e:
+            replica.healthy = False
+            logger.warning(f"Replica {replica.engine.url!r} failed its health check: {e}")
+        finally:
+            replica.checked_at = time.monotonic()
+            replica.check_lock.release()
+
+    def choose(self) -> Optional[_Replica]:
+        if not self.replicas:
+            return None
+        start = next(self._round_robin)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            self._check(replica)
+            if replica.healthy:
+                return replica
+        return None
+
+    def is_sticky(self, last_write: Optional[float]) -> bool:
+        # Wall-clock time so the marker means the same thing on every worker and host
+        return last_write is not None and time.time() - last_write < self.sticky_seconds
+
+    def session(self, last_write: Optional[float] = None) -> Session:
+        sticky = self.is_sticky(last_write)
+        replica = None if sticky else self.choose()
+        if replica is None:
+            self.primary_reads += 1
+            if sticky and self.replicas:
+                self.sticky_reads += 1
+            return self.fallback()
+        replica.reads += 1
+        return replica.session_factory()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+            "replicas": [
+                {
+                    "url": replica.engine.url.render_as_string(hide_password=True),
+                    "healthy": replica.healthy,
+                    "lag_seconds": replica.lag_seconds,
+                    "reads": replica.reads,
+                }
+                for replica in self.replicas
+            ],
+        }
+
+replica_router = ReplicaRouter(
+    [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()],
+    fallback=ReadSessionLocal,
+    max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.REPLICA_HEALTH_CHECK_SECONDS,
+    sticky_seconds=settings.REPLICA_STICKY_SECONDS,
+)
+
+# Read-your-writes marker carried by the client: the time of its last committed write.
+# Set by the last_write_marker middleware in main.py; browsers send the cookie back, other
+# clients can echo the response header. Works across workers and survives token refreshes.
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+def last_write(request: Optional[Request]) -> Optional[float]:
+    """The client's last-write marker from the request (header first, then cookie)"""
+    if request is None:
+        return None
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+@event.listens_for(SessionLocal, "after_flush")
+def _note_pending_write(session: Session, flush_context) -> None:
+    session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "after_commit")
+def _mark_request_write(session: Session) -> None:
+    # Only requests that actually flushed changes get a marker (commit() on a read is a no-op)
+    request = session.info.get("request")
+    if session.info.pop("wrote", False) and request is not None and replica_router.replicas:
+        request.state.last_write = time.time()
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending_write(session: Session) -> None:
+    session.info.pop("wrote", None)
+
+def commit_with_retry(db: Session, apply: Callable[[], None], attempts: int = 3) -> None:
+    """
+    Apply changes and commit, re-applying them on a fresh read when a concurrent
+    update bumped an invoice's version first (optimistic locking via version_id_col)
+
+    ``apply`` must (re)load what it changes: after a rollback the session's objects
+    are expired and pending objects are discarded.
+    """
+    for attempt in range(attempts):
+        apply()
+        try:
+            db.commit()
+            return
+        except StaleDataError:
+            db.rollback()
+            if attempt == attempts - 1:
+                raise
+            logger.info("Concurrent update detected; retrying on the latest version")
+
+def _alembic_config():
+    from alembic.config import Config
+    config = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BASE_DIR, "alembic"))
+    return config
+
+def get_migration_heads():
+    from alembic.script import ScriptDirectory
+    return set(ScriptDirectory.from_config(_alembic_config()).get_heads())
+
+def get_current_revisions():
+    from alembic.runtime.migration import MigrationContext
+    with engine.connect() as connection:
+        return set(MigrationContext.configure(connection).get_current_heads())
+
+# Check the schema version instead of running create_all on every boot
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    current = get_current_revisions()
+    heads = get_migration_heads()
+    if current == heads:
+        return
+
+    if not current and inspect(engine).has_table("invoices"):
+        raise RuntimeError(
+            "Database has tables but no migration version; "
+            "stamp it (see \"Existing databases\" in README.md) before starting"
+        )
+    if not settings.AUTO_MIGRATE:
+        raise RuntimeError(
+            f"Database schema is at {sorted(current) or 'empty'} but the code expects {sorted(heads)}; "
+            "run `alembic upgrade head` before starting the server"
+        )
+
+    from alembic import command
+    logger.info(f"Upgrading database schema from {sorted(current) or 'empty'} to {sorted(heads)}")
+    command.upgrade(_alembic_config(), "heads")
 
 # Dependency to get DB session
-def get_db():
+def get_db(request: Request = None):
     db = SessionLocal()
+    db.info["request"] = request
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency to get a DB session for read-only endpoints (routed to a read replica when configured)
+def get_read_db(request: Request = None):
+    db = replica_router.session(last_write(request))
     try:
         yield db
     finally:
         db.close()
+
+def read_session_factory(request: Request = None) -> Callable[[], Session]:
+    """Session factory for reads that outlive the request (streamed responses)"""
+    marker = last_write(request)
+    return lambda: replica_router.session(marker)
+
+def copy_rows(connection, table_name: str, columns, rows, chunk_rows: int = 10000) -> int:
+    """
+    Bulk-load rows into a PostgreSQL table with COPY ... FROM STDIN (CSV)
+
+    ``connection`` is a SQLAlchemy Connection on a PostgreSQL engine; rows are streamed
+    in chunks so memory stays bounded. Returns the number of rows copied.
+    """
+    import csv
+    import io
+
+    column_list = ", ".join(columns)
+    sql = f"COPY {table_name} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    dbapi_connection = connection.connection.dbapi_connection
+    cursor = dbapi_connection.cursor()
+    copied = 0
+
+    def _encode(value):
+        return "\\N" if value is None else value
+
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        pending = 0
+
+        def _flush():
+            buffer.seek(0)
+            if hasattr(cursor, "copy_expert"):  # psycopg2
+                cursor.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate(0)
+
+        for row in rows:
+            writer.writerow([_encode(value) for value in row])
+            pending += 1
+            copied += 1
+            if pending >= chunk_rows:
+                _flush()
+                pending = 0
+        if pending:
+            _flush()
+    finally:
+        cursor.close()
+    return copied
@@ -0,0 +1,55 @@
+import json
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session
+import models
+
+# سجل ردود بوابة ETA: صف مضغوط لكل رد في جدول eta_events (إضافة فقط)،
+# بينما تبقى على الفاتورة الحقول التي نصفي بها فقط (eta_status, eta_submission_id, التواريخ)
+
+def compress_payload(payload: Dict[str, Any]) -> bytes:
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"), 6)
+
+def decompress_payload(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+def record_eta_event(db: Session, invoice: models.Invoice, event_type: str, payload: Dict[str, Any]) -> models.EtaEvent:
+    """إضافة رد من البوابة إلى سجل الفاتورة (يحفظ مع commit الجلسة)"""
+    eta_event = models.EtaEvent(
+        invoice_id=invoice.id,
+        event_type=event_type,
+        status=invoice.eta_status,
+        created_at=datetime.utcnow(),
+        payload=compress_payload(payload),
+    )
+    db.add(eta_event)
+    return eta_event
+
+def latest_eta_response(db: Session, invoice_id: int) -> Optional[Dict[str, Any]]:
+    """آخر رد من البوابة للفاتورة (يعادل الحقل eta_response القديم)"""
+    row = (
+        db.query(models.EtaEvent.payload)
+        .filter(models.EtaEvent.invoice_id == invoice_id)
+        .order_by(models.EtaEvent.id.desc())
+        .first()
+    )
+    return decompress_payload(row.payload) if row else None
+
+def invoice_eta_events(db: Session, invoice_ids: Iterable[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """كل ردود البوابة لمجموعة فواتير بترتيب حدوثها (للأرشفة)"""
+    events: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    rows = (
+        db.query(models.EtaEvent)
+        .filter(models.EtaEvent.invoice_id.in_(list(invoice_ids)))
+        .order_by(models.EtaEvent.id)
+    )
+    for eta_event in rows:
+        events[eta_event.invoice_id].append({
+            "event_type": eta_event.event_type,
+            "status": eta_event.status,
+            "created_at": eta_event.created_at.isoformat(),
+            "payload": decompress_payload(eta_event.payload),
+        })
+    return events
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+import models
+from config import settings
+
+# نشر تغييرات حالة الفواتير للمشتركين عبر Server-Sent Events
+logger = logging.getLogger(__name__)
+
+class EventHub:
+    """
+    موزع أحداث داخل العملية لكل مستخدم
+
+    كل مشترك عبارة عن طابور asyncio صغير فقط (بدون مهام أو خيوط إضافية)، لذا
+    يكلف آلاف المشتركين الخاملين بضعة كيلوبايتات لكل منهم. النشر آمن من أي خيط:
+    الأحداث المنشورة خارج حلقة الأحداث تُمرر إليها عبر call_soon_threadsafe.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.dropped = 0
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            self._subscribers.pop(user_id, None)
+
+    def _deliver(self, user_id: int, payload: Dict[str, Any]) -> None:
+        for queue in list(self._subscribers.get(user_id, ())):
+            if queue.full():
+                # مشترك بطيء: نحذف أقدم حدث بدلًا من حجز الذاكرة أو تعطيل الناشر
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(payload)
+        self.published += 1
+
+    def publish(self, user_id: int, payload: Dict[str, Any]) -> None:
+        if user_id not in self._subscribers or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        try:
+            if running is self._loop:
+                self._deliver(user_id, payload)
+            else:
+                self._loop.call_soon_threadsafe(self._deliver, user_id, payload)
+        except RuntimeError:
+            # حلقة الأحداث مغلقة (إيقاف الخادم)
+            logger.debug("تم تجاهل حدث بعد إغلاق حلقة الأحداث")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+    @staticmethod
+    def format_sse(payload: Dict[str, Any]) -> str:
+        data = json.dumps(payload, ensure_ascii=False, default=str)
+        return f"id: {payload['invoice_id']}-{payload['version']}\nevent: {payload['type']}\ndata: {data}\n\n"
+
+hub = EventHub(queue_size=settings.SSE_QUEUE_SIZE)
+
+def _invoice_payload(invoice: models.Invoice, event_type: str, previous_eta_status: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "type": event_type,
+        "invoice_id": invoice.id,
+        "invoice_number": invoice.invoice_number,
+        "status": invoice.status,
+        "eta_status": invoice.eta_status,
+        "previous_eta_status": previous_eta_status,
+        "version": invoice.version,
+        "updated_at": invoice.updated_at.isoformat() if isinstance(invoice.updated_at, datetime) else None,
+    }
+
+@event.listens_for(Session, "after_flush")
+def _collect_invoice_events(session: Session, flush_context) -> None:
+    pending: List[tuple] = session.info.setdefault("_pending_invoice_events", [])
+    for obj in session.new:
+        if isinstance(obj, models.Invoice):
+            pending.append((obj.user_id, _invoice_payload(obj, "invoice.created")))
+    for obj in session.dirty:
+        if not isinstance(obj, models.Invoice):
+            continue
+        state = inspect(obj)
+        eta_history = state.attrs.eta_status.history
+        if eta_history.has_changes() or state.attrs.status.history.has_changes():
+            previous = eta_history.deleted[0] if eta_history.deleted else None
+            pending.append((obj.user_id, _invoice_payload(obj, "invoice.status", previous)))
+
+@event.listens_for(Session, "after_commit")
+def _publish_invoice_events(session: Session) -> None:
+    # النشر بعد الـ commit فقط حتى لا يرى المشتركون حالة تم التراجع عنها
+    for user_id, payload in session.info.pop("_pending_invoice_events", []):
+        if user_id is not None:
+            hub.publish(user_id, payload)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invoice_events(session: Session) -> None:
+    session.info.pop("_pending_invoice_events", None)
@@ -0,0 +1,27 @@
+import importlib
+from types import ModuleType
+from typing import Any, Optional
+
+class LazyModule:
+    """
+    وكيل لوحدة تُستورد عند أول استخدام فقط
+
+    يستخدم للمكتبات الثقيلة (pandas, matplotlib, seaborn) حتى لا يدفع العمال
+    الذين يخدمون عمليات الفواتير فقط تكلفة استيرادها عند الإقلاع.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
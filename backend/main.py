@@ -1,13 +1,27 @@
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks, Query, Request, Response, File, Form, UploadFile
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import models
 import schemas
 import database
 import security
+import queries
+import rollups
+import http_cache
+import events
+import eta_events
+import asyncio
+import os
+from services.archive_service import InvoiceArchiveService, archive_cutoff, submit_archive_run
 from services.eta_service import ETAService
+from services.export_service import InvoiceExportService
+from services import import_pipeline
+from services.search_service import InvoiceSearchService
+from services.summary_service import InvoiceSummaryService
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import APIRouter
 from sqlalchemy import func
@@ -32,18 +46,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Hand the client a read-your-writes marker after a request that committed a write
+# (see database.LAST_WRITE_COOKIE); its next reads go to the primary until replicas catch up
+@app.middleware("http")
+async def last_write_marker(request: Request, call_next):
+    response = await call_next(request)
+    written_at = getattr(request.state, "last_write", None)
+    if written_at is not None:
+        marker = f"{written_at:.3f}"
+        response.headers[database.LAST_WRITE_HEADER] = marker
+        response.set_cookie(
+            database.LAST_WRITE_COOKIE,
+            marker,
+            max_age=int(settings.REPLICA_STICKY_SECONDS) + 1,
+            httponly=True,
+            samesite="lax",
+        )
+    return response
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    events.hub.bind_loop(asyncio.get_running_loop())
 
 # Authentication endpoints
 @app.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(database.get_db)
+    form_data: OAuth2PasswordRequestForm = Depends()
 ):
-    user = security.authenticate_user(db, form_data.username, form_data.password)
+    user = await security.authenticate_user_async(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -107,6 +139,24 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)
 async def read_users_me(current_user: models.User = Depends(security.get_current_active_user)):
     return current_user
 
+@app.get("/metrics/auth-cache")
+async def read_auth_cache_metrics(current_user: models.User = Depends(security.get_current_active_user)):
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    return security.auth_cache_stats()
+
+@app.get("/metrics/events")
+async def read_event_hub_metrics(current_user: models.User = Depends(security.get_current_active_user)):
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    return events.hub.stats()
+
+@app.get("/metrics/replicas")
+async def read_replica_metrics(current_user: models.User = Depends(security.get_current_active_user)):
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    return database.replica_router.stats()
+
 # Invoice endpoints with authentication and ETA integration
 @app.post("/invoices/", response_model=schemas.Invoice, status_code=status.HTTP_201_CREATED)
 async def create_invoice(
@@ -116,7 +166,10 @@ async def create_invoice(
     current_user: models.User = Depends(security.get_current_active_user)
 ):
     try:
-        if db.query(models.Invoice).filter(models.Invoice.invoice_number == invoice.invoice_number).first():
+        if (
+            db.query(models.Invoice).filter(models.Invoice.invoice_number == invoice.invoice_number).first()
+            or InvoiceArchiveService(db).archived_invoice_numbers([invoice.invoice_number])
+        ):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invoice number already exists"
@@ -175,6 +228,8 @@ async def submit_to_eta(invoice_id: int, db: Session):
                 for item in invoice.items
             ]
         }
+        # End the read transaction so the writer connection is not held during the ETA calls and backoff
+        db.commit()
         
         # Implement retry mechanism
         max_retries = 3
@@ -182,13 +237,14 @@ async def submit_to_eta(invoice_id: int, db: Session):
             try:
                 response = eta_service.submit_invoice(invoice_data)
                 
-                # Update invoice with ETA response
-                invoice.eta_submission_id = response.get("submissionId")
-                invoice.eta_status = response.get("status", "pending")
-                invoice.eta_response = response
-                invoice.eta_submission_date = datetime.utcnow()
+                # Update invoice with ETA response (re-applied if a concurrent edit bumped the version)
+                def record_submission():
+                    invoice.eta_submission_id = response.get("submissionId")
+                    invoice.eta_status = response.get("status", "pending")
+                    invoice.eta_submission_date = datetime.utcnow()
+                    eta_events.record_eta_event(db, invoice, "submission", response)
                 
-                db.commit()
+                database.commit_with_retry(db, record_submission)
                 break
             except Exception as e:
                 if attempt == max_retries - 1:
@@ -198,9 +254,13 @@ async def submit_to_eta(invoice_id: int, db: Session):
         
     except Exception as e:
         # Log error and update invoice status
-        invoice.eta_status = "error"
-        invoice.eta_response = {"error": str(e)}
-        db.commit()
+        db.rollback()
+        
+        def record_error():
+            invoice.eta_status = "error"
+            eta_events.record_eta_event(db, invoice, "error", {"error": str(e)})
+        
+        database.commit_with_retry(db, record_error)
 
 @app.get("/invoices/", response_model=List[schemas.Invoice])
 def read_invoices(
@@ -208,14 +268,16 @@ def read_invoices(
     limit: int = 10,
     status: Optional[str] = None,
     client_name: Optional[str] = None,
-    db: Session = Depends(database.get_db),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: Session = Depends(database.get_read_db),
     current_user: models.User = Depends(security.get_current_active_user)
 ):
     try:
-        query = db.query(models.Invoice).filter(models.Invoice.user_id == current_user.id)
+        query = queries.user_invoices_query(
+            db, current_user.id, status=status, start_date=start_date, end_date=end_date
+        )
         
-        if status:
-            query = query.filter(models.Invoice.status == status)
         if client_name:
             query = query.filter(models.Invoice.client_name.ilike(f"%{client_name}%"))
         
@@ -226,23 +288,182 @@ def read_invoices(
             detail=f"Error retrieving invoices: {str(e)}"
         )
 
-@app.get("/invoices/{invoice_id}", response_model=schemas.Invoice)
+@app.get("/invoices/summary", response_model=schemas.InvoiceSummary)
+def read_invoices_summary(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(database.get_read_db),
+    current_user: models.User = Depends(security.get_current_active_user)
+):
+    try:
+        return InvoiceSummaryService(db).get_summary(current_user.id, start_date=start_date, end_date=end_date)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving invoice summary: {str(e)}"
+        )
+
+@app.get("/invoices/search", response_model=List[schemas.Invoice])
+def search_invoices(
+    q: str = Query(..., min_length=1),
+    skip: int = 0,
+    limit: int = 10,
+    db: Session = Depends(database.get_read_db),
+    current_user: models.User = Depends(security.get_current_active_user)
+):
+    try:
+        return InvoiceSearchService(db).search(current_user.id, q, skip=skip, limit=limit)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error searching invoices: {str(e)}"
+        )
+
+@app.get("/invoices/export")
+def export_invoices(
+    request: Request,
+    export_format: str = Query("ndjson", alias="format"),
+    invoice_status: Optional[str] = Query(None, alias="status"),
+    current_user: models.User = Depends(security.get_current_active_user)
+):
+    # The stream owns its own session: it outlives the request dependencies
+    export_service = InvoiceExportService(database.read_session_factory(request))
+    try:
+        media_type = export_service.media_type(export_format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    filename = f"invoices-{datetime.utcnow():%Y%m%d%H%M%S}.{export_format}"
+    return StreamingResponse(
+        export_service.stream(export_format, current_user.id, invoice_status),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/invoices/events")
+async def stream_invoice_events(
+    request: Request,
+    db: Session = Depends(database.get_read_db),
+    current_user: models.User = Depends(security.get_current_active_user)
+):
+    user_id = current_user.id
+    # Release the auth session's connection: the stream can stay open for hours
+    db.close()
+    queue = events.hub.subscribe(user_id)
+
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=settings.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield events.hub.format_sse(payload)
+        finally:
+            events.hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/invoices/changes", response_model=List[schemas.InvoiceChange])
+def read_invoice_changes(
+    since: datetime,
+    after_id: Optional[int] = None,
+    limit: int = Query(500, le=5000),
+    db: Session = Depends(database.get_read_db),
+    current_user: models.User = Depends(security.get_current_active_user)
+):
+    try:
+        return [row._asdict() for row in queries.invoice_changes_query(db, current_user.id, since, after_id, limit).all()]
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving invoice changes: {str(e)}"
+        )
+
+@app.get("/invoices/archive", response_model=List[schemas.ArchivedInvoice])
+def read_archived_invoices(
+    skip: int = 0,
+    limit: int = Query(50, le=500),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    invoice_number: Optional[str] = None,
+    db: Session = Depends(database.get_read_db),
+    current_user: models.User = Depends(security.get_current_active_user)
+):
+    try:
+        return InvoiceArchiveService(db).list_archived(
+            current_user.id, start_date=start_date, end_date=end_date,
+            invoice_number=invoice_number, skip=skip, limit=limit
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving archived invoices: {str(e)}"
+        )
+
+@app.post("/invoices/archive/run", response_model=schemas.ArchiveRunResult, status_code=status.HTTP_202_ACCEPTED)
+def run_invoice_archive(
+    retention_days: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(security.get_current_active_user)
+):
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    # Claimed in the database (one run across all workers); the run commits batch by batch on its own session
+    now = datetime.utcnow()
+    if submit_archive_run(db, retention_days, now) is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Archive run already in progress")
+    return {"status": "started", "cutoff": archive_cutoff(retention_days, now)}
+
+@app.get("/invoices/archive/{invoice_id}")
+def read_archived_invoice(
+    invoice_id: int,
+    db: Session = Depends(database.get_read_db),
+    current_user: models.User = Depends(security.get_current_active_user)
+):
+    invoice = InvoiceArchiveService(db).get_archived(current_user.id, invoice_id)
+    if invoice is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Archived invoice not found"
+        )
+    return invoice
+
+@app.get("/invoices/{invoice_id}", response_model=schemas.InvoiceDetail)
 def read_invoice(
     invoice_id: int,
-    db: Session = Depends(database.get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(database.get_read_db),
     current_user: models.User = Depends(security.get_current_active_user)
 ):
     try:
-        invoice = db.query(models.Invoice).filter(
+        # Check freshness from the version columns alone before loading the invoice and its items
+        marker = db.query(models.Invoice.version, models.Invoice.updated_at).filter(
             models.Invoice.id == invoice_id,
             models.Invoice.user_id == current_user.id
         ).first()
-        if invoice is None:
+        if marker is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Invoice not found"
             )
-        return invoice
+        etag = http_cache.invoice_etag(invoice_id, marker.version)
+        headers = http_cache.conditional_headers(etag, marker.updated_at)
+        if http_cache.is_not_modified(request, etag, marker.updated_at):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        invoice = db.query(models.Invoice).filter(models.Invoice.id == invoice_id).first()
+        detail = schemas.InvoiceDetail.model_validate(invoice)
+        detail.eta_response = eta_events.latest_eta_response(db, invoice_id)
+        response.headers.update(headers)
+        return detail
     except HTTPException:
         raise
     except Exception as e:
@@ -251,4 +472,78 @@ def read_invoice(
             detail=f"Error retrieving invoice: {str(e)}"
         )
 
+@app.post("/imports/", response_model=schemas.ImportJobStatus, status_code=status.HTTP_202_ACCEPTED)
+def create_import(
+    file: UploadFile = File(...),
+    file_type: str = Form(..., pattern="^(sales|purchases)$"),
+    submit_to_eta: bool = Form(False),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(security.get_current_active_user)
+):
+    _, ext = os.path.splitext(file.filename or "")
+    if ext.lower() not in (".xlsx", ".xls", ".csv"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported file type; expected .xlsx, .xls or .csv"
+        )
+    if file_type != "sales":
+        # The invoices table holds sales only; purchases would leak into rollups, summaries and ETA
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only sales invoices can be imported"
+        )
+    try:
+        # Spool the upload to disk in chunks, hashing it on the way, then import in the background
+        # (with submit_to_eta the job streams invoices to ETA while the file is still being read)
+        file_path, file_hash, _ = import_pipeline.save_upload(file.file, file.filename)
+        job = import_pipeline.create_import_job(
+            db, current_user.id, file_path, file_type,
+            file_name=file.filename, file_hash=file_hash, submit_to_eta=submit_to_eta
+        )
+        if job.file_path != file_path:
+            # Same content as an unfinished job: resume it instead of importing the file twice
+            os.remove(file_path)
+        # Claimed in the database, so a job another worker is already running is left alone
+        import_pipeline.submit_import_job(db, job.id)
+        return import_pipeline.import_job_progress(job)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error starting import: {str(e)}"
+        )
+
+@app.get("/imports/{job_id}", response_model=schemas.ImportJobStatus)
+def read_import(
+    job_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(security.get_current_active_user)
+):
+    job = db.query(models.ImportJob).filter(
+        models.ImportJob.id == job_id,
+        models.ImportJob.user_id == current_user.id
+    ).first()
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    return import_pipeline.import_job_progress(job)
+
+@app.post("/imports/{job_id}/resume", response_model=schemas.ImportJobStatus, status_code=status.HTTP_202_ACCEPTED)
+def resume_import(
+    job_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(security.get_current_active_user)
+):
+    job = db.query(models.ImportJob).filter(
+        models.ImportJob.id == job_id,
+        models.ImportJob.user_id == current_user.id
+    ).first()
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    if job.status == "completed":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Import job already completed")
+    # A job left "running" by a dead worker is reclaimed once its checkpoint goes stale
+    if import_pipeline.submit_import_job(db, job.id) is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Import job already running")
+    return import_pipeline.import_job_progress(job)
+
 # Rest of the code remains the same...
@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, LargeBinary, DDL, Index, UniqueConstraint, event
 from sqlalchemy.orm import relationship
 from database import Base
+from money import Money
+from search_index import POSTGRESQL_SEARCH_DDL, SQLITE_SEARCH_DDL
 from datetime import datetime
 
 class User(Base):
@@ -76,9 +78,9 @@ class Invoice(Base):
     client_tax_number = Column(String)
     issue_date = Column(DateTime, default=datetime.utcnow)
     due_date = Column(DateTime)
-    amount = Column(Float)
-    tax_amount = Column(Float, default=0.0)
-    total_amount = Column(Float)
+    amount = Column(Money)
+    tax_amount = Column(Money, default=0.0)
+    total_amount = Column(Money)
     status = Column(String, default="pending")
     payment_method = Column(String)
     notes = Column(String)
@@ -91,16 +93,28 @@ class Invoice(Base):
     # ETA specific fields
     eta_submission_id = Column(String, unique=True, nullable=True)
     eta_status = Column(String, default="pending")
-    eta_response = Column(JSON, nullable=True)
+    # ردود البوابة الخام محفوظة في جدول eta_events وليس في صف الفاتورة
     eta_submission_date = Column(DateTime, nullable=True)
     eta_validation_date = Column(DateTime, nullable=True)
     eta_cancellation_date = Column(DateTime, nullable=True)
     eta_cancellation_reason = Column(String, nullable=True)
     activity_code = Column(String)  # كود النشاط الضريبي
+    # رقم إصدار الصف: يزيد مع كل تعديل عبر الـ ORM ويستخدم في ETag والتحكم المتفائل في التزامن
+    version = Column(Integer, nullable=False, default=1)
 
     items = relationship("InvoiceItem", back_populates="invoice", cascade="all, delete-orphan")
     user = relationship("User", back_populates="invoices")
     client = relationship("Client", back_populates="invoices")
+    eta_events = relationship("EtaEvent", back_populates="invoice", cascade="all, delete-orphan")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    # فهارس مركبة لمسارات الاستعلام الأكثر استخدامًا (انظر queries.py)
+    __table_args__ = (
+        Index("ix_invoices_user_status", "user_id", "status"),
+        Index("ix_invoices_user_issue_date", "user_id", "issue_date"),
+        Index("ix_invoices_user_updated_at", "user_id", "updated_at"),
+    )
 
 class InvoiceItem(Base):
     __tablename__ = "invoice_items"
@@ -112,11 +126,88 @@ class InvoiceItem(Base):
     item_type = Column(String, default="EGS")  # EGS for Goods/Services
     unit_type = Column(String, default="EA")  # EA for Each
     quantity = Column(Float)
-    unit_price = Column(Float)
-    total = Column(Float)
+    unit_price = Column(Float)  # يبقى float: سعر الوحدة في ETA يقبل حتى 5 منازل عشرية ولا يُجمع
+    total = Column(Money)
     discount_rate = Column(Float, default=0.0)
-    discount_amount = Column(Float, default=0.0)
+    discount_amount = Column(Money, default=0.0)
     tax_rate = Column(Float, default=0.14)  # 14% VAT
-    tax_amount = Column(Float)
+    tax_amount = Column(Money)
     
     invoice = relationship("Invoice", back_populates="items")
+
+class EtaEvent(Base):
+    """ردود بوابة ETA الخام لكل فاتورة، مضغوطة وتُضاف فقط ولا تعدل (انظر eta_events.py)"""
+    __tablename__ = "eta_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    invoice_id = Column(Integer, ForeignKey("invoices.id"), nullable=False, index=True)
+    event_type = Column(String, nullable=False)  # submission أو error
+    status = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    payload = Column(LargeBinary, nullable=False)  # JSON مضغوط بـ zlib
+
+    invoice = relationship("Invoice", back_populates="eta_events")
+
+class InvoiceDailyRollup(Base):
+    """ملخص يومي لفواتير كل مستخدم حسب الحالة وحالة ETA، يحدَّث تدريجيًا (انظر rollups.py)"""
+    __tablename__ = "invoice_daily_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    status = Column(String, nullable=False, default="")
+    eta_status = Column(String, nullable=False, default="")
+    invoice_count = Column(Integer, nullable=False, default=0)
+    amount = Column(Money, nullable=False, default=0.0)
+    tax_amount = Column(Money, nullable=False, default=0.0)
+    total_amount = Column(Money, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", "status", "eta_status", name="uq_invoice_daily_rollups_key"),
+    )
+
+class ImportJob(Base):
+    """مهمة استيراد ملف فواتير مع نقطة الاستئناف (انظر services/import_pipeline.py)"""
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    file_name = Column(String)
+    file_path = Column(String, nullable=False)
+    file_hash = Column(String(64), nullable=False, index=True)  # sha256 لمحتوى الملف
+    file_type = Column(String, nullable=False)  # sales أو purchases
+    submit_to_eta = Column(Boolean, nullable=False, default=False)  # إرسال الفواتير المستوردة إلى ETA أثناء القراءة
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed, failed
+    # نقطة الاستئناف: عدد صفوف البيانات التي حفظت فواتيرها، تحدث في نفس transaction الدفعة
+    last_row = Column(Integer, nullable=False, default=0)
+    invoices_imported = Column(Integer, nullable=False, default=0)
+    invoices_skipped = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    # التقدم: حجم الملف، وبداية آخر تشغيل وصفه (لحساب الصفوف في الثانية)، وأعداد الأخطاء وإرسال ETA
+    file_size = Column(Integer, nullable=True)
+    start_row = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, nullable=True)
+    error_count = Column(Integer, nullable=False, default=0)
+    eta_submitted = Column(Integer, nullable=False, default=0)
+    eta_failed = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+class ArchiveRun(Base):
+    """آخر تشغيل لأرشفة الفواتير؛ صفه الوحيد يحجز التشغيل عبر كل العمليات (انظر services/archive_service.py)"""
+    __tablename__ = "archive_runs"
+
+    id = Column(Integer, primary_key=True)
+    status = Column(String, nullable=False, default="running")  # running, completed, failed
+    archived = Column(Integer, nullable=False, default=0)  # يحدث مع كل دفعة، في نفس transaction
+    error = Column(String, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+# فهرس البحث النصي (انظر search_index.py)
+for _statement in SQLITE_SEARCH_DDL:
+    event.listen(Invoice.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in POSTGRESQL_SEARCH_DDL:
+    event.listen(Invoice.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
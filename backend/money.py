@@ -0,0 +1,35 @@
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Optional, Union
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+# المبالغ تُخزن كأعداد صحيحة بالقرش (1 جنيه = 100 قرش) حتى تكون عمليات SUM دقيقة،
+# بينما تبقى واجهة الـ ORM والـ API بالجنيه (float) كما كانت
+
+PIASTRES_PER_POUND = 100
+
+Number = Union[int, float, Decimal, str]
+
+def to_piastres(value: Optional[Number]) -> Optional[int]:
+    """تحويل مبلغ بالجنيه إلى عدد صحيح بالقرش مع التقريب لأقرب قرش"""
+    if value is None:
+        return None
+    return int((Decimal(str(value)) * PIASTRES_PER_POUND).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+def from_piastres(value: Optional[int]) -> Optional[float]:
+    """تحويل عدد القروش المخزن إلى مبلغ بالجنيه"""
+    if value is None:
+        return None
+    return int(value) / PIASTRES_PER_POUND
+
+class Money(TypeDecorator):
+    """عمود مبلغ: BIGINT بالقرش في قاعدة البيانات، و float بالجنيه في Python"""
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return to_piastres(value)
+
+    def process_result_value(self, value, dialect):
+        return from_piastres(value)
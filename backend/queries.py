@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query, Session
+import models
+
+# الاستعلامات الأكثر استخدامًا على الفواتير، وكل منها مغطى بفهرس في models.Invoice.__table_args__
+# (يتحقق منها اختبار خطة الاستعلام في tests/test_system.py)
+
+def user_invoices_query(
+    db: Session,
+    user_id: int,
+    status: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> Query:
+    """فواتير المستخدم مع تصفية اختيارية حسب الحالة (ix_invoices_user_status) أو الفترة (ix_invoices_user_issue_date)"""
+    query = db.query(models.Invoice).filter(models.Invoice.user_id == user_id)
+    if status:
+        query = query.filter(models.Invoice.status == status)
+    if start_date:
+        query = query.filter(models.Invoice.issue_date >= start_date)
+    if end_date:
+        query = query.filter(models.Invoice.issue_date <= end_date)
+    return query
+
+def invoice_changes_query(
+    db: Session,
+    user_id: int,
+    since: datetime,
+    after_id: Optional[int] = None,
+    limit: int = 500,
+) -> Query:
+    """
+    الفواتير التي تغيرت بعد وقت معين، بالأعمدة الخفيفة فقط (ix_invoices_user_updated_at)
+
+    الترقيم بمؤشر (updated_at, id): الصفحة التالية تطلب بـ since/after_id من آخر صف، فلا تضيع
+    الفواتير التي تشترك في نفس updated_at عند حد الصفحة
+    """
+    if after_id is None:
+        changed = models.Invoice.updated_at > since
+    else:
+        # updated_at >= since يبقي الشرط نطاقًا على الفهرس، والباقي يستبعد ما سبق المؤشر
+        changed = and_(
+            models.Invoice.updated_at >= since,
+            or_(models.Invoice.updated_at > since, models.Invoice.id > after_id),
+        )
+    return (
+        db.query(
+            models.Invoice.id,
+            models.Invoice.invoice_number,
+            models.Invoice.version,
+            models.Invoice.status,
+            models.Invoice.eta_status,
+            models.Invoice.updated_at,
+        )
+        .filter(models.Invoice.user_id == user_id, changed)
+        .order_by(models.Invoice.updated_at, models.Invoice.id)
+        .limit(limit)
+    )
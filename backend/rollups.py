@@ -0,0 +1,185 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import Date, cast, delete, event, func, inspect, insert, select, union_all
+from sqlalchemy.orm import Session
+import models
+from money import from_piastres, to_piastres
+
+# الحفاظ على جدول invoice_daily_rollups محدثًا تدريجيًا مع كل flush يضيف أو يعدل أو يحذف فواتير.
+# التعديلات الجماعية التي تتجاوز الـ ORM (bulk insert / query.update) يجب أن تستدعي apply_deltas بنفسها.
+# الفروقات تُجمع بالقرش (أعداد صحيحة) حتى لا تتراكم أخطاء الـ float.
+
+MEASURES = ("amount", "tax_amount", "total_amount")
+TRACKED_FIELDS = ("user_id", "issue_date", "status", "eta_status") + MEASURES
+
+RollupKey = Tuple[int, date, str, str]
+
+def _track_previous_value(target, value, oldvalue, initiator):
+    return value
+
+# active_history يجبر الـ ORM على تحميل القيمة السابقة عند التعديل حتى لو لم تكن محملة،
+# فنستطيع طرحها من مفتاح الملخص القديم
+for _field in TRACKED_FIELDS:
+    event.listen(getattr(models.Invoice, _field), "set", _track_previous_value, active_history=True, retval=True)
+
+def _day(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+def _values(invoice: models.Invoice, previous: bool) -> Dict[str, object]:
+    """قيم الحقول المتتبعة قبل التعديل (previous) أو بعده"""
+    state = inspect(invoice)
+    values = {}
+    for field in TRACKED_FIELDS:
+        attr = state.attrs[field]
+        history = attr.history
+        if previous and history.deleted:
+            values[field] = history.deleted[0]
+        elif previous and history.added:
+            # مع active_history تكون القيمة السابقة محملة دائمًا، فغيابها يعني أنها كانت NULL
+            values[field] = None
+        else:
+            values[field] = attr.value
+    return values
+
+def _key(values: Dict[str, object]) -> Optional[RollupKey]:
+    if values["user_id"] is None or values["issue_date"] is None:
+        return None
+    return (values["user_id"], _day(values["issue_date"]), values["status"] or "", values["eta_status"] or "")
+
+def _add(deltas, values: Dict[str, object], sign: int) -> None:
+    key = _key(values)
+    if key is None:
+        return
+    delta = deltas[key]
+    delta["invoice_count"] += sign
+    for measure in MEASURES:
+        delta[measure] += sign * (to_piastres(values[measure]) or 0)
+
+def _has_tracked_changes(invoice: models.Invoice) -> bool:
+    state = inspect(invoice)
+    return any(state.attrs[field].history.has_changes() for field in TRACKED_FIELDS)
+
+def apply_deltas(connection, deltas: Dict[RollupKey, Dict[str, float]]) -> None:
+    """
+    تطبيق الفروقات على جدول الملخص عبر upsert واحد لكل مفتاح
+    (user_id, day, status, eta_status)
+
+    المبالغ في deltas بالقرش (انظر _new_deltas)
+    """
+    rows = [
+        {
+            "user_id": key[0], "day": key[1], "status": key[2], "eta_status": key[3],
+            "invoice_count": delta["invoice_count"],
+            **{measure: from_piastres(delta[measure]) for measure in MEASURES},
+        }
+        for key, delta in deltas.items()
+        if any(delta.values())
+    ]
+    if not rows:
+        return
+
+    table = models.InvoiceDailyRollup.__table__
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.day, table.c.status, table.c.eta_status],
+            set_={
+                column: table.c[column] + stmt.excluded[column]
+                for column in ("invoice_count",) + MEASURES
+            },
+        )
+        connection.execute(stmt, rows)
+        return
+
+    # قواعد بيانات أخرى: تحديث ثم إدراج عند عدم وجود الصف
+    for row in rows:
+        key_filter = (
+            (table.c.user_id == row["user_id"]) & (table.c.day == row["day"])
+            & (table.c.status == row["status"]) & (table.c.eta_status == row["eta_status"])
+        )
+        result = connection.execute(
+            table.update().where(key_filter).values(
+                {column: table.c[column] + row[column] for column in ("invoice_count",) + MEASURES}
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(**row))
+
+def _new_deltas():
+    return defaultdict(lambda: {"invoice_count": 0, **{measure: 0 for measure in MEASURES}})
+
+@event.listens_for(Session, "before_flush")
+def _capture_deleted_invoices(session: Session, flush_context, instances) -> None:
+    # قيم الفواتير المحذوفة تُقرأ قبل الـ flush لأن الصفوف لن تكون موجودة بعده لتحميل الحقول غير المحملة
+    deltas = _new_deltas()
+    for obj in session.deleted:
+        if isinstance(obj, models.Invoice):
+            _add(deltas, _values(obj, previous=True), -1)
+    session.info["_rollup_deleted_deltas"] = deltas
+
+@event.listens_for(Session, "after_flush")
+def _update_rollups_after_flush(session: Session, flush_context) -> None:
+    # في after_flush ما زالت قوائم new/dirty وتاريخ الحقول بحالتها قبل الـ flush،
+    # بينما أصبحت القيم الافتراضية (status, issue_date...) مُعبأة على الفواتير الجديدة
+    deltas = session.info.pop("_rollup_deleted_deltas", None) or _new_deltas()
+    for obj in session.new:
+        if isinstance(obj, models.Invoice):
+            _add(deltas, _values(obj, previous=False), +1)
+    for obj in session.dirty:
+        if isinstance(obj, models.Invoice) and _has_tracked_changes(obj):
+            _add(deltas, _values(obj, previous=True), -1)
+            _add(deltas, _values(obj, previous=False), +1)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+def rebuild_rollups(db: Session, user_id: Optional[int] = None) -> None:
+    """إعادة بناء جدول الملخص من جدول الفواتير (للتعبئة الأولية أو بعد تعديلات جماعية)"""
+    from services.archive_service import InvoiceArchiveService, archive_view
+
+    rollup = models.InvoiceDailyRollup.__table__
+    invoice = models.Invoice.__table__
+    if InvoiceArchiveService(db).archive_exists():
+        # الفواتير المؤرشفة ما زالت جزءًا من الملخص
+        source_columns = ("user_id", "issue_date", "status", "eta_status") + MEASURES
+        archive = archive_view()
+        invoice = union_all(
+            select(*[invoice.c[name] for name in source_columns]),
+            select(*[archive.c[name] for name in source_columns]),
+        ).subquery("invoices")
+    if db.get_bind().dialect.name == "sqlite":
+        day = func.date(invoice.c.issue_date)
+    else:
+        day = cast(invoice.c.issue_date, Date)
+
+    aggregate = (
+        select(
+            invoice.c.user_id,
+            day.label("day"),
+            func.coalesce(invoice.c.status, "").label("status"),
+            func.coalesce(invoice.c.eta_status, "").label("eta_status"),
+            func.count().label("invoice_count"),
+            *[func.coalesce(func.sum(invoice.c[m]), 0).label(m) for m in MEASURES],
+        )
+        .where(invoice.c.user_id.isnot(None), invoice.c.issue_date.isnot(None))
+        .group_by(invoice.c.user_id, day, func.coalesce(invoice.c.status, ""), func.coalesce(invoice.c.eta_status, ""))
+    )
+    clear = delete(rollup)
+    if user_id is not None:
+        aggregate = aggregate.where(invoice.c.user_id == user_id)
+        clear = clear.where(rollup.c.user_id == user_id)
+
+    db.execute(clear)
+    db.execute(
+        insert(rollup).from_select(
+            ["user_id", "day", "status", "eta_status", "invoice_count", *MEASURES], aggregate
+        )
+    )
+    db.commit()
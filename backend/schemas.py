@@ -1,6 +1,10 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional
-from datetime import datetime
+from pydantic import AfterValidator, BaseModel, EmailStr, Field
+from typing import Annotated, List, Optional
+from datetime import date, datetime
+from money import from_piastres, to_piastres
+
+# المبالغ تخزن بالقرش (انظر money.py)، فتقرب المدخلات لنفس الدقة حتى تطابق الاستجابة ما تم حفظه
+MoneyAmount = Annotated[float, AfterValidator(lambda value: from_piastres(to_piastres(value)))]
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -26,6 +30,10 @@ class User(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -37,11 +45,11 @@ class InvoiceItemBase(BaseModel):
     unit_type: str = "EA"
     quantity: float
     unit_price: float
-    total: float
+    total: MoneyAmount
     discount_rate: float = 0.0
-    discount_amount: float = 0.0
+    discount_amount: MoneyAmount = 0.0
     tax_rate: float = 0.14
-    tax_amount: float
+    tax_amount: MoneyAmount
 
 class InvoiceItemCreate(InvoiceItemBase):
     pass
@@ -63,9 +71,9 @@ class InvoiceBase(BaseModel):
     client_tax_number: Optional[str] = None
     issue_date: datetime
     due_date: datetime
-    amount: float
-    tax_amount: float
-    total_amount: float
+    amount: MoneyAmount
+    tax_amount: MoneyAmount
+    total_amount: MoneyAmount
     status: str
     payment_method: str
     notes: Optional[str] = None
@@ -82,11 +90,26 @@ class Invoice(InvoiceBase):
     user_id: int
     eta_submission_id: Optional[str] = None
     eta_status: str = "pending"
-    eta_response: Optional[dict] = None
     eta_submission_date: Optional[datetime] = None
     eta_validation_date: Optional[datetime] = None
     eta_cancellation_date: Optional[datetime] = None
     eta_cancellation_reason: Optional[str] = None
+    version: int = 1
+
+    class Config:
+        orm_mode = True
+
+class InvoiceDetail(Invoice):
+    # آخر رد من بوابة ETA (من جدول eta_events)، في عرض الفاتورة المفردة فقط
+    eta_response: Optional[dict] = None
+
+class InvoiceChange(BaseModel):
+    id: int
+    invoice_number: Optional[str] = None
+    version: int
+    status: Optional[str] = None
+    eta_status: Optional[str] = None
+    updated_at: datetime
 
     class Config:
         orm_mode = True
@@ -98,6 +121,57 @@ class InvoiceETAStatus(BaseModel):
     error_message: Optional[str] = None
     response_data: Optional[dict] = None
 
+class InvoiceSummaryBucket(BaseModel):
+    key: str
+    count: int
+    amount: float
+    tax_amount: float
+    total_amount: float
+
+class InvoiceSummary(BaseModel):
+    totals: InvoiceSummaryBucket
+    by_status: List[InvoiceSummaryBucket]
+    by_eta_status: List[InvoiceSummaryBucket]
+
+class ArchivedInvoice(BaseModel):
+    invoice_id: int
+    user_id: int
+    invoice_number: str
+    client_name: Optional[str] = None
+    client_tax_number: Optional[str] = None
+    issue_date: datetime
+    status: Optional[str] = None
+    eta_status: Optional[str] = None
+    eta_submission_id: Optional[str] = None
+    amount: Optional[float] = None
+    tax_amount: Optional[float] = None
+    total_amount: Optional[float] = None
+    archived_at: datetime
+
+class ArchiveRunResult(BaseModel):
+    status: str
+    cutoff: datetime
+
+class ImportJobStatus(BaseModel):
+    id: int
+    file_name: Optional[str] = None
+    file_type: str
+    file_size: Optional[int] = None
+    submit_to_eta: bool = False
+    status: str
+    rows_processed: int
+    rows_per_second: Optional[float] = None
+    elapsed_seconds: Optional[float] = None
+    invoices_imported: int
+    invoices_skipped: int
+    error_count: int
+    error: Optional[str] = None
+    eta_submitted: int
+    eta_failed: int
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
 class InvoiceCancelRequest(BaseModel):
     reason: str = Field(..., min_length=10, max_length=200)
 
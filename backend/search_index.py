@@ -0,0 +1,62 @@
+# تعريف فهرس البحث النصي على رقم الفاتورة واسم العميل والرقم الضريبي في مكان واحد،
+# تستخدمه models (create_all) والترحيلات وخدمة البحث
+# SQLite: جدول FTS5 بمحتوى خارجي تتم مزامنته بالـ triggers
+# PostgreSQL: فهارس GIN (trigram و tsvector) على تعبير يجمع الحقول، وتحدّث تلقائيًا مع الصف
+
+INVOICE_SEARCH_DOCUMENT_SQL = (
+    "(coalesce(invoice_number, '') || ' ' || coalesce(client_name, '') "
+    "|| ' ' || coalesce(client_tax_number, ''))"
+)
+
+SQLITE_SEARCH_TABLE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS invoices_fts USING fts5("
+    "invoice_number, client_name, client_tax_number, "
+    "content='invoices', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+)
+
+SQLITE_SEARCH_TRIGGERS = {
+    "invoices_fts_ai": (
+        "CREATE TRIGGER IF NOT EXISTS invoices_fts_ai AFTER INSERT ON invoices BEGIN "
+        "INSERT INTO invoices_fts(rowid, invoice_number, client_name, client_tax_number) "
+        "VALUES (new.id, new.invoice_number, new.client_name, new.client_tax_number); END"
+    ),
+    "invoices_fts_ad": (
+        "CREATE TRIGGER IF NOT EXISTS invoices_fts_ad AFTER DELETE ON invoices BEGIN "
+        "INSERT INTO invoices_fts(invoices_fts, rowid, invoice_number, client_name, client_tax_number) "
+        "VALUES ('delete', old.id, old.invoice_number, old.client_name, old.client_tax_number); END"
+    ),
+    "invoices_fts_au": (
+        "CREATE TRIGGER IF NOT EXISTS invoices_fts_au AFTER UPDATE OF invoice_number, client_name, client_tax_number "
+        "ON invoices BEGIN "
+        "INSERT INTO invoices_fts(invoices_fts, rowid, invoice_number, client_name, client_tax_number) "
+        "VALUES ('delete', old.id, old.invoice_number, old.client_name, old.client_tax_number); "
+        "INSERT INTO invoices_fts(rowid, invoice_number, client_name, client_tax_number) "
+        "VALUES (new.id, new.invoice_number, new.client_name, new.client_tax_number); END"
+    ),
+}
+
+SQLITE_SEARCH_DDL = [SQLITE_SEARCH_TABLE_DDL, *SQLITE_SEARCH_TRIGGERS.values()]
+
+POSTGRESQL_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_invoices_search_trgm ON invoices "
+    f"USING gin ({INVOICE_SEARCH_DOCUMENT_SQL} gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_invoices_search_tsv ON invoices "
+    f"USING gin (to_tsvector('simple', {INVOICE_SEARCH_DOCUMENT_SQL}))",
+    "CREATE INDEX IF NOT EXISTS ix_invoices_client_name_trgm ON invoices "
+    "USING gin (client_name gin_trgm_ops)",
+]
+
+
+def restore_sqlite_search_triggers(op) -> None:
+    """
+    إعادة إنشاء triggers المزامنة بعد batch_alter_table على invoices في ترحيل
+
+    على SQLite يعيد batch_alter_table إنشاء الجدول فتضيع الـ triggers المرتبطة به.
+
+    Args:
+        op: كائن alembic.op للترحيل الجاري
+    """
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in SQLITE_SEARCH_TRIGGERS.values():
+            op.execute(statement)
@@ -1,25 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 import models
 import schemas
 import database
+from cache import TTLCache
 from config import settings
 
 # تكوين الأمان
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max rounds تساوي القيمة المضبوطة حتى تُعلَّم الهاشات القديمة للتحديث عند تغيير التكلفة
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+# مجموعة خيوط محدودة لعمليات bcrypt (تحرر bcrypt قفل GIL) حتى لا تعطل حلقة الأحداث
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# ذاكرة مؤقتة للتوكنات المفكوكة (token -> username) ولبيانات المستخدمين (username -> snapshot)
+# الذاكرة محلية لكل عملية، لذا فإن مدة الصلاحية هي الحد الأعلى لتأخر التحديثات بين العمليات
+token_cache = TTLCache(settings.AUTH_CACHE_TTL_SECONDS, settings.AUTH_CACHE_MAX_ENTRIES)
+user_cache = TTLCache(settings.AUTH_CACHE_TTL_SECONDS, settings.AUTH_CACHE_MAX_ENTRIES)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    # تعيد هاشًا جديدًا إذا كان الهاش المخزن بتكلفة مختلفة عن الإعدادات الحالية
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def _run_password_task(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, func, *args)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -40,6 +70,70 @@ def create_refresh_token(data: dict) -> str:
 def get_user(db: Session, username: str):
     return db.query(models.User).filter(models.User.username == username).first()
 
+def _snapshot_user(user: models.User) -> Dict[str, Any]:
+    return {column.key: getattr(user, column.key) for column in models.User.__table__.columns}
+
+def _restore_user(db: Session, snapshot: Dict[str, Any]) -> models.User:
+    # إعادة بناء المستخدم كنسخة منفصلة ثم ربطها بالجلسة الحالية بدون استعلام
+    user = models.User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+def get_cached_user(db: Session, username: str):
+    snapshot = user_cache.get(username)
+    if snapshot is not None:
+        return _restore_user(db, snapshot)
+    user = get_user(db, username)
+    if user is not None:
+        user_cache.set(username, _snapshot_user(user))
+    return user
+
+def invalidate_user_cache(username: str) -> None:
+    user_cache.invalidate(username)
+
+def decode_token_subject(token: str) -> Optional[str]:
+    """فك التوكن وإرجاع اسم المستخدم مع تخزين النتيجة حتى انتهاء صلاحية التوكن"""
+    username = token_cache.get(token)
+    if username is not None:
+        return username
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    username = payload.get("sub")
+    if username is None:
+        return None
+    ttl = settings.AUTH_CACHE_TTL_SECONDS
+    expires_at = payload.get("exp")
+    if expires_at is not None:
+        ttl = min(ttl, expires_at - time.time())
+    token_cache.set(token, username, ttl)
+    return username
+
+def auth_cache_stats() -> Dict[str, Any]:
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _collect_changed_user(mapper, connection, target):
+    # تسجيل المستخدم المعدل أو المعطل أو المحذوف (بما في ذلك تغيير اسم المستخدم) لإبطاله بعد الـ commit؛
+    # الإبطال هنا (قبل الـ commit) يسمح لقارئ متزامن بإعادة تخزين البيانات القديمة
+    history = inspect(target).attrs.username.history
+    pending = inspect(target).session.info.setdefault("changed_usernames", set())
+    for username in list(history.deleted or ()) + [target.username]:
+        if username is not None:
+            pending.add(username)
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_user_changes(orm_execute_state):
+    # query.update()/delete() لا تمر بأحداث الـ mapper ولا نعرف الصفوف المتأثرة، فتفرغ الذاكرة كلها بعد الـ commit
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and orm_execute_state.bind_mapper is inspect(models.User):
+        orm_execute_state.session.info["clear_user_cache"] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_users_after_commit(session):
+    if session.info.pop("clear_user_cache", False):
+        user_cache.clear()
+    for username in session.info.pop("changed_usernames", ()):
+        invalidate_user_cache(username)
+
 def authenticate_user(db: Session, username: str, password: str):
     user = get_user(db, username)
     if not user:
@@ -48,6 +142,46 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     return user
 
+def _load_login_user(username: str) -> Optional[models.User]:
+    # جلسة قصيرة على قاعدة البيانات الأساسية (وليس نسخة قراءة متأخرة) تغلق قبل تنفيذ bcrypt
+    db = database.ReadSessionLocal()
+    try:
+        user = get_user(db, username)
+        if user is not None:
+            db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+def _store_rehashed_password(user_id: int, old_hash: str, new_hash: str) -> None:
+    db = database.SessionLocal()
+    try:
+        user = db.get(models.User, user_id)
+        # لا يستبدل كلمة مرور تم تغييرها أثناء التحقق
+        if user is not None and user.hashed_password == old_hash:
+            user.hashed_password = new_hash
+            db.commit()
+    finally:
+        db.close()
+
+async def authenticate_user_async(username: str, password: str):
+    """
+    نسخة غير متزامنة من authenticate_user تنفذ bcrypt في مجموعة الخيوط وتعيد التشفير عند تغيير التكلفة
+
+    الاستعلام والحفظ يعملان في threadpool بجلسات قصيرة، فلا تعطل حلقة الأحداث ولا تحجز اتصال
+    الكتابة أثناء انتظار bcrypt.
+    """
+    user = await run_in_threadpool(_load_login_user, username)
+    if not user:
+        return False
+    valid, new_hash = await _run_password_task(verify_and_update_password, password, user.hashed_password)
+    if not valid:
+        return False
+    if new_hash:
+        await run_in_threadpool(_store_rehashed_password, user.id, user.hashed_password, new_hash)
+    return user
+
+# جلسة الكتابة: المستخدم المرتبط بها يستخدم في endpoints تكتب (علاقات، user_id)، ولا يصح ربطه بجلسة query_only
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,14 +189,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
+        username = decode_token_subject(token)
         if username is None:
             raise credentials_exception
         token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = get_user(db, username=token_data.username)
+    user = get_cached_user(db, username=token_data.username)
     if user is None:
         raise credentials_exception
     return user
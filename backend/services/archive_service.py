@@ -0,0 +1,379 @@
+import json
+import logging
+import zlib
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import (
+    Column, DateTime, Index, Integer, LargeBinary, MetaData, PrimaryKeyConstraint, String, Table,
+    delete, insert, inspect, or_, select, text, update,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+
+import database
+import eta_events
+import models
+from config import settings
+from money import Money
+from services.export_service import invoice_to_dict
+
+# إعداد التسجيل
+logger = logging.getLogger(__name__)
+
+ARCHIVE_TABLE = "invoices_archive"
+PARTITION_PREFIX = "invoices_archive_p"
+
+# تشغيل الأرشفة في الخلفية بجلسة مستقلة؛ التشغيل يحجز في جدول archive_runs (تشغيل واحد عبر كل العمليات)
+archive_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="invoice-archive")
+ARCHIVE_RUN_ID = 1
+
+# حقول إضافية تحفظ في نسخة الأرشيف حتى يمكن استرجاع الفاتورة كاملة
+ARCHIVE_EXTRA_FIELDS = [
+    'user_id', 'client_id', 'supplier_id', 'version',
+    'eta_validation_date', 'eta_cancellation_date', 'eta_cancellation_reason',
+]
+
+
+def _archive_columns() -> List[Column]:
+    """أعمدة الأرشيف: حقول البحث والتجميع كأعمدة، وبقية الفاتورة مضغوطة في payload"""
+    return [
+        Column("invoice_id", Integer, nullable=False),
+        Column("user_id", Integer, nullable=False),
+        Column("invoice_number", String, nullable=False),
+        Column("client_name", String),
+        Column("client_tax_number", String),
+        Column("issue_date", DateTime, nullable=False),
+        Column("status", String),
+        Column("eta_status", String),
+        Column("eta_submission_id", String),
+        Column("amount", Money),
+        Column("tax_amount", Money),
+        Column("total_amount", Money),
+        Column("archived_at", DateTime, nullable=False),
+        Column("payload", LargeBinary, nullable=False),
+    ]
+
+
+def archive_view() -> Table:
+    """
+    الأرشيف كجدول واحد للاستعلام: الجدول الأب المقسم على PostgreSQL،
+    أو view يجمع جداول الفترات بـ UNION ALL على SQLite
+    """
+    return Table(ARCHIVE_TABLE, MetaData(), *_archive_columns())
+
+
+def _period(value: datetime) -> str:
+    return f"{value.year:04d}{value.month:02d}"
+
+
+def archive_cutoff(retention_days: Optional[int] = None, now: Optional[datetime] = None) -> datetime:
+    """تاريخ القطع: الفواتير الصادرة قبله مؤهلة للأرشفة"""
+    retention_days = settings.ARCHIVE_RETENTION_DAYS if retention_days is None else retention_days
+    return (now or datetime.utcnow()) - timedelta(days=retention_days)
+
+
+class InvoiceArchiveService:
+    """
+    خدمة أرشفة الفواتير القديمة
+
+    تنقل الفواتير المغلقة والمعتمدة من ETA الأقدم من فترة الاحتفاظ من جدول invoices
+    إلى طبقة أرشيف مقسمة شهريًا ومضغوطة، فيبقى الجدول الساخن وفهارسه صغيرة.
+    على PostgreSQL الأرشيف جدول مقسم (PARTITION BY RANGE) بقسم لكل شهر،
+    وعلى SQLite جدول لكل شهر مع view باسم invoices_archive يجمعها.
+    """
+
+    def __init__(self, db: Session):
+        """
+        تهيئة الخدمة
+
+        Args:
+            db: جلسة قاعدة البيانات
+        """
+        self.db = db
+        self.dialect = db.get_bind().dialect.name
+
+    def archive_exists(self) -> bool:
+        return inspect(self.db.connection()).has_table(ARCHIVE_TABLE)
+
+    def _partition_name(self, period: str) -> str:
+        return f"{PARTITION_PREFIX}{period}"
+
+    def ensure_partition(self, period: str) -> Table:
+        """
+        إنشاء قسم الشهر إذا لم يكن موجودًا
+
+        Args:
+            period: الشهر بصيغة YYYYMM
+
+        Returns:
+            الجدول الذي تدرج فيه فواتير هذا الشهر
+        """
+        name = self._partition_name(period)
+        if self.dialect == "postgresql":
+            start = date(int(period[:4]), int(period[4:]), 1)
+            end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+            self.db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {ARCHIVE_TABLE} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+            # الإدراج في الجدول الأب يوجه الصفوف إلى القسم المناسب
+            return archive_view()
+
+        partition = Table(
+            name, MetaData(), *_archive_columns(),
+            PrimaryKeyConstraint("invoice_id"),
+            Index(f"ix_{name}_user_issue_date", "user_id", "issue_date"),
+            Index(f"ix_{name}_invoice_number", "invoice_number"),
+        )
+        if not inspect(self.db.connection()).has_table(name):
+            partition.create(bind=self.db.connection())
+            self._rebuild_sqlite_view()
+        return partition
+
+    def _rebuild_sqlite_view(self) -> None:
+        partitions = [
+            row[0] for row in self.db.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE :prefix ORDER BY name"),
+                {"prefix": f"{PARTITION_PREFIX}%"},
+            )
+        ]
+        self.db.execute(text(f"DROP VIEW IF EXISTS {ARCHIVE_TABLE}"))
+        union = " UNION ALL ".join(f"SELECT * FROM {name}" for name in partitions)
+        self.db.execute(text(f"CREATE VIEW {ARCHIVE_TABLE} AS {union}"))
+
+    def _archive_row(self, invoice: models.Invoice, archived_at: datetime,
+                     invoice_events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        data = invoice_to_dict(invoice, ARCHIVE_EXTRA_FIELDS)
+        data['eta_events'] = invoice_events
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        return {
+            "invoice_id": invoice.id,
+            "user_id": invoice.user_id,
+            "invoice_number": invoice.invoice_number,
+            "client_name": invoice.client_name,
+            "client_tax_number": invoice.client_tax_number,
+            "issue_date": invoice.issue_date,
+            "status": invoice.status,
+            "eta_status": invoice.eta_status,
+            "eta_submission_id": invoice.eta_submission_id,
+            "amount": invoice.amount,
+            "tax_amount": invoice.tax_amount,
+            "total_amount": invoice.total_amount,
+            "archived_at": archived_at,
+            "payload": zlib.compress(payload.encode("utf-8"), 6),
+        }
+
+    def _replace_archived(self, table: Table, rows: List[Dict[str, Any]]) -> None:
+        """
+        إدراج نسخ الأرشيف مع استبدال أي نسخة سابقة لنفس الفاتورة
+
+        إعادة التشغيل على فاتورة مؤرشفة من قبل (مثلًا بعد استرجاعها إلى الجدول الساخن)
+        لا تفشل على المفتاح الأساسي وتحفظ آخر نسخة منها.
+        """
+        ids = [row["invoice_id"] for row in rows]
+        self.db.execute(delete(table).where(table.c.invoice_id.in_(ids)))
+        self.db.execute(insert(table), rows)
+
+    def archived_invoice_numbers(self, numbers: Iterable[str]) -> Set[str]:
+        """
+        أرقام الفواتير الموجودة في الأرشيف من بين الأرقام المعطاة
+
+        قيد التفرد على invoice_number يغطي الجدول الساخن فقط، لذا يتحقق إنشاء الفواتير
+        واستيرادها من الأرشيف أيضًا حتى لا يعاد استخدام رقم فاتورة مؤرشفة.
+        """
+        numbers = list(numbers)
+        if not numbers or not self.archive_exists():
+            return set()
+        table = archive_view()
+        return set(self.db.execute(
+            select(table.c.invoice_number).where(table.c.invoice_number.in_(numbers))
+        ).scalars())
+
+    def archive_invoices(self, retention_days: Optional[int] = None, batch_size: Optional[int] = None,
+                         now: Optional[datetime] = None, run_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        نقل الفواتير المؤهلة إلى الأرشيف على دفعات (commit لكل دفعة)
+
+        الحذف من invoices يتم عبر Core وليس عبر الـ ORM، فلا تُطرح الفواتير المؤرشفة من
+        جدول الملخص invoice_daily_rollups ولا تصدر أحداث تغيير حالة لها.
+
+        Args:
+            retention_days: عدد الأيام التي تبقى فيها الفواتير في الجدول الساخن
+            batch_size: عدد الفواتير في كل دفعة
+            now: الوقت الحالي (للاختبارات)
+            run_id: صف archive_runs المحجوز، يحدث تقدمه مع كل دفعة حتى لا يعد التشغيل متوقفًا
+
+        Returns:
+            قاموس يحتوي على عدد الفواتير المؤرشفة وتاريخ القطع
+        """
+        batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+        cutoff = archive_cutoff(retention_days, now)
+        closed_statuses = [s.strip() for s in settings.ARCHIVE_INVOICE_STATUSES.split(",") if s.strip()]
+        eta_statuses = [s.strip() for s in settings.ARCHIVE_ETA_STATUSES.split(",") if s.strip()]
+
+        invoice_table = models.Invoice.__table__
+        item_table = models.InvoiceItem.__table__
+        event_table = models.EtaEvent.__table__
+        archived = 0
+        while True:
+            invoices = (
+                self.db.query(models.Invoice)
+                .options(selectinload(models.Invoice.items))
+                .filter(
+                    models.Invoice.issue_date < cutoff,
+                    models.Invoice.status.in_(closed_statuses),
+                    models.Invoice.eta_status.in_(eta_statuses),
+                )
+                .order_by(models.Invoice.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not invoices:
+                break
+
+            ids = [invoice.id for invoice in invoices]
+            events_by_invoice = eta_events.invoice_eta_events(self.db, ids)
+            archived_at = datetime.utcnow()
+            rows_by_period: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+            for invoice in invoices:
+                rows_by_period[_period(invoice.issue_date)].append(
+                    self._archive_row(invoice, archived_at, events_by_invoice.get(invoice.id, []))
+                )
+            for period, rows in rows_by_period.items():
+                self._replace_archived(self.ensure_partition(period), rows)
+
+            self.db.execute(delete(event_table).where(event_table.c.invoice_id.in_(ids)))
+            self.db.execute(delete(item_table).where(item_table.c.invoice_id.in_(ids)))
+            self.db.execute(delete(invoice_table).where(invoice_table.c.id.in_(ids)))
+            archived += len(ids)
+            if run_id is not None:
+                run_table = models.ArchiveRun.__table__
+                self.db.execute(
+                    update(run_table).where(run_table.c.id == run_id)
+                    .values(archived=archived, updated_at=datetime.utcnow())
+                )
+            self.db.commit()
+            self.db.expunge_all()
+            logger.info(f"تم أرشفة {archived} فاتورة حتى الآن")
+
+        return {"archived": archived, "cutoff": cutoff}
+
+    def list_archived(self, user_id: int, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                      invoice_number: Optional[str] = None, skip: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        البحث في الفواتير المؤرشفة (بدون فك ضغط المحتوى)
+
+        تحديد الفترة يسمح لـ PostgreSQL باستبعاد الأقسام خارجها.
+
+        Returns:
+            قائمة بملخصات الفواتير المؤرشفة
+        """
+        if not self.archive_exists():
+            return []
+        table = archive_view()
+        query = select(*[c for c in table.c if c.name != "payload"]).where(table.c.user_id == user_id)
+        if start_date:
+            query = query.where(table.c.issue_date >= start_date)
+        if end_date:
+            query = query.where(table.c.issue_date <= end_date)
+        if invoice_number:
+            query = query.where(table.c.invoice_number == invoice_number)
+        query = query.order_by(table.c.issue_date.desc()).offset(skip).limit(limit)
+        return [dict(row._mapping) for row in self.db.execute(query)]
+
+    def get_archived(self, user_id: int, invoice_id: int) -> Optional[Dict[str, Any]]:
+        """
+        استرجاع الفاتورة المؤرشفة كاملة مع بنودها
+
+        Returns:
+            قاموس الفاتورة أو None إذا لم توجد
+        """
+        if not self.archive_exists():
+            return None
+        table = archive_view()
+        row = self.db.execute(
+            select(table.c.payload, table.c.archived_at)
+            .where(table.c.invoice_id == invoice_id, table.c.user_id == user_id)
+        ).first()
+        if row is None:
+            return None
+        data = json.loads(zlib.decompress(row.payload).decode("utf-8"))
+        data["archived_at"] = row.archived_at.isoformat() if isinstance(row.archived_at, datetime) else row.archived_at
+        return data
+
+
+def claim_archive_run(db: Session) -> bool:
+    """
+    حجز تشغيل الأرشفة بتحديث ذري في قاعدة البيانات
+
+    ينجح الحجز لطلب واحد فقط مهما كان عدد العمليات أو الخوادم. التشغيل الذي بقي running
+    دون دفعة جديدة لمدة ARCHIVE_RUN_STALE_SECONDS (مثل توقف العامل الذي كان يشغله) يمكن حجزه من جديد.
+
+    Returns:
+        True إذا تم حجز التشغيل، و False إذا كانت الأرشفة تعمل بالفعل
+    """
+    table = models.ArchiveRun.__table__
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=settings.ARCHIVE_RUN_STALE_SECONDS)
+    values = dict(status='running', archived=0, error=None, started_at=now, updated_at=now, completed_at=None)
+    result = db.execute(
+        update(table)
+        .where(
+            table.c.id == ARCHIVE_RUN_ID,
+            or_(table.c.status != 'running', table.c.updated_at < stale_before),
+        )
+        .values(**values)
+    )
+    if result.rowcount == 0:
+        # أول تشغيل لا يجد الصف؛ من الطلبات المتزامنة ينجح إدراج واحد فقط (المفتاح الأساسي)
+        if db.execute(select(table.c.id).where(table.c.id == ARCHIVE_RUN_ID)).first() is not None:
+            db.rollback()
+            return False
+        try:
+            db.execute(insert(table).values(id=ARCHIVE_RUN_ID, **values))
+        except IntegrityError:
+            db.rollback()
+            return False
+    db.commit()
+    return True
+
+
+def _finish_archive_run(db: Session, status: str, error: Optional[str] = None) -> None:
+    table = models.ArchiveRun.__table__
+    now = datetime.utcnow()
+    db.execute(
+        update(table).where(table.c.id == ARCHIVE_RUN_ID)
+        .values(status=status, error=error, updated_at=now, completed_at=now)
+    )
+    db.commit()
+
+
+def _run_archive_in_background(retention_days: Optional[int], now: datetime) -> None:
+    db = database.SessionLocal()
+    try:
+        result = InvoiceArchiveService(db).archive_invoices(retention_days=retention_days, now=now, run_id=ARCHIVE_RUN_ID)
+        _finish_archive_run(db, 'completed')
+        logger.info(f"انتهت الأرشفة: {result['archived']} فاتورة قبل {result['cutoff']}")
+    except Exception as e:
+        db.rollback()
+        # الدفعات المحفوظة تبقى مؤرشفة، ويكمل التشغيل التالي من حيث توقف هذا
+        logger.error(f"فشلت أرشفة الفواتير: {str(e)}")
+        _finish_archive_run(db, 'failed', str(e))
+    finally:
+        db.close()
+
+
+def submit_archive_run(db: Session, retention_days: Optional[int] = None,
+                       now: Optional[datetime] = None) -> Optional[Future]:
+    """
+    تشغيل الأرشفة في الخلفية دون انتظار انتهائها
+
+    Returns:
+        Future للتشغيل، أو None إذا كانت الأرشفة تعمل بالفعل
+    """
+    if not claim_archive_run(db):
+        return None
+    return archive_executor.submit(_run_archive_in_background, retention_days, now or datetime.utcnow())
@@ -167,7 +167,7 @@ class ETAService:
             net_total = sales_total - discount_amount
             
             # حساب الضريبة
-            tax_rate = float(item.get("tax_rate", settings.DEFAULT_TAX_RATE)) / 100
+            tax_rate = float(item.get("tax_rate", settings.TAX_RATE * 100)) / 100
             tax_amount = net_total * tax_rate
             
             # إجمالي العنصر
@@ -246,7 +246,7 @@ class ETAService:
             "documentType": "I",
             "documentTypeVersion": "1.0",
             "dateTimeIssued": invoice_data.get("issue_date", datetime.utcnow().isoformat()),
-            "taxpayerActivityCode": invoice_data.get("activity_code", settings.DEFAULT_ACTIVITY_CODE),
+            "taxpayerActivityCode": invoice_data.get("activity_code") or settings.DEFAULT_ACTIVITY_CODE,
             "internalID": invoice_data.get("invoice_number", ""),
             "invoiceLines": invoice_lines,
             "totalDiscountAmount": total_discount,
@@ -437,6 +437,18 @@ class ETAService:
             logger.error(f"خطأ في إلغاء الفاتورة: {str(e)}")
             raise Exception(f"خطأ في إلغاء الفاتورة: {str(e)}")
 
+    def prepare_invoice_data(self, invoice_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        تحضير مستند ETA من بيانات الفاتورة دون إرساله (لمن يجهز المستندات مسبقًا ثم يرسلها دفعات)
+        
+        Args:
+            invoice_data: بيانات الفاتورة
+            
+        Returns:
+            المستند بالتنسيق المطلوب لـ ETA
+        """
+        return self._prepare_invoice_data(invoice_data)
+
     def bulk_submit_invoices(self, invoices_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         إرسال مجموعة من الفواتير دفعة واحدة
@@ -451,22 +463,44 @@ class ETAService:
             Exception: في حالة فشل إرسال الفواتير
         """
         try:
-            logger.info(f"جاري إرسال {len(invoices_data)} فاتورة بشكل جماعي")
-            
             if not invoices_data:
                 raise ValueError("قائمة الفواتير فارغة")
             
-            # الحصول على توكن الوصول
-            access_token = self._get_access_token()
-            
             # تحضير بيانات الفواتير
             prepared_documents = []
             for invoice in invoices_data:
                 prepared_documents.append(self._prepare_invoice_data(invoice))
+        except Exception as e:
+            logger.error(f"خطأ في إرسال الفواتير بشكل جماعي: {str(e)}")
+            raise Exception(f"خطأ في إرسال الفواتير بشكل جماعي: {str(e)}")
+        
+        return self.submit_prepared_documents(prepared_documents)
+
+    def submit_prepared_documents(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        إرسال مستندات محضرة مسبقًا (من prepare_invoice_data) في طلب جماعي واحد
+        
+        Args:
+            documents: قائمة المستندات بتنسيق ETA
+            
+        Returns:
+            نتيجة عملية الإرسال الجماعي
+            
+        Raises:
+            Exception: في حالة فشل إرسال الفواتير
+        """
+        try:
+            logger.info(f"جاري إرسال {len(documents)} فاتورة بشكل جماعي")
+            
+            if not documents:
+                raise ValueError("قائمة الفواتير فارغة")
+            
+            # الحصول على توكن الوصول
+            access_token = self._get_access_token()
             
             # إعداد بيانات الإرسال الجماعي
             bulk_data = {
-                "documents": prepared_documents
+                "documents": documents
             }
             
             # توليد التوقيع الرقمي
@@ -486,7 +520,7 @@ class ETAService:
                     
                     if response.status_code in [200, 201, 202]:
                         result = response.json()
-                        logger.info(f"تم إرسال الفواتير بشكل جماعي بنجاح: {len(invoices_data)} فاتورة")
+                        logger.info(f"تم إرسال الفواتير بشكل جماعي بنجاح: {len(documents)} فاتورة")
                         return result
                     else:
                         logger.error(f"فشل إرسال الفواتير بشكل جماعي (المحاولة {attempt+1}/{self.max_retries}): {response.status_code} - {response.text}")
@@ -1,13 +1,74 @@
-import pandas as pd
+from __future__ import annotations
+
+import importlib.util
 import logging
 import os
-from typing import List, Dict, Any, Optional, Union
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
 from datetime import datetime
 import json
+from config import settings
+from lazy_import import LazyModule
+
+# pandas و numpy و openpyxl تُستورد عند أول استخدام فقط
+pd = LazyModule("pandas")
+np = LazyModule("numpy")
+openpyxl = LazyModule("openpyxl")
+# محرك CSV الاختياري المعتمد على Arrow (انظر IMPORT_CSV_ENGINE)
+pa = LazyModule("pyarrow")
+pa_csv = LazyModule("pyarrow.csv")
 
 # إعداد التسجيل
 logger = logging.getLogger(__name__)
 
+# حقول رأس الفاتورة حسب نوع الملف
+HEADER_FIELDS = {
+    'sales': ['issue_date', 'client_name', 'client_tax_number', 'client_address'],
+    'purchases': ['issue_date', 'supplier_name', 'supplier_tax_number', 'supplier_address'],
+}
+
+# حقول البنود، والحقول التي تحول إلى أرقام منها
+ITEM_FIELDS = ['item_description', 'item_code', 'quantity', 'unit_price', 'discount', 'tax_rate', 'total']
+NUMERIC_ITEM_FIELDS = ['quantity', 'unit_price', 'discount', 'tax_rate']
+NUMERIC_FIELDS = NUMERIC_ITEM_FIELDS + ['total']
+
+# الحقول التي يجب أن تكون موجودة ولها قيمة في كل صف
+REQUIRED_FIELDS = {
+    'sales': ['invoice_number', 'client_name', 'item_description', 'quantity', 'unit_price'],
+    'purchases': ['invoice_number', 'supplier_name', 'item_description', 'quantity', 'unit_price'],
+}
+
+# التحقق من الصفوف: أقصى عدد أخطاء يعاد تفصيلها (الملخص يشمل الكل)، وفرق الإجمالي المسموح به
+MAX_REPORTED_ERRORS = 1000
+TOTAL_TOLERANCE = 0.05
+VALIDATION_COLUMNS = ['row', 'field', 'code', 'value']
+
+def _blank(series: pd.Series) -> pd.Series:
+    """القيم الفارغة أو النصوص المكونة من مسافات فقط"""
+    return series.isna() | series.astype(str).str.strip().eq('')
+
+def _rates(values: Optional[pd.Series], default: float) -> Any:
+    """النسب تكتب كنسبة مئوية (14) أو ككسر (0.14)، بنفس قاعدة import_pipeline._rate"""
+    if values is None:
+        return default
+    values = values.fillna(default)
+    return np.where(values >= 1, values / 100, values)
+
+def _import_sheet(file_path: str, file_type: str, sheet_name: Union[int, str]) -> Dict[str, Any]:
+    """
+    استيراد ورقة واحدة داخل عملية منفصلة (دالة على مستوى الوحدة حتى يمكن تمريرها لـ ProcessPoolExecutor)
+
+    الأخطاء تعاد كجزء من النتيجة حتى لا يوقف ملف تالف بقية الدفعة.
+    """
+    try:
+        result = ExcelImportService().import_invoices(file_path, file_type, sheet_name)
+    except ValueError as e:
+        result = {'invoices': [], 'row_count': 0, 'validation': None, 'timings': {}, 'error': str(e)}
+    result['file'] = file_path
+    result['sheet'] = sheet_name
+    return result
+
 class ExcelImportService:
     """
     خدمة استيراد الفواتير من ملفات Excel
@@ -15,6 +76,8 @@ class ExcelImportService:
     تتيح هذه الخدمة:
     - استيراد فواتير المبيعات من ملفات Excel
     - استيراد فواتير المشتريات من ملفات Excel
+    - الاستيراد المتدفق للملفات الكبيرة على دفعات (iter_invoices)
+    - استيراد عدة ملفات وأوراق بالتوازي (import_batch)
     - التحقق من صحة بيانات الفواتير
     """
     
@@ -135,12 +198,7 @@ class ExcelImportService:
         Raises:
             ValueError: إذا كانت الأعمدة المطلوبة غير موجودة
         """
-        if file_type == 'sales':
-            required_columns = ['invoice_number', 'client_name', 'item_description', 'quantity', 'unit_price']
-        else:  # purchases
-            required_columns = ['invoice_number', 'supplier_name', 'item_description', 'quantity', 'unit_price']
-        
-        missing_columns = [col for col in required_columns if col not in actual_mapping]
+        missing_columns = [col for col in REQUIRED_FIELDS[file_type] if col not in actual_mapping]
         
         if missing_columns:
             raise ValueError(f"الأعمدة المطلوبة التالية غير موجودة في الملف: {', '.join(missing_columns)}")
@@ -169,13 +227,16 @@ class ExcelImportService:
         """
         تجميع العناصر حسب الفاتورة
         
+        تتم المعالجة على مستوى الأعمدة: تحويل الأعمدة الرقمية مرة واحدة، وقراءة بيانات
+        رأس الفاتورة بـ first() واحد مجمع، وبناء البنود من مصفوفات الأعمدة بدلًا من iterrows.
+        
         Args:
             df: DataFrame المراد تجميع عناصره
             actual_mapping: قاموس يحتوي على تعيين الأعمدة الفعلية
             file_type: نوع الملف (sales أو purchases)
             
         Returns:
-            قائمة بالفواتير، كل فاتورة تحتوي على قائمة بالعناصر
+            قائمة بالفواتير بترتيب ظهورها في الملف، كل فاتورة تحتوي على قائمة بالعناصر
         """
         # تحديد عمود معرف الفاتورة
         invoice_id_col = actual_mapping.get('invoice_number')
@@ -183,71 +244,586 @@ class ExcelImportService:
         if not invoice_id_col:
             raise ValueError("لم يتم العثور على عمود رقم الفاتورة")
         
-        # تجميع الصفوف حسب رقم الفاتورة
+        df = df[df[invoice_id_col].notna()]
+        if df.empty:
+            return []
+        
+        # رقم المجموعة لكل صف بترتيب أول ظهور للفاتورة، ثم ترتيب الصفوف حسب المجموعة مع الحفاظ على ترتيبها داخلها
+        codes, invoice_numbers = pd.factorize(df[invoice_id_col], sort=False)
+        order = np.argsort(codes, kind='stable')
+        boundaries = np.flatnonzero(np.diff(codes[order])) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(order)]))
+        
+        # أعمدة البنود: الأعمدة الرقمية تحول مرة واحدة (القيم غير الصالحة أو الفارغة تصبح 0)
+        item_columns = {}
+        for field in ITEM_FIELDS:
+            if field in actual_mapping:
+                column = df[actual_mapping[field]]
+                if field in NUMERIC_ITEM_FIELDS:
+                    column = pd.to_numeric(column, errors='coerce').fillna(0).astype(float)
+                item_columns[field] = column.to_numpy()[order].tolist()
+        item_fields = list(item_columns)
+        item_rows = list(zip(*item_columns.values())) if item_columns else [()] * len(order)
+        
+        # بيانات رأس الفاتورة (العميل أو المورد) من أول قيمة في كل مجموعة
+        header_fields = [field for field in HEADER_FIELDS[file_type] if field in actual_mapping]
+        headers = df.groupby(codes, sort=True)[[actual_mapping[field] for field in header_fields]].first()
+        header_values = {field: headers[actual_mapping[field]].tolist() for field in header_fields}
+        
+        # رقم أول وآخر سطر للفاتورة في الملف (بعد سطر العناوين)
+        first_rows = (df.index.to_numpy()[order][starts] + 2).tolist()
+        end_rows = (df.index.to_numpy()[order][ends - 1] + 2).tolist()
+        invoice_numbers = invoice_numbers.tolist()
+        
         invoices = []
-        for invoice_number, group in df.groupby(invoice_id_col):
-            # إنشاء قاموس للفاتورة
-            invoice = {}
-            
-            # إضافة معلومات الفاتورة
-            if file_type == 'sales':
-                invoice['invoice_number'] = invoice_number
-                
-                # إضافة معلومات العميل من أول صف في المجموعة
-                first_row = group.iloc[0]
-                for field in ['issue_date', 'client_name', 'client_tax_number', 'client_address']:
-                    if field in actual_mapping and actual_mapping[field] in first_row:
-                        invoice[field] = first_row[actual_mapping[field]]
-                
-                # إضافة العناصر
-                invoice['items'] = []
-                for _, row in group.iterrows():
-                    item = {}
-                    for field in ['item_description', 'item_code', 'quantity', 'unit_price', 'discount', 'tax_rate', 'total']:
-                        if field in actual_mapping and actual_mapping[field] in row:
-                            item[field] = row[actual_mapping[field]]
-                    
-                    # التأكد من وجود القيم الرقمية
-                    for numeric_field in ['quantity', 'unit_price', 'discount', 'tax_rate']:
-                        if numeric_field in item:
-                            try:
-                                item[numeric_field] = float(item[numeric_field])
-                            except (ValueError, TypeError):
-                                item[numeric_field] = 0
-                    
-                    invoice['items'].append(item)
-            
-            else:  # purchases
-                invoice['invoice_number'] = invoice_number
-                
-                # إضافة معلومات المورد من أول صف في المجموعة
-                first_row = group.iloc[0]
-                for field in ['issue_date', 'supplier_name', 'supplier_tax_number', 'supplier_address']:
-                    if field in actual_mapping and actual_mapping[field] in first_row:
-                        invoice[field] = first_row[actual_mapping[field]]
-                
-                # إضافة العناصر
-                invoice['items'] = []
-                for _, row in group.iterrows():
-                    item = {}
-                    for field in ['item_description', 'item_code', 'quantity', 'unit_price', 'discount', 'tax_rate', 'total']:
-                        if field in actual_mapping and actual_mapping[field] in row:
-                            item[field] = row[actual_mapping[field]]
-                    
-                    # التأكد من وجود القيم الرقمية
-                    for numeric_field in ['quantity', 'unit_price', 'discount', 'tax_rate']:
-                        if numeric_field in item:
-                            try:
-                                item[numeric_field] = float(item[numeric_field])
-                            except (ValueError, TypeError):
-                                item[numeric_field] = 0
-                    
-                    invoice['items'].append(item)
-            
+        for group, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+            invoice = {
+                'source_row': first_rows[group], 'source_end_row': end_rows[group],
+                'invoice_number': invoice_numbers[group],
+            }
+            for field in header_fields:
+                invoice[field] = header_values[field][group]
+            invoice['items'] = [dict(zip(item_fields, row)) for row in item_rows[start:end]]
             invoices.append(invoice)
         
         return invoices
     
+    def validate_rows(self, df: pd.DataFrame, actual_mapping: Dict[str, str], file_type: str) -> pd.DataFrame:
+        """
+        التحقق من صفوف الورقة كلها مرة واحدة على مستوى الأعمدة
+
+        الأخطاء التي يتم اكتشافها (code):
+        - missing_value: حقل مطلوب فارغ
+        - invalid_number: قيمة غير رقمية في حقل رقمي (يحولها التجميع إلى 0)
+        - total_mismatch: الإجمالي لا يساوي الكمية × السعر − الخصم + الضريبة
+        - conflicting_duplicate: رقم فاتورة مكرر ببيانات رأس (العميل/المورد أو التاريخ) مختلفة عن أول صف له
+        - non_contiguous_duplicate: رقم فاتورة يظهر مرة أخرى بعد صفوف فاتورة أخرى (تضم بنوده إلى
+          الفاتورة الأولى في الاستيراد الكامل، ويوقف الاستيراد المتدفق)
+        - invalid_tax_number: رقم ضريبي ليس من 9 أرقام كما كتب في الملف (يقرأ كنص فتبقى الأصفار البادئة)
+
+        الخصم ونسبة الضريبة نسب (مئوية أو كسر) كما في حفظ الفواتير وإرسالها لـ ETA.
+
+        Args:
+            df: البيانات كما قرئت (قبل التجميع)
+            actual_mapping: قاموس يحتوي على تعيين الأعمدة الفعلية
+            file_type: نوع الملف (sales أو purchases)
+
+        Returns:
+            جدول أخطاء بالأعمدة row (رقم السطر في الملف) و field و code و value، مرتب حسب السطر
+        """
+        rows = df.index.to_numpy() + 2
+        frames = []
+
+        def flag(mask, field: str, code: str) -> None:
+            mask = np.asarray(mask, dtype=bool)
+            if mask.any():
+                frames.append(pd.DataFrame({
+                    'row': rows[mask],
+                    'field': field,
+                    'code': code,
+                    'value': df[actual_mapping[field]].to_numpy()[mask].astype(str),
+                }))
+
+        for field in REQUIRED_FIELDS[file_type]:
+            if field in actual_mapping:
+                flag(_blank(df[actual_mapping[field]]), field, 'missing_value')
+
+        numbers = {}
+        for field in NUMERIC_FIELDS:
+            if field in actual_mapping:
+                raw = df[actual_mapping[field]]
+                numbers[field] = pd.to_numeric(raw, errors='coerce')
+                flag(numbers[field].isna() & ~_blank(raw), field, 'invalid_number')
+
+        if {'quantity', 'unit_price', 'total'} <= numbers.keys():
+            sales_total = numbers['quantity'] * numbers['unit_price']
+            net = sales_total * (1 - _rates(numbers.get('discount'), 0.0))
+            expected = net * (1 + _rates(numbers.get('tax_rate'), settings.TAX_RATE))
+            total = numbers['total']
+            comparable = (total.notna() & expected.notna()).to_numpy()
+            close = np.isclose(total.to_numpy(dtype=float), expected.to_numpy(dtype=float), rtol=1e-3, atol=TOTAL_TOLERANCE)
+            flag(comparable & ~close, 'total', 'total_mismatch')
+
+        invoice_col = actual_mapping.get('invoice_number')
+        if invoice_col is not None:
+            header_fields = [field for field in HEADER_FIELDS[file_type] if field in actual_mapping]
+            groups = df.groupby(df[invoice_col], sort=False)
+            for field in header_fields:
+                column = df[actual_mapping[field]]
+                first = groups[actual_mapping[field]].transform('first')
+                flag(column.notna() & first.notna() & (column.astype(str) != first.astype(str)), field, 'conflicting_duplicate')
+
+            # كل سلسلة صفوف متتالية لنفس الرقم تبدأ عند تغير الرقم؛ الصفوف خارج أول سلسلة للرقم مكررة
+            numbers = df[invoice_col][df[invoice_col].notna()].astype(str)
+            run_ids = (numbers != numbers.shift()).cumsum()
+            first_run = run_ids.groupby(numbers, sort=False).transform('first')
+            repeated = (run_ids != first_run).reindex(df.index, fill_value=False)
+            flag(repeated, 'invoice_number', 'non_contiguous_duplicate')
+
+        tax_field = 'client_tax_number' if file_type == 'sales' else 'supplier_tax_number'
+        if tax_field in actual_mapping:
+            column = df[actual_mapping[tax_field]]
+            text = column.astype(str).str.strip()
+            if pd.api.types.is_float_dtype(column):
+                text = text.str.replace(r'\.0$', '', regex=True)
+            flag(~_blank(column) & ~text.str.fullmatch(r'\d{9}'), tax_field, 'invalid_tax_number')
+
+        if not frames:
+            return pd.DataFrame(columns=VALIDATION_COLUMNS)
+        return pd.concat(frames, ignore_index=True).sort_values('row', kind='stable', ignore_index=True)
+
+    @staticmethod
+    def _validation_report(errors: pd.DataFrame) -> Dict[str, Any]:
+        """ملخص مختصر لجدول الأخطاء: العدد الكلي، والعدد لكل نوع، وأول MAX_REPORTED_ERRORS خطأ"""
+        return {
+            'total': len(errors),
+            'summary': {code: int(count) for code, count in errors.groupby('code').size().items()},
+            'errors': errors.head(MAX_REPORTED_ERRORS).to_dict('records'),
+        }
+
+    @staticmethod
+    def _csv_engine() -> str:
+        """
+        محرك قراءة ملفات CSV حسب IMPORT_CSV_ENGINE
+
+        auto يختار pyarrow إذا كانت المكتبة مثبتة وإلا pandas.
+        """
+        engine = settings.IMPORT_CSV_ENGINE.lower()
+        has_pyarrow = importlib.util.find_spec('pyarrow') is not None
+        if engine == 'auto':
+            return 'pyarrow' if has_pyarrow else 'pandas'
+        if engine == 'pyarrow' and not has_pyarrow:
+            raise ValueError("IMPORT_CSV_ENGINE=pyarrow لكن مكتبة pyarrow غير مثبتة")
+        if engine not in ('pyarrow', 'pandas'):
+            raise ValueError(f"محرك CSV غير مدعوم: {engine}")
+        return engine
+
+    def _csv_column_types(self, file_type: str, numeric: bool = True) -> Dict[str, Any]:
+        """
+        أنواع أعمدة CSV الصريحة من تعيين الأعمدة (لكل الأسماء البديلة لكل حقل)
+
+        الحقول النصية (رقم الفاتورة، الأرقام الضريبية، الأكواد) تقرأ كنصوص حتى لا تضيع
+        الأصفار البادئة، والحقول الرقمية كـ float64 بدلًا من استنتاج النوع لكل عمود.
+        """
+        column_types = {}
+        for field, names in self._get_column_mapping(file_type).items():
+            if field in NUMERIC_FIELDS:
+                if not numeric:
+                    continue
+                column_type = pa.float64()
+            else:
+                column_type = pa.string()
+            for name in names:
+                column_types[name] = column_type
+        return column_types
+
+    def _text_dtypes(self, file_type: str) -> Dict[str, Any]:
+        """
+        أنواع pandas الصريحة للحقول النصية، بنفس تعيين الأعمدة الذي يستخدمه محرك Arrow
+
+        حتى يعطي الملف نفسه أرقام الفواتير والأرقام الضريبية نفسها في كل مسارات القراءة
+        (CSV و Excel)، ويتم التحقق منها كما كتبت؛ الحقول الرقمية تترك لاستنتاج pandas
+        ثم تحول بـ to_numeric.
+        """
+        return {
+            name: str
+            for field, names in self._get_column_mapping(file_type).items()
+            if field not in NUMERIC_FIELDS
+            for name in names
+        }
+
+    def _read_csv(self, file_path: str, file_type: str) -> pd.DataFrame:
+        """
+        قراءة ملف CSV كاملًا بالمحرك المحدد
+
+        مع pyarrow: تحليل متعدد الـ threads بأنواع أعمدة صريحة، ثم تحويل إلى DataFrame
+        (الأعمدة الرقمية بدون قيم فارغة تنقل دون نسخ). إذا احتوى عمود رقمي على قيم غير
+        رقمية يعاد التحليل مع ترك الأعمدة الرقمية لاستنتاج Arrow، فتحول لاحقًا بـ to_numeric.
+        """
+        if self._csv_engine() == 'pandas':
+            return pd.read_csv(file_path, dtype=self._text_dtypes(file_type))
+
+        read_options = pa_csv.ReadOptions(use_threads=True)
+        try:
+            table = pa_csv.read_csv(
+                file_path,
+                read_options=read_options,
+                convert_options=pa_csv.ConvertOptions(
+                    column_types=self._csv_column_types(file_type), strings_can_be_null=True
+                ),
+            )
+        except pa.ArrowInvalid as e:
+            logger.warning(f"قيم غير رقمية في أعمدة رقمية، إعادة التحليل بدون أنواع رقمية: {str(e)}")
+            table = pa_csv.read_csv(
+                file_path,
+                read_options=read_options,
+                convert_options=pa_csv.ConvertOptions(
+                    column_types=self._csv_column_types(file_type, numeric=False), strings_can_be_null=True
+                ),
+            )
+        return table.to_pandas()
+
+    def _read_chunks(self, file_path: str, file_type: str, chunk_rows: int, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+        """
+        قراءة الملف على دفعات من الصفوف دون تحميله كاملًا في الذاكرة
+
+        فهرس كل دفعة يكمل فهرس الدفعة السابقة (رقم الصف في الملف بدون سطر العناوين).
+        ملفات xls القديمة لا تدعم القراءة المتدفقة فتُقرأ كاملة ثم تقسم.
+
+        Args:
+            file_path: مسار الملف
+            file_type: نوع الملف (لأنواع الأعمدة النصية)
+            chunk_rows: عدد الصفوف في كل دفعة
+            skip_rows: عدد صفوف البيانات الأولى التي يتم تخطيها دون تحويلها (للاستئناف)
+
+        Returns:
+            مولد يعيد DataFrame لكل دفعة
+        """
+        _, ext = os.path.splitext(file_path)
+        ext = ext.lower()
+
+        if ext == '.csv':
+            chunks = pd.read_csv(
+                file_path, chunksize=chunk_rows, skiprows=range(1, skip_rows + 1),
+                dtype=self._text_dtypes(file_type),
+            )
+            for chunk in chunks:
+                chunk.index += skip_rows
+                yield chunk
+            return
+
+        if ext == '.xls':
+            df = pd.read_excel(file_path, dtype=self._text_dtypes(file_type))
+            for start in range(skip_rows, len(df), chunk_rows):
+                yield df.iloc[start:start + chunk_rows]
+            return
+
+        # xlsx: وضع القراءة فقط في openpyxl يقرأ الصفوف من XML بشكل متدفق
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+            text_dtypes = self._text_dtypes(file_type)
+            text_columns = [i for i, name in enumerate(columns) if name in text_dtypes]
+
+            # الفهرس رقم الصف الفعلي في الورقة، فالصفوف الفارغة تتخطى لكنها تحسب في أرقام السطور ونقطة الاستئناف
+            buffer, index = [], []
+            for position, row in enumerate(rows):
+                if position < skip_rows or all(value is None for value in row):
+                    continue
+                buffer.append(row[:len(columns)])
+                index.append(position)
+                if len(buffer) >= chunk_rows:
+                    yield self._rows_frame(buffer, columns, index, text_columns)
+                    buffer, index = [], []
+            if buffer:
+                yield self._rows_frame(buffer, columns, index, text_columns)
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def _rows_frame(rows: List[tuple], columns: List[str], index: List[int], text_columns: List[int]) -> pd.DataFrame:
+        """
+        DataFrame من صفوف openpyxl مع الأعمدة النصية كنصوص، كما يفعل dtype=str في pandas
+
+        الأعمدة النصية تحول من القيم الأصلية قبل أن يستنتج pandas نوعها (وإلا تصبح 1001 مع
+        خلية فارغة 1001.0).
+        """
+        df = pd.DataFrame(rows, columns=columns, index=index)
+        for position in text_columns:
+            df[columns[position]] = pd.Series(
+                [str(row[position]) if position < len(row) and row[position] is not None else None for row in rows],
+                index=index, dtype=object,
+            )
+        return df
+
+    @staticmethod
+    def _invoice_number_keys(series: pd.Series) -> pd.Series:
+        """توحيد أرقام الفواتير كنصوص حتى تتطابق بين الدفعات مهما كان النوع المستنتج لكل دفعة"""
+        if pd.api.types.is_float_dtype(series) and (series % 1 == 0).all():
+            series = series.astype('int64')
+        return series.astype(str)
+
+    def iter_invoices(self, file_path: str, file_type: str, chunk_rows: Optional[int] = None,
+                      start_row: int = 0, errors: Optional[List[Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        استيراد متدفق: يعيد الفواتير المكتملة واحدة تلو الأخرى أثناء قراءة الملف
+
+        الذاكرة المستخدمة محدودة بحجم الدفعة وليس بحجم الملف. يشترط أن تكون بنود كل
+        فاتورة في صفوف متتالية (وهو شكل ملفات التصدير الشهرية)؛ الفاتورة المفتوحة في
+        آخر الدفعة تبقى معلقة حتى يظهر رقم فاتورة مختلف.
+
+        Args:
+            file_path: مسار الملف
+            file_type: نوع الملف (sales أو purchases)
+            chunk_rows: عدد الصفوف في كل دفعة (الافتراضي IMPORT_CHUNK_ROWS)
+            start_row: عدد صفوف البيانات المحفوظة سابقًا التي يبدأ الاستيراد بعدها (نقطة استئناف)
+            errors: قائمة تضاف إليها أخطاء الصفوف (validate_rows) لكل دفعة بترتيب السطور؛
+                تكرار رقم الفاتورة ببيانات مختلفة يكتشف داخل الدفعة الواحدة فقط
+
+        Returns:
+            مولد يعيد الفواتير بنفس شكل import_sales_invoices / import_purchase_invoices
+
+        Raises:
+            ValueError: إذا كان الملف غير صالح أو ظهر رقم فاتورة مرة أخرى بعد انتهاء بنودها
+        """
+        self._check_file(file_path)
+
+        chunk_rows = chunk_rows or settings.IMPORT_CHUNK_ROWS
+        column_mapping = self._get_column_mapping(file_type)
+        actual_mapping = None
+        pending = None  # آخر فاتورة في الدفعة السابقة، قد تكمل بنودها في الدفعة التالية
+        completed = set()
+        count = 0
+
+        logger.info(f"جاري الاستيراد المتدفق لفواتير {file_type} من الملف: {file_path}")
+        for chunk in self._read_chunks(file_path, file_type, chunk_rows, start_row):
+            if actual_mapping is None:
+                actual_mapping = self._map_columns(chunk, column_mapping)
+                self._validate_required_columns(actual_mapping, file_type)
+            invoice_col = actual_mapping['invoice_number']
+            if errors is not None:
+                errors.extend(self.validate_rows(chunk, actual_mapping, file_type).to_dict('records'))
+
+            chunk = chunk[chunk[invoice_col].notna()].copy()
+            if chunk.empty:
+                continue
+            chunk[invoice_col] = self._invoice_number_keys(chunk[invoice_col])
+            if 'issue_date' in actual_mapping:
+                chunk = self._process_date_column(chunk, actual_mapping['issue_date'])
+
+            # كل رقم فاتورة يجب أن يظهر في سلسلة صفوف متتالية واحدة داخل الدفعة
+            numbers = chunk[invoice_col]
+            runs = numbers[numbers != numbers.shift()]
+            repeated = runs[runs.duplicated()]
+            if not repeated.empty:
+                raise ValueError(
+                    f"رقم الفاتورة {repeated.iloc[0]} يظهر مرة أخرى في السطر {int(repeated.index[0]) + 2}؛ "
+                    "الاستيراد المتدفق يتطلب أن تكون بنود كل فاتورة في صفوف متتالية"
+                )
+
+            invoices = self._group_items_by_invoice(chunk, actual_mapping, file_type)
+            if pending is not None and invoices[0]['invoice_number'] == pending['invoice_number']:
+                continued = invoices.pop(0)
+                pending['items'].extend(continued['items'])
+                pending['source_end_row'] = continued['source_end_row']
+            for invoice in invoices:
+                if invoice['invoice_number'] in completed:
+                    raise ValueError(
+                        f"رقم الفاتورة {invoice['invoice_number']} يظهر مرة أخرى في السطر {invoice['source_row']}؛ "
+                        "الاستيراد المتدفق يتطلب أن تكون بنود كل فاتورة في صفوف متتالية"
+                    )
+                if pending is not None:
+                    completed.add(pending['invoice_number'])
+                    count += 1
+                    yield pending
+                pending = invoice
+
+        if actual_mapping is None and not start_row:
+            raise ValueError(f"الملف فارغ: {file_path}")
+        if pending is not None:
+            count += 1
+            yield pending
+        logger.info(f"تم الاستيراد المتدفق لـ {count} فاتورة {file_type}")
+
+    def _check_file(self, file_path: str) -> str:
+        """
+        التحقق من وجود الملف ونوعه دون قراءته
+
+        Returns:
+            امتداد الملف بحروف صغيرة
+        """
+        if not os.path.exists(file_path):
+            raise ValueError(f"الملف غير موجود: {file_path}")
+        _, ext = os.path.splitext(file_path)
+        ext = ext.lower()
+        if ext not in ['.xlsx', '.xls', '.csv']:
+            raise ValueError(f"نوع الملف غير مدعوم: {ext}. يجب أن يكون .xlsx أو .xls أو .csv")
+        return ext
+
+    def import_invoices(self, file_path: str, file_type: str, sheet_name: Union[int, str] = 0) -> Dict[str, Any]:
+        """
+        استيراد الفواتير من ملف Excel أو CSV بفتح الملف وقراءته مرة واحدة
+
+        يتم التحقق من الأعمدة من نفس البيانات المقروءة بدلًا من قراءة الملف مرتين
+        (مرة للتحقق ومرة للاستيراد).
+
+        Args:
+            file_path: مسار الملف
+            file_type: نوع الملف (sales أو purchases)
+            sheet_name: اسم أو رقم الورقة في ملفات Excel
+
+        Returns:
+            قاموس يحتوي على:
+            - invoices: قائمة الفواتير
+            - row_count: عدد الصفوف المقروءة
+            - validation: جدول أخطاء الصفوف (total و summary لكل نوع و errors بحد أقصى MAX_REPORTED_ERRORS)
+            - timings: زمن كل مرحلة بالثواني (open, parse, map, validate, group)
+
+        Raises:
+            ValueError: إذا كان الملف غير صالح أو البيانات غير مكتملة
+        """
+        label = 'المبيعات' if file_type == 'sales' else 'المشتريات'
+        timings = {}
+        try:
+            logger.info(f"جاري استيراد فواتير {label} من الملف: {file_path}")
+
+            # فتح الملف (فك ضغط xlsx وقراءة فهرس الأوراق مرة واحدة)
+            started = time.perf_counter()
+            ext = self._check_file(file_path)
+            excel_file = None if ext == '.csv' else pd.ExcelFile(file_path)
+            timings['open'] = time.perf_counter() - started
+
+            try:
+                # قراءة البيانات
+                started = time.perf_counter()
+                if excel_file is None:
+                    df = self._read_csv(file_path, file_type)
+                else:
+                    df = excel_file.parse(sheet_name=sheet_name, dtype=self._text_dtypes(file_type))
+                timings['parse'] = time.perf_counter() - started
+            finally:
+                if excel_file is not None:
+                    excel_file.close()
+
+            # تعيين الأعمدة والتحقق منها من نفس البيانات المقروءة
+            started = time.perf_counter()
+            actual_mapping = self._map_columns(df, self._get_column_mapping(file_type))
+            self._validate_required_columns(actual_mapping, file_type)
+            timings['map'] = time.perf_counter() - started
+
+            # التحقق من كل الصفوف مرة واحدة قبل تحويل الأعمدة
+            started = time.perf_counter()
+            validation = self._validation_report(self.validate_rows(df, actual_mapping, file_type))
+            if 'issue_date' in actual_mapping:
+                df = self._process_date_column(df, actual_mapping['issue_date'])
+            timings['validate'] = time.perf_counter() - started
+
+            # تجميع العناصر حسب الفاتورة
+            started = time.perf_counter()
+            invoices = self._group_items_by_invoice(df, actual_mapping, file_type)
+            timings['group'] = time.perf_counter() - started
+
+            logger.info(f"تم استيراد {len(invoices)} فاتورة {label} بنجاح ({validation['total']} خطأ في الصفوف)")
+
+            return {'invoices': invoices, 'row_count': len(df), 'validation': validation, 'timings': timings}
+
+        except Exception as e:
+            logger.error(f"خطأ في استيراد فواتير {label}: {str(e)}")
+            raise ValueError(f"خطأ في استيراد فواتير {label}: {str(e)}")
+
+    def _sheet_tasks(self, file_path: str) -> List[Tuple[str, Union[int, str]]]:
+        """
+        قائمة أوراق الملف المطلوب استيرادها (ورقة واحدة لملفات CSV)
+
+        قائمة أوراق xlsx تقرأ من workbook.xml فقط في وضع القراءة، دون تحليل بيانات الأوراق.
+        """
+        ext = self._check_file(file_path)
+        if ext == '.csv':
+            return [(file_path, 0)]
+        if ext == '.xlsx':
+            workbook = openpyxl.load_workbook(file_path, read_only=True)
+            try:
+                sheet_names = workbook.sheetnames
+            finally:
+                workbook.close()
+        else:
+            with pd.ExcelFile(file_path) as excel_file:
+                sheet_names = excel_file.sheet_names
+        return [(file_path, sheet_name) for sheet_name in sheet_names]
+
+    def import_batch(self, file_paths: List[str], file_type: str, max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        استيراد مجموعة ملفات (وكل أوراقها) بالتوازي على عدة أنوية
+
+        كل ورقة تستورد في عملية منفصلة عبر ProcessPoolExecutor، ثم تدمج النتائج بترتيب
+        الملفات والأوراق مع اكتشاف أرقام الفواتير المكررة بين الملفات: أول ظهور للرقم
+        يعتمد، والتكرارات تستبعد وتذكر في التقرير.
+
+        Args:
+            file_paths: مسارات الملفات
+            file_type: نوع الملفات (sales أو purchases)
+            max_workers: عدد العمليات (الافتراضي IMPORT_WORKERS أو عدد الأنوية)
+
+        Returns:
+            تقرير موحد يحتوي على:
+            - invoices: الفواتير المدمجة (مع source_file و source_sheet لكل فاتورة)
+            - duplicates: الفواتير المستبعدة لتكرار أرقامها ومكان ظهورها الأول
+            - errors: الملفات أو الأوراق التي فشل استيرادها
+            - sheets: عدد الصفوف والفواتير وتقرير التحقق وأزمنة المراحل لكل ورقة
+            - totals: الإجماليات وزمن التنفيذ
+        """
+        started = time.perf_counter()
+        self._get_column_mapping(file_type)
+
+        tasks: List[Tuple[str, Union[int, str]]] = []
+        errors: List[Dict[str, Any]] = []
+        for file_path in file_paths:
+            try:
+                tasks.extend(self._sheet_tasks(file_path))
+            except Exception as e:
+                errors.append({'file': file_path, 'sheet': None, 'error': str(e)})
+
+        max_workers = max_workers or settings.IMPORT_WORKERS or os.cpu_count() or 1
+        if len(tasks) <= 1 or max_workers == 1:
+            results = [_import_sheet(file_path, file_type, sheet_name) for file_path, sheet_name in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+                # map يحافظ على ترتيب المهام، فيكون "أول ظهور" للفاتورة ثابتًا بين التشغيلات
+                results = list(executor.map(
+                    _import_sheet,
+                    [file_path for file_path, _ in tasks],
+                    [file_type] * len(tasks),
+                    [sheet_name for _, sheet_name in tasks],
+                ))
+
+        invoices: List[Dict[str, Any]] = []
+        duplicates: List[Dict[str, Any]] = []
+        sheets: List[Dict[str, Any]] = []
+        first_seen: Dict[str, Dict[str, Any]] = {}
+        for result in results:
+            if 'error' in result:
+                errors.append({'file': result['file'], 'sheet': result['sheet'], 'error': result['error']})
+                continue
+            sheets.append({
+                'file': result['file'],
+                'sheet': result['sheet'],
+                'row_count': result['row_count'],
+                'invoices': len(result['invoices']),
+                'validation': result['validation'],
+                'timings': result['timings'],
+            })
+            for invoice in result['invoices']:
+                location = {'file': result['file'], 'sheet': result['sheet'], 'source_row': invoice.get('source_row')}
+                key = str(invoice['invoice_number'])
+                if key in first_seen:
+                    duplicates.append({'invoice_number': key, 'first': first_seen[key], 'duplicate': location})
+                    continue
+                first_seen[key] = location
+                invoice['source_file'] = result['file']
+                invoice['source_sheet'] = result['sheet']
+                invoices.append(invoice)
+
+        totals = {
+            'files': len(file_paths),
+            'sheets': len(sheets),
+            'rows': sum(sheet['row_count'] for sheet in sheets),
+            'invoices': len(invoices),
+            'duplicates': len(duplicates),
+            'errors': len(errors),
+            'row_errors': sum(sheet['validation']['total'] for sheet in sheets),
+            'seconds': time.perf_counter() - started,
+        }
+        logger.info(
+            f"تم استيراد {totals['invoices']} فاتورة من {totals['sheets']} ورقة في {totals['files']} ملف "
+            f"({totals['duplicates']} مكررة، {totals['errors']} خطأ)"
+        )
+        return {'invoices': invoices, 'duplicates': duplicates, 'errors': errors, 'sheets': sheets, 'totals': totals}
+
     def import_sales_invoices(self, file_path: str) -> List[Dict[str, Any]]:
         """
         استيراد فواتير المبيعات من ملف Excel
@@ -261,40 +837,7 @@ class ExcelImportService:
         Raises:
             ValueError: إذا كان الملف غير صالح أو البيانات غير مكتملة
         """
-        try:
-            logger.info(f"جاري استيراد فواتير المبيعات من الملف: {file_path}")
-            
-            # التحقق من صحة الملف
-            self.validate_excel_file(file_path)
-            
-            # قراءة الملف
-            _, ext = os.path.splitext(file_path)
-            if ext.lower() == '.csv':
-                df = pd.read_csv(file_path)
-            else:
-                df = pd.read_excel(file_path)
-            
-            # الحصول على تعيين الأعمدة
-            column_mapping = self._get_column_mapping('sales')
-            actual_mapping = self._map_columns(df, column_mapping)
-            
-            # التحقق من وجود الأعمدة المطلوبة
-            self._validate_required_columns(actual_mapping, 'sales')
-            
-            # معالجة عمود التاريخ
-            if 'issue_date' in actual_mapping:
-                df = self._process_date_column(df, actual_mapping['issue_date'])
-            
-            # تجميع العناصر حسب الفاتورة
-            invoices = self._group_items_by_invoice(df, actual_mapping, 'sales')
-            
-            logger.info(f"تم استيراد {len(invoices)} فاتورة مبيعات بنجاح")
-            
-            return invoices
-        
-        except Exception as e:
-            logger.error(f"خطأ في استيراد فواتير المبيعات: {str(e)}")
-            raise ValueError(f"خطأ في استيراد فواتير المبيعات: {str(e)}")
+        return self.import_invoices(file_path, 'sales')['invoices']
     
     def import_purchase_invoices(self, file_path: str) -> List[Dict[str, Any]]:
         """
@@ -309,40 +852,7 @@ class ExcelImportService:
         Raises:
             ValueError: إذا كان الملف غير صالح أو البيانات غير مكتملة
         """
-        try:
-            logger.info(f"جاري استيراد فواتير المشتريات من الملف: {file_path}")
-            
-            # التحقق من صحة الملف
-            self.validate_excel_file(file_path)
-            
-            # قراءة الملف
-            _, ext = os.path.splitext(file_path)
-            if ext.lower() == '.csv':
-                df = pd.read_csv(file_path)
-            else:
-                df = pd.read_excel(file_path)
-            
-            # الحصول على تعيين الأعمدة
-            column_mapping = self._get_column_mapping('purchases')
-            actual_mapping = self._map_columns(df, column_mapping)
-            
-            # التحقق من وجود الأعمدة المطلوبة
-            self._validate_required_columns(actual_mapping, 'purchases')
-            
-            # معالجة عمود التاريخ
-            if 'issue_date' in actual_mapping:
-                df = self._process_date_column(df, actual_mapping['issue_date'])
-            
-            # تجميع العناصر حسب الفاتورة
-            invoices = self._group_items_by_invoice(df, actual_mapping, 'purchases')
-            
-            logger.info(f"تم استيراد {len(invoices)} فاتورة مشتريات بنجاح")
-            
-            return invoices
-        
-        except Exception as e:
-            logger.error(f"خطأ في استيراد فواتير المشتريات: {str(e)}")
-            raise ValueError(f"خطأ في استيراد فواتير المشتريات: {str(e)}")
+        return self.import_invoices(file_path, 'purchases')['invoices']
     
     def export_template(self, file_path: str, file_type: str) -> str:
         """
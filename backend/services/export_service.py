@@ -0,0 +1,198 @@
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Session, selectinload
+
+import models
+import queries
+
+# إعداد التسجيل
+logger = logging.getLogger(__name__)
+
+# أعمدة الفاتورة المصدرة بالترتيب
+INVOICE_FIELDS = [
+    'id', 'invoice_number', 'client_name', 'client_email', 'client_phone',
+    'client_address', 'client_type', 'client_tax_number', 'issue_date', 'due_date',
+    'amount', 'tax_amount', 'total_amount', 'status', 'payment_method', 'notes',
+    'activity_code', 'eta_submission_id', 'eta_status', 'eta_submission_date',
+    'created_at', 'updated_at',
+]
+
+# أعمدة بنود الفاتورة المصدرة بالترتيب
+ITEM_FIELDS = [
+    'id', 'description', 'item_code', 'item_type', 'unit_type', 'quantity',
+    'unit_price', 'total', 'discount_rate', 'discount_amount', 'tax_rate', 'tax_amount',
+]
+
+
+def _serialize_value(value: Any) -> Any:
+    """تحويل القيم غير القابلة للتسلسل (التواريخ) إلى نصوص"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def invoice_to_dict(invoice: models.Invoice, extra_fields: List[str] = ()) -> Dict[str, Any]:
+    """تحويل الفاتورة وبنودها إلى قاموس قابل للتسلسل"""
+    data = {field: _serialize_value(getattr(invoice, field)) for field in [*INVOICE_FIELDS, *extra_fields]}
+    data['items'] = [
+        {field: _serialize_value(getattr(item, field)) for field in ITEM_FIELDS}
+        for item in invoice.items
+    ]
+    return data
+
+
+class InvoiceExportService:
+    """
+    خدمة تصدير الفواتير بشكل متدفق
+
+    تقرأ الفواتير من قاعدة البيانات باستخدام مؤشر من جهة الخادم (yield_per)
+    وتكتبها على دفعات صغيرة بتنسيق NDJSON أو CSV، بحيث يبقى استهلاك الذاكرة
+    ثابتًا مهما كان عدد الفواتير ويبدأ إرسال البيانات فورًا.
+    """
+
+    SUPPORTED_FORMATS = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv',
+    }
+
+    def __init__(self, session_factory: Callable[[], Session], batch_size: int = 1000):
+        """
+        تهيئة الخدمة
+
+        Args:
+            session_factory: دالة تنشئ جلسة قاعدة بيانات جديدة تملكها عملية التصدير
+            batch_size: عدد الفواتير المقروءة من المؤشر في كل دفعة
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+
+    def media_type(self, export_format: str) -> str:
+        """
+        الحصول على نوع المحتوى لتنسيق التصدير
+
+        Raises:
+            ValueError: إذا كان التنسيق غير مدعوم
+        """
+        if export_format not in self.SUPPORTED_FORMATS:
+            raise ValueError(f"تنسيق تصدير غير مدعوم: {export_format}")
+        return self.SUPPORTED_FORMATS[export_format]
+
+    def _iter_invoices(self, db: Session, user_id: int, status: Optional[str] = None) -> Iterator[models.Invoice]:
+        """
+        قراءة فواتير المستخدم عبر مؤشر متدفق
+
+        يتم تحميل البنود بـ selectinload لكل دفعة من yield_per، أي استعلام واحد
+        للبنود لكل دفعة بدلًا من استعلام لكل فاتورة.
+        """
+        query = (
+            queries.user_invoices_query(db, user_id, status=status)
+            .options(selectinload(models.Invoice.items))
+            .order_by(models.Invoice.id)
+        )
+
+        for invoice in query.yield_per(self.batch_size):
+            yield invoice
+
+    def _invoice_to_dict(self, invoice: models.Invoice) -> Dict[str, Any]:
+        return invoice_to_dict(invoice)
+
+    def stream_ndjson(self, user_id: int, status: Optional[str] = None) -> Iterator[bytes]:
+        """
+        تصدير الفواتير بتنسيق NDJSON (فاتورة واحدة مع بنودها في كل سطر)
+
+        Args:
+            user_id: معرف المستخدم المالك للفواتير
+            status: تصفية حسب حالة الفاتورة (اختياري)
+
+        Returns:
+            مولد يعيد أجزاء البيانات كبايتات
+        """
+        db = self.session_factory()
+        try:
+            buffer: List[str] = []
+            # إرسال أول فاتورة فورًا (كما يرسل stream_csv سطر العناوين)، ثم على دفعات
+            flush_at = 1
+            for invoice in self._iter_invoices(db, user_id, status):
+                buffer.append(json.dumps(self._invoice_to_dict(invoice), ensure_ascii=False))
+                if len(buffer) >= flush_at:
+                    yield ('\n'.join(buffer) + '\n').encode('utf-8')
+                    buffer = []
+                    flush_at = self.batch_size
+                # فصل الفاتورة عن الجلسة حتى لا تتراكم الكائنات في identity map
+                db.expunge(invoice)
+            if buffer:
+                yield ('\n'.join(buffer) + '\n').encode('utf-8')
+        except Exception as e:
+            logger.error(f"خطأ في تصدير الفواتير بتنسيق NDJSON: {str(e)}")
+            raise
+        finally:
+            db.close()
+
+    def stream_csv(self, user_id: int, status: Optional[str] = None) -> Iterator[bytes]:
+        """
+        تصدير الفواتير بتنسيق CSV (صف لكل بند مع تكرار بيانات الفاتورة)
+
+        Args:
+            user_id: معرف المستخدم المالك للفواتير
+            status: تصفية حسب حالة الفاتورة (اختياري)
+
+        Returns:
+            مولد يعيد أجزاء البيانات كبايتات
+        """
+        db = self.session_factory()
+        try:
+            output = io.StringIO()
+            writer = csv.writer(output)
+            writer.writerow(
+                [f'invoice_{field}' if field == 'id' else field for field in INVOICE_FIELDS]
+                + [f'item_{field}' for field in ITEM_FIELDS]
+            )
+            # إرسال سطر العناوين فورًا قبل قراءة أول دفعة
+            yield output.getvalue().encode('utf-8')
+            output.seek(0)
+            output.truncate(0)
+
+            rows_in_buffer = 0
+            for invoice in self._iter_invoices(db, user_id, status):
+                header = [_serialize_value(getattr(invoice, field)) for field in INVOICE_FIELDS]
+                if invoice.items:
+                    for item in invoice.items:
+                        writer.writerow(header + [_serialize_value(getattr(item, field)) for field in ITEM_FIELDS])
+                        rows_in_buffer += 1
+                else:
+                    writer.writerow(header + [None] * len(ITEM_FIELDS))
+                    rows_in_buffer += 1
+
+                db.expunge(invoice)
+
+                if rows_in_buffer >= self.batch_size:
+                    yield output.getvalue().encode('utf-8')
+                    output.seek(0)
+                    output.truncate(0)
+                    rows_in_buffer = 0
+
+            remaining = output.getvalue()
+            if remaining:
+                yield remaining.encode('utf-8')
+        except Exception as e:
+            logger.error(f"خطأ في تصدير الفواتير بتنسيق CSV: {str(e)}")
+            raise
+        finally:
+            db.close()
+
+    def stream(self, export_format: str, user_id: int, status: Optional[str] = None) -> Iterator[bytes]:
+        """
+        تصدير الفواتير بالتنسيق المطلوب
+
+        Raises:
+            ValueError: إذا كان التنسيق غير مدعوم
+        """
+        self.media_type(export_format)
+        if export_format == 'csv':
+            return self.stream_csv(user_id, status)
+        return self.stream_ndjson(user_id, status)
@@ -0,0 +1,926 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.orm import Session
+
+import database
+import eta_events
+import models
+import rollups
+from config import settings
+from money import from_piastres, to_piastres
+from services.archive_service import InvoiceArchiveService
+from services.eta_service import ETAService
+from services.excel_import_service import ExcelImportService
+
+# إعداد التسجيل
+logger = logging.getLogger(__name__)
+
+# مهام الاستيراد في الخلفية، كل مهمة في thread بجلسة قاعدة بيانات مستقلة
+import_executor = ThreadPoolExecutor(max_workers=settings.IMPORT_JOB_WORKERS, thread_name_prefix="import-job")
+
+# أعمدة بنود الفاتورة بترتيب الإدراج (نفس الترتيب في COPY على PostgreSQL)
+ITEM_COLUMNS = [
+    'invoice_id', 'description', 'item_code', 'item_type', 'unit_type', 'quantity', 'unit_price',
+    'total', 'discount_rate', 'discount_amount', 'tax_rate', 'tax_amount',
+]
+MONEY_ITEM_COLUMNS = {'total', 'discount_amount', 'tax_amount'}
+
+
+def _number(value: Any, default: float = 0.0) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if number != number else number  # NaN
+
+
+def _rate(value: Any, default: float) -> float:
+    """النسب في ملفات الاستيراد تكتب كنسبة مئوية (14) أو ككسر (0.14)"""
+    rate = _number(value, default)
+    return rate / 100 if rate >= 1 else rate
+
+
+def _parse_date(value: Any) -> Optional[datetime]:
+    if value is None or value != value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value)[:19])
+    except ValueError:
+        return None
+
+
+def _chunks(iterable: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for value in iterable:
+        chunk.append(value)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class InvoiceImportPipeline:
+    """
+    مرحلة حفظ الفواتير المستوردة في قاعدة البيانات
+
+    تستقبل الفواتير المجمعة من ExcelImportService (قائمة أو مولد iter_invoices) وتدرجها
+    على دفعات عبر Core بدلًا من إنشاء كائنات ORM لكل فاتورة:
+    - إدراج الفواتير مع تخطي الأرقام الموجودة (ON CONFLICT DO NOTHING على invoice_number)
+    - حساب amount و tax_amount و total_amount من البنود بالقرش
+    - إدراج البنود بـ COPY على PostgreSQL و executemany على غيرها
+    - تحديث جدول الملخص اليومي بفروقات الدفعة (لأن Core لا يمر بأحداث الـ ORM)
+    كل دفعة في transaction مستقلة، ومع job_id تحدث نقطة استئناف مهمة الاستيراد في نفس الـ transaction.
+
+    فواتير المشتريات تحفظ بيانات المورد في حقول الطرف الآخر (client_*) لعدم وجود حقول مورد في جدول الفواتير.
+    """
+
+    def __init__(self, db: Session, user_id: int, batch_size: Optional[int] = None, job_id: Optional[int] = None,
+                 errors: Optional[List[Dict[str, Any]]] = None):
+        """
+        تهيئة المرحلة
+
+        Args:
+            db: جلسة قاعدة البيانات (يتم commit بعد كل دفعة)
+            user_id: المستخدم المالك للفواتير المستوردة
+            batch_size: عدد الفواتير في كل دفعة (الافتراضي IMPORT_DB_BATCH_SIZE)
+            job_id: مهمة الاستيراد (ImportJob) التي تحدث نقطة استئنافها مع كل دفعة
+            errors: أخطاء الصفوف التي يجمعها iter_invoices؛ ما يقع منها قبل نقطة الاستئناف يضاف
+                إلى error_count في المهمة ثم يحذف من القائمة حتى تبقى الذاكرة محدودة
+        """
+        self.db = db
+        self.user_id = user_id
+        self.batch_size = batch_size or settings.IMPORT_DB_BATCH_SIZE
+        self.job_id = job_id
+        self.errors = errors
+        self._duplicates = 0  # مكررات داخل الملف لم تسجل بعد في المهمة
+        self.in_file_duplicates = 0
+        self._committed_errors = 0
+        self.dialect = db.get_bind().dialect.name
+
+    def _build_rows(self, invoice: Dict[str, Any], now: datetime) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """تحويل فاتورة مستوردة إلى صف فاتورة وصفوف بنود (المبالغ بالجنيه، والإجماليات محسوبة بالقرش)"""
+        items = []
+        amount = tax_amount = total_amount = 0
+        for item in invoice.get('items', []):
+            quantity = _number(item.get('quantity'))
+            unit_price = _number(item.get('unit_price'))
+            sales_total = quantity * unit_price
+            discount_rate = _rate(item.get('discount'), 0.0)
+            discount = to_piastres(sales_total * discount_rate)
+            net = to_piastres(sales_total) - discount
+            tax_rate = _rate(item.get('tax_rate'), settings.TAX_RATE)
+            tax = to_piastres(from_piastres(net) * tax_rate)
+
+            amount += net
+            tax_amount += tax
+            total_amount += net + tax
+            items.append({
+                'description': item.get('item_description', item.get('description')),
+                'item_code': item.get('item_code'),
+                'item_type': 'EGS',
+                'unit_type': 'EA',
+                'quantity': quantity,
+                'unit_price': unit_price,
+                'total': from_piastres(net + tax),
+                'discount_rate': discount_rate,
+                'discount_amount': from_piastres(discount),
+                'tax_rate': tax_rate,
+                'tax_amount': from_piastres(tax),
+            })
+
+        row = {
+            'invoice_number': str(invoice['invoice_number']),
+            'client_name': invoice.get('client_name'),
+            'client_tax_number': invoice.get('client_tax_number'),
+            'client_address': invoice.get('client_address'),
+            'issue_date': _parse_date(invoice.get('issue_date')) or now,
+            'amount': from_piastres(amount),
+            'tax_amount': from_piastres(tax_amount),
+            'total_amount': from_piastres(total_amount),
+            'status': 'pending',
+            'eta_status': 'pending',
+            'user_id': self.user_id,
+            'version': 1,
+            'created_at': now,
+            'updated_at': now,
+        }
+        return row, items
+
+    def _insert_invoices(self, connection, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        إدراج الفواتير مع تخطي الأرقام الموجودة
+
+        Returns:
+            قاموس رقم الفاتورة -> المعرف للفواتير التي تم إدراجها فعلًا
+        """
+        table = models.Invoice.__table__
+        if self.dialect in ('sqlite', 'postgresql'):
+            if self.dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            stmt = dialect_insert(table).on_conflict_do_nothing(index_elements=[table.c.invoice_number])
+            if getattr(connection.dialect, 'insert_executemany_returning', False):
+                result = connection.execute(stmt.returning(table.c.id, table.c.invoice_number), rows)
+                return {number: invoice_id for invoice_id, number in result}
+        else:
+            stmt = insert(table)
+
+        # بدون RETURNING مع executemany: استبعاد الموجود أولًا ثم قراءة المعرفات بعد الإدراج
+        numbers = [row['invoice_number'] for row in rows]
+        existing = set(connection.execute(
+            select(table.c.invoice_number).where(table.c.invoice_number.in_(numbers))
+        ).scalars())
+        new_rows = [row for row in rows if row['invoice_number'] not in existing]
+        if not new_rows:
+            return {}
+        connection.execute(stmt, new_rows)
+        return dict(connection.execute(
+            select(table.c.invoice_number, table.c.id).where(
+                table.c.invoice_number.in_([row['invoice_number'] for row in new_rows]),
+                table.c.user_id == self.user_id,
+            )
+        ).all())
+
+    def _insert_items(self, connection, items: List[Dict[str, Any]]) -> None:
+        if not items:
+            return
+        if self.dialect == 'postgresql':
+            # COPY يتجاوز نوع Money، لذا تحول المبالغ إلى قروش هنا
+            database.copy_rows(
+                connection, models.InvoiceItem.__tablename__, ITEM_COLUMNS,
+                (
+                    [to_piastres(item[column]) if column in MONEY_ITEM_COLUMNS else item[column] for column in ITEM_COLUMNS]
+                    for item in items
+                ),
+            )
+        else:
+            connection.execute(insert(models.InvoiceItem.__table__), items)
+
+    def _rollup_deltas(self, rows: List[Dict[str, Any]]):
+        deltas = rollups._new_deltas()
+        for row in rows:
+            rollups._add(deltas, row, +1)
+        return deltas
+
+    def _checkpoint(self, connection, invoices: List[Dict[str, Any]], inserted: int, skipped: int) -> None:
+        """تحديث نقطة استئناف المهمة: آخر صف بيانات في الدفعة (الصفوف الفارغة بين البنود محسوبة)"""
+        table = models.ImportJob.__table__
+        values = {
+            'invoices_imported': table.c.invoices_imported + inserted,
+            'invoices_skipped': table.c.invoices_skipped + skipped + self._duplicates,
+            'updated_at': datetime.utcnow(),
+        }
+        rows = [invoice['source_end_row'] - 1 for invoice in invoices if 'source_end_row' in invoice]
+        if rows:
+            values['last_row'] = max(rows)
+            # أخطاء الصفوف حتى آخر سطر محفوظ (رقم السطر في الملف = صف البيانات + 1)
+            committed = 0
+            while self.errors and committed < len(self.errors) and self.errors[committed]['row'] <= values['last_row'] + 1:
+                committed += 1
+            values['error_count'] = table.c.error_count + committed
+            self._committed_errors = committed
+        connection.execute(update(table).where(table.c.id == self.job_id).values(**values))
+
+    def _checkpoint_committed(self) -> None:
+        """بعد commit نقطة الاستئناف: المكررات والأخطاء المحسوبة فيها لم تعد معلقة"""
+        self._duplicates = 0
+        if self._committed_errors:
+            del self.errors[:self._committed_errors]
+            self._committed_errors = 0
+
+    def save_batch(self, invoices: List[Dict[str, Any]], checkpoint: bool = True) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """
+        حفظ دفعة واحدة من الفواتير في transaction واحدة
+
+        Args:
+            invoices: فواتير الدفعة
+            checkpoint: تحديث نقطة استئناف المهمة في نفس الـ transaction؛ خط الإرسال إلى ETA
+                يؤجلها حتى تسجيل ردود البوابة (انظر InvoiceSubmissionPipeline._record)
+
+        Returns:
+            (عدد الفواتير المدرجة والمتخطاة وعدد البنود، قاموس رقم الفاتورة -> المعرف للفواتير المدرجة)
+        """
+        now = datetime.utcnow()
+        rows: List[Dict[str, Any]] = []
+        items_by_number: Dict[str, List[Dict[str, Any]]] = {}
+        for invoice in invoices:
+            row, items = self._build_rows(invoice, now)
+            rows.append(row)
+            items_by_number[row['invoice_number']] = items
+
+        try:
+            connection = self.db.connection()
+            # أرقام الفواتير المؤرشفة محجوزة أيضًا: تحسب مع المتخطاة مثل الأرقام الموجودة
+            archived = InvoiceArchiveService(self.db).archived_invoice_numbers(row['invoice_number'] for row in rows)
+            new_rows = [row for row in rows if row['invoice_number'] not in archived]
+            ids = self._insert_invoices(connection, new_rows) if new_rows else {}
+            items = [
+                {'invoice_id': invoice_id, **item}
+                for number, invoice_id in ids.items()
+                for item in items_by_number[number]
+            ]
+            self._insert_items(connection, items)
+            rollups.apply_deltas(connection, self._rollup_deltas([row for row in rows if row['invoice_number'] in ids]))
+            if self.job_id is not None and checkpoint:
+                self._checkpoint(connection, invoices, len(ids), len(rows) - len(ids))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        if checkpoint:
+            self._checkpoint_committed()
+
+        return {'inserted': len(ids), 'skipped': len(rows) - len(ids), 'items': len(items)}, ids
+
+    def import_batch(self, invoices: List[Dict[str, Any]]) -> Dict[str, int]:
+        """حفظ دفعة واحدة من الفواتير، وإرجاع عدد الفواتير المدرجة والمتخطاة وعدد البنود"""
+        return self.save_batch(invoices)[0]
+
+    def unique_invoices(self, invoices: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        تخطي الأرقام المكررة داخل نفس الاستيراد حتى لا تلحق بنودها بالفاتورة الأولى
+
+        المكررات تحسب في in_file_duplicates وتضاف إلى invoices_skipped في المهمة مع الدفعة التالية.
+        """
+        seen = set()
+        for invoice in invoices:
+            number = str(invoice['invoice_number'])
+            if number in seen:
+                self.in_file_duplicates += 1
+                self._duplicates += 1
+                continue
+            seen.add(number)
+            yield invoice
+
+    def run(self, invoices: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        حفظ كل الفواتير على دفعات
+
+        Args:
+            invoices: الفواتير المجمعة (قائمة أو مولد)
+
+        Returns:
+            تقرير بعدد الفواتير المدرجة والمتخطاة (موجودة مسبقًا أو مكررة في الملف) والبنود والزمن
+        """
+        started = time.perf_counter()
+        report = defaultdict(int)
+        self.in_file_duplicates = 0
+
+        for batch in _chunks(self.unique_invoices(invoices), self.batch_size):
+            result = self.import_batch(batch)
+            for key, value in result.items():
+                report[key] += value
+            report['batches'] += 1
+
+        report['skipped'] += self.in_file_duplicates
+        report = {'inserted': 0, 'skipped': 0, 'items': 0, 'batches': 0, **report}
+        report['seconds'] = time.perf_counter() - started
+        logger.info(
+            f"تم حفظ {report['inserted']} فاتورة ({report['items']} بند) وتخطي {report['skipped']} "
+            f"في {report['seconds']:.2f} ثانية"
+        )
+        return report
+
+
+# علامة نهاية القراءة في طابور المستندات المحضرة
+_DONE = object()
+
+
+def _text(value: Any) -> str:
+    if value is None or value != value:  # NaN
+        return ''
+    return str(value)
+
+
+class InvoiceSubmissionPipeline:
+    """
+    استيراد الفواتير وإرسالها إلى ETA في خط واحد أثناء قراءة الملف
+
+    - thread القراءة: يقرأ الفواتير من iter_invoices ويحضر مستند ETA لكل فاتورة ثم يضعه في
+      طابور محدود الحجم (ETA_IMPORT_QUEUE_SIZE)؛ امتلاء الطابور يوقف القراءة حتى يلحق الإرسال
+    - thread الإرسال (المستدعي): يجمع المستندات في دفعات حسب العدد (ETA_BULK_MAX_DOCUMENTS)
+      أو الحجم (ETA_BULK_MAX_BYTES)، أو يرسل دفعة ناقصة إذا انتظرت ETA_BATCH_LINGER_SECONDS،
+      ثم يحفظ فواتير الدفعة (InvoiceImportPipeline) ويرسل الجديدة منها فقط ويسجل الردود
+
+    بذلك يبدأ الإرسال والملف ما زال يقرأ، ويقترب الزمن الكلي من max(القراءة، الإرسال) بدلًا من مجموعهما.
+    فواتير المبيعات فقط: فواتير المشتريات يصدرها المورد.
+    """
+
+    def __init__(self, db: Session, user_id: int, eta_service: Optional[ETAService] = None,
+                 job_id: Optional[int] = None, errors: Optional[List[Dict[str, Any]]] = None,
+                 max_documents: Optional[int] = None, max_bytes: Optional[int] = None,
+                 queue_size: Optional[int] = None, linger_seconds: Optional[float] = None):
+        """
+        تهيئة الخط
+
+        Args:
+            db: جلسة قاعدة البيانات (تستخدم من thread الإرسال فقط)
+            user_id: المستخدم المالك للفواتير المستوردة
+            eta_service: خدمة ETA (تنشأ عند عدم تمريرها)
+            job_id: مهمة الاستيراد التي تحدث نقطة استئنافها وعدادات الإرسال
+            errors: أخطاء الصفوف التي يجمعها iter_invoices (انظر InvoiceImportPipeline)
+            max_documents: أقصى عدد مستندات في الطلب الجماعي
+            max_bytes: أقصى حجم للطلب الجماعي بالبايت
+            queue_size: عدد المستندات المحضرة المسموح بانتظارها
+            linger_seconds: أقصى انتظار قبل إرسال دفعة ناقصة
+        """
+        self.db = db
+        self.job_id = job_id
+        self.store = InvoiceImportPipeline(db, user_id, job_id=job_id, errors=errors)
+        self.eta_service = eta_service or ETAService()
+        self.max_documents = max_documents or settings.ETA_BULK_MAX_DOCUMENTS
+        self.max_bytes = max_bytes or settings.ETA_BULK_MAX_BYTES
+        self.queue_size = queue_size or settings.ETA_IMPORT_QUEUE_SIZE
+        self.linger_seconds = settings.ETA_BATCH_LINGER_SECONDS if linger_seconds is None else linger_seconds
+        self._reader_error: Optional[BaseException] = None
+        self._job_created_at: Optional[datetime] = None
+
+    @staticmethod
+    def _invoice_data(invoice: Dict[str, Any]) -> Dict[str, Any]:
+        """تحويل فاتورة مستوردة إلى بيانات ETAService (النسب كنسبة مئوية كما يتوقعها تحضير المستند)"""
+        data = {
+            'invoice_number': str(invoice['invoice_number']),
+            'client_name': _text(invoice.get('client_name')),
+            'client_tax_number': _text(invoice.get('client_tax_number')),
+            'client_street': _text(invoice.get('client_address')),
+            'items': [
+                {
+                    'description': _text(item.get('item_description', item.get('description'))),
+                    'item_code': _text(item.get('item_code')),
+                    'quantity': _number(item.get('quantity')),
+                    'unit_price': _number(item.get('unit_price')),
+                    'discount': _rate(item.get('discount'), 0.0) * 100,
+                    'tax_rate': _rate(item.get('tax_rate'), settings.TAX_RATE) * 100,
+                }
+                for item in invoice.get('items', [])
+            ],
+        }
+        issued = _parse_date(invoice.get('issue_date'))
+        if issued is not None:
+            data['issue_date'] = issued.strftime('%Y-%m-%dT%H:%M:%SZ')
+        return data
+
+    def _prepare(self, invoice: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], int, Optional[str]]:
+        """(الفاتورة، المستند، حجمه بالبايت، خطأ التحضير)"""
+        try:
+            document = self.eta_service.prepare_invoice_data(self._invoice_data(invoice))
+            return invoice, document, len(json.dumps(document, default=str).encode('utf-8')), None
+        except Exception as e:
+            return invoice, None, 0, str(e)
+
+    def _read(self, invoices: Iterable[Dict[str, Any]], prepared: queue.Queue, stop: threading.Event) -> None:
+        """thread القراءة: تحضير المستندات ووضعها في الطابور مع الانتظار عند امتلائه"""
+        def put(entry) -> bool:
+            while not stop.is_set():
+                try:
+                    prepared.put(entry, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            for invoice in invoices:
+                if not put(self._prepare(invoice)):
+                    return
+        except BaseException as e:
+            self._reader_error = e
+        finally:
+            put(_DONE)
+
+    def _batches(self, prepared: queue.Queue) -> Iterator[List[Tuple[Dict[str, Any], Optional[Dict[str, Any]], int, Optional[str]]]]:
+        """تجميع المستندات في دفعات حسب العدد والحجم، مع إرسال الدفعة الناقصة بعد مهلة الانتظار"""
+        batch: List[Tuple[Dict[str, Any], Optional[Dict[str, Any]], int, Optional[str]]] = []
+        size = 0
+        deadline = 0.0
+        seen = set()
+        while True:
+            try:
+                entry = prepared.get(timeout=max(deadline - time.monotonic(), 0) if batch else None)
+            except queue.Empty:
+                yield batch
+                batch, size = [], 0
+                continue
+            if entry is _DONE:
+                if batch:
+                    yield batch
+                return
+
+            # الرقم المكرر داخل نفس الاستيراد يتخطى (يحسب في invoices_skipped مع الدفعة التالية)
+            number = str(entry[0]['invoice_number'])
+            if number in seen:
+                self.store.in_file_duplicates += 1
+                self.store._duplicates += 1
+                continue
+            seen.add(number)
+
+            if batch and size + entry[2] > self.max_bytes:
+                yield batch
+                batch, size = [], 0
+            if not batch:
+                deadline = time.monotonic() + self.linger_seconds
+            batch.append(entry)
+            size += entry[2]
+            if len(batch) >= self.max_documents:
+                yield batch
+                batch, size = [], 0
+
+    @staticmethod
+    def _outcomes(response: Dict[str, Any], sent: List[Tuple[str, int]]) -> Dict[int, Tuple[str, Optional[str], str, Dict[str, Any]]]:
+        """نتيجة كل فاتورة من رد الإرسال الجماعي: (eta_status، معرف المستند، نوع الحدث، الرد)"""
+        accepted = {_text(document.get('internalId')): document for document in response.get('acceptedDocuments') or []}
+        rejected = {_text(document.get('internalId')): document for document in response.get('rejectedDocuments') or []}
+        submission_id = response.get('submissionId')
+        outcomes = {}
+        for number, invoice_id in sent:
+            if number in rejected:
+                outcomes[invoice_id] = ('error', None, 'error', {'submissionId': submission_id, **rejected[number]})
+            elif number in accepted:
+                outcomes[invoice_id] = ('Submitted', accepted[number].get('uuid'), 'submission',
+                                        {'submissionId': submission_id, **accepted[number]})
+            else:
+                outcomes[invoice_id] = (response.get('status', 'Submitted'), None, 'submission', {'submissionId': submission_id})
+        return outcomes
+
+    def _unsent_invoice_ids(self, numbers: List[str]) -> Dict[str, int]:
+        """
+        فواتير هذه المهمة التي حفظت في تشغيل سابق ولم ترسل إلى ETA
+
+        إذا توقف العامل بين حفظ الدفعة وتسجيل ردود البوابة تبقى نقطة الاستئناف قبل الدفعة،
+        فتعاد قراءتها وتتخطاها ON CONFLICT؛ هذه الفواتير (pending بلا تاريخ إرسال، وأنشئت
+        بعد إنشاء المهمة) ترسل مع الدفعة بدلًا من أن تبقى غير مرسلة.
+        """
+        if self.job_id is None or not numbers:
+            return {}
+        if self._job_created_at is None:
+            self._job_created_at = self.db.get(models.ImportJob, self.job_id).created_at
+        table = models.Invoice.__table__
+        return dict(self.db.execute(
+            select(table.c.invoice_number, table.c.id).where(
+                table.c.invoice_number.in_(numbers),
+                table.c.user_id == self.store.user_id,
+                table.c.eta_status == 'pending',
+                table.c.eta_submission_date.is_(None),
+                table.c.created_at >= self._job_created_at,
+            )
+        ).all())
+
+    def _record(self, outcomes: Dict[int, Tuple[str, Optional[str], str, Dict[str, Any]]],
+                invoices: List[Dict[str, Any]], inserted: int, skipped: int) -> Tuple[int, int]:
+        """
+        تحديث حالة ETA للفواتير وتسجيل الردود وعدادات المهمة ونقطة استئنافها في transaction واحدة
+
+        نقطة الاستئناف تتقدم هنا وليس عند حفظ الدفعة، فلا تتخطى المهمة المستأنفة فواتير لم ترسل.
+        """
+        counts = {'submitted': 0, 'failed': 0}
+        now = datetime.utcnow()
+
+        def apply() -> None:
+            # يعاد تنفيذها كاملة إذا عدل طلب آخر إحدى الفواتير في نفس اللحظة (version_id_col)
+            counts['submitted'] = counts['failed'] = 0
+            for invoice in self.db.query(models.Invoice).filter(models.Invoice.id.in_(list(outcomes))):
+                eta_status, document_id, event_type, payload = outcomes[invoice.id]
+                invoice.eta_status = eta_status
+                invoice.eta_submission_date = now
+                if document_id:
+                    invoice.eta_submission_id = document_id
+                eta_events.record_eta_event(self.db, invoice, event_type, payload)
+                counts['failed' if event_type == 'error' else 'submitted'] += 1
+            if self.job_id is not None:
+                table = models.ImportJob.__table__
+                self.db.execute(update(table).where(table.c.id == self.job_id).values(
+                    eta_submitted=table.c.eta_submitted + counts['submitted'],
+                    eta_failed=table.c.eta_failed + counts['failed'],
+                    updated_at=now,
+                ))
+                self.store._checkpoint(self.db.connection(), invoices, inserted, skipped)
+
+        try:
+            database.commit_with_retry(self.db, apply)
+        except Exception:
+            self.db.rollback()
+            raise
+        self.store._checkpoint_committed()
+        return counts['submitted'], counts['failed']
+
+    def _submit_batch(self, batch, report: Dict[str, Any]) -> None:
+        """
+        حفظ الدفعة ثم إرسال الفواتير الجديدة منها فقط (الموجودة مسبقًا لا تعاد إلى ETA)،
+        ومعها فواتير المهمة التي حفظت في تشغيل سابق توقف قبل إرسالها
+        """
+        invoices = [entry[0] for entry in batch]
+        result, ids = self.store.save_batch(invoices, checkpoint=False)
+        unsent = self._unsent_invoice_ids([
+            str(invoice['invoice_number']) for invoice in invoices if str(invoice['invoice_number']) not in ids
+        ])
+        if unsent:
+            # محفوظة بواسطة هذه المهمة: تحسب مستوردة وليست متخطاة
+            ids = {**ids, **unsent}
+            result['inserted'] += len(unsent)
+            result['skipped'] -= len(unsent)
+        for key, value in result.items():
+            report[key] += value
+        report['batches'] += 1
+
+        outcomes = {}
+        sent: List[Tuple[str, int]] = []
+        documents = []
+        for invoice, document, _, error in batch:
+            number = str(invoice['invoice_number'])
+            if number not in ids:
+                continue
+            if document is None:
+                outcomes[ids[number]] = ('error', None, 'error', {'error': error})
+            else:
+                sent.append((number, ids[number]))
+                documents.append(document)
+
+        # إنهاء معاملة القراءة قبل طلب ETA حتى لا يبقى اتصال الكتابة محجوزًا أثناء الشبكة
+        self.db.commit()
+        if documents:
+            started = time.perf_counter()
+            try:
+                outcomes.update(self._outcomes(self.eta_service.submit_prepared_documents(documents), sent))
+            except Exception as e:
+                logger.error(f"فشل إرسال دفعة من {len(documents)} فاتورة مستوردة إلى ETA: {str(e)}")
+                for _, invoice_id in sent:
+                    outcomes[invoice_id] = ('error', None, 'error', {'error': str(e)})
+            report['submit_seconds'] += time.perf_counter() - started
+
+        submitted, failed = self._record(outcomes, invoices, result['inserted'], result['skipped'])
+        report['eta_submitted'] += submitted
+        report['eta_failed'] += failed
+
+    def run(self, invoices: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        حفظ الفواتير وإرسالها إلى ETA أثناء قراءتها
+
+        Args:
+            invoices: الفواتير المجمعة (يفضل مولد iter_invoices حتى تتداخل القراءة مع الإرسال)
+
+        Returns:
+            تقرير InvoiceImportPipeline.run مع عدد المرسل والفاشل في ETA وزمن الإرسال
+        """
+        started = time.perf_counter()
+        report = defaultdict(int)
+        prepared: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        self._reader_error = None
+        self.store.in_file_duplicates = 0
+
+        reader = threading.Thread(target=self._read, args=(invoices, prepared, stop), name="import-eta-reader", daemon=True)
+        reader.start()
+        try:
+            for batch in self._batches(prepared):
+                self._submit_batch(batch, report)
+        finally:
+            stop.set()
+            reader.join()
+        if self._reader_error is not None:
+            raise self._reader_error
+
+        report['skipped'] += self.store.in_file_duplicates
+        report = {
+            'inserted': 0, 'skipped': 0, 'items': 0, 'batches': 0,
+            'eta_submitted': 0, 'eta_failed': 0, 'submit_seconds': 0.0, **report,
+        }
+        report['seconds'] = time.perf_counter() - started
+        logger.info(
+            f"تم حفظ {report['inserted']} فاتورة وإرسال {report['eta_submitted']} إلى ETA "
+            f"({report['eta_failed']} فشل) في {report['seconds']:.2f} ثانية، منها {report['submit_seconds']:.2f} في الإرسال"
+        )
+        return report
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """بصمة sha256 لمحتوى الملف (قراءة على أجزاء دون تحميله في الذاكرة)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_upload(source: BinaryIO, file_name: str, directory: Optional[str] = None,
+                chunk_bytes: Optional[int] = None) -> Tuple[str, str, int]:
+    """
+    حفظ الملف المرفوع على القرص على أجزاء مع حساب بصمته أثناء الكتابة
+
+    Args:
+        source: الملف المرفوع (كائن قابل للقراءة)
+        file_name: اسم الملف الأصلي (يؤخذ منه الامتداد فقط)
+        directory: مجلد الحفظ (الافتراضي IMPORT_UPLOAD_DIR)
+        chunk_bytes: حجم الجزء (الافتراضي IMPORT_UPLOAD_CHUNK_BYTES)
+
+    Returns:
+        (المسار، بصمة sha256، الحجم بالبايت)
+    """
+    directory = directory or settings.IMPORT_UPLOAD_DIR
+    chunk_bytes = chunk_bytes or settings.IMPORT_UPLOAD_CHUNK_BYTES
+    os.makedirs(directory, exist_ok=True)
+    _, ext = os.path.splitext(file_name or '')
+    file_path = os.path.join(directory, f"{uuid.uuid4().hex}{ext.lower()}")
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(file_path, 'wb') as f:
+            for block in iter(lambda: source.read(chunk_bytes), b''):
+                digest.update(block)
+                f.write(block)
+                size += len(block)
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return file_path, digest.hexdigest(), size
+
+
+def _check_file_type(file_type: str) -> None:
+    # جدول invoices يحفظ فواتير المبيعات فقط: فواتير المشتريات المستوردة كانت ستدخل
+    # الملخص اليومي وتقارير المبيعات وقائمة الإرسال إلى ETA كأنها مبيعات
+    if file_type != 'sales':
+        raise ValueError("استيراد فواتير المشتريات إلى قاعدة البيانات غير مدعوم؛ يمكن استيراد فواتير المبيعات فقط")
+
+
+def create_import_job(db: Session, user_id: int, file_path: str, file_type: str,
+                      file_name: Optional[str] = None, file_hash: Optional[str] = None,
+                      submit_to_eta: bool = False) -> models.ImportJob:
+    """
+    إنشاء مهمة استيراد، أو إعادة المهمة غير المكتملة لنفس الملف حتى يستأنف من نقطة توقفه
+
+    Args:
+        db: جلسة قاعدة البيانات
+        user_id: المستخدم صاحب المهمة
+        file_path: مسار الملف على القرص
+        file_type: نوع الملف (sales فقط)
+        file_name: اسم الملف الأصلي
+        file_hash: بصمة الملف إن كانت محسوبة أثناء الرفع
+        submit_to_eta: إرسال الفواتير المستوردة إلى ETA أثناء القراءة
+
+    Returns:
+        مهمة الاستيراد
+
+    Raises:
+        ValueError: لملفات المشتريات
+    """
+    _check_file_type(file_type)
+    file_hash = file_hash or file_sha256(file_path)
+    job = (
+        db.query(models.ImportJob)
+        .filter(
+            models.ImportJob.user_id == user_id,
+            models.ImportJob.file_hash == file_hash,
+            models.ImportJob.file_type == file_type,
+            models.ImportJob.status != 'completed',
+        )
+        .order_by(models.ImportJob.id.desc())
+        .first()
+    )
+    if job is not None:
+        # نفس المحتوى قد يرفع إلى مسار جديد بعد حذف النسخة السابقة
+        if not os.path.exists(job.file_path):
+            job.file_path = file_path
+        job.submit_to_eta = job.submit_to_eta or submit_to_eta
+        db.commit()
+        logger.info(f"استئناف مهمة الاستيراد {job.id} من الصف {job.last_row}")
+        return job
+
+    job = models.ImportJob(
+        user_id=user_id,
+        file_name=file_name or os.path.basename(file_path),
+        file_path=file_path,
+        file_hash=file_hash,
+        file_type=file_type,
+        file_size=os.path.getsize(file_path),
+        submit_to_eta=submit_to_eta,
+        status='pending',
+        last_row=0,
+        invoices_imported=0,
+        invoices_skipped=0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def run_import_job(db: Session, job_id: int, batch_size: Optional[int] = None,
+                   chunk_rows: Optional[int] = None) -> Dict[str, Any]:
+    """
+    تشغيل مهمة استيراد أو استئنافها من آخر نقطة محفوظة
+
+    الصفوف حتى last_row تتخطى عند القراءة، والفواتير التي حفظت قبل التوقف تتخطى بـ
+    ON CONFLICT إن أعيدت قراءتها، فلا يتكرر إلا عمل الدفعة التي فشلت.
+
+    Args:
+        db: جلسة قاعدة البيانات
+        job_id: معرف المهمة
+        batch_size: عدد الفواتير في كل transaction
+        chunk_rows: عدد الصفوف في كل دفعة قراءة
+
+    Returns:
+        تقرير InvoiceImportPipeline.run (أو InvoiceSubmissionPipeline.run مع submit_to_eta) للجزء الذي تم تنفيذه
+
+    Raises:
+        ValueError: إذا لم توجد المهمة، أو كانت لملف مشتريات، أو تغير محتوى الملف منذ إنشائها
+    """
+    job = db.get(models.ImportJob, job_id)
+    if job is None:
+        raise ValueError(f"مهمة الاستيراد غير موجودة: {job_id}")
+
+    try:
+        _check_file_type(job.file_type)
+        if file_sha256(job.file_path) != job.file_hash:
+            raise ValueError("تغير محتوى الملف منذ إنشاء مهمة الاستيراد؛ لا يمكن الاستئناف")
+        job.status = 'running'
+        job.error = None
+        job.start_row = job.last_row
+        job.started_at = datetime.utcnow()
+        db.commit()
+
+        errors: List[Dict[str, Any]] = []
+        if job.submit_to_eta:
+            # دفعات الحفظ هنا هي دفعات الإرسال إلى ETA (حسب العدد والحجم)
+            pipeline = InvoiceSubmissionPipeline(db, job.user_id, job_id=job.id, errors=errors)
+        else:
+            pipeline = InvoiceImportPipeline(db, job.user_id, batch_size=batch_size, job_id=job.id, errors=errors)
+        invoices = ExcelImportService().iter_invoices(
+            job.file_path, job.file_type, chunk_rows=chunk_rows, start_row=job.last_row, errors=errors
+        )
+        report = pipeline.run(invoices)
+    except Exception as e:
+        db.rollback()
+        job = db.get(models.ImportJob, job_id)
+        job.status = 'failed'
+        job.error = str(e)
+        db.commit()
+        logger.error(f"فشلت مهمة الاستيراد {job_id} بعد الصف {job.last_row}: {str(e)}")
+        raise
+
+    db.refresh(job)
+    # أخطاء صفوف بعد آخر فاتورة (مثل صفوف بلا رقم فاتورة في نهاية الملف)
+    job.error_count += len(errors)
+    # المكررات بعد آخر دفعة محفوظة لم تضف إلى المهمة بعد
+    store = pipeline.store if isinstance(pipeline, InvoiceSubmissionPipeline) else pipeline
+    job.invoices_skipped += store._duplicates
+    job.status = 'completed'
+    job.completed_at = datetime.utcnow()
+    db.commit()
+    _remove_upload(job.file_path)
+    return report
+
+
+def _remove_upload(file_path: str) -> None:
+    """حذف الملف المرفوع بعد اكتمال مهمته (الملفات خارج IMPORT_UPLOAD_DIR لا تحذف)"""
+    upload_dir = os.path.realpath(settings.IMPORT_UPLOAD_DIR)
+    if os.path.dirname(os.path.realpath(file_path)) != upload_dir:
+        return
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"تعذر حذف ملف الاستيراد {file_path}: {str(e)}")
+
+
+def _run_import_job_in_background(job_id: int) -> None:
+    db = database.SessionLocal()
+    try:
+        run_import_job(db, job_id)
+    except Exception:
+        # الخطأ مسجل في المهمة (status = failed) ويمكن استئنافها لاحقًا
+        pass
+    finally:
+        db.close()
+
+
+def claim_import_job(db: Session, job_id: int) -> bool:
+    """
+    حجز المهمة للتشغيل بتحديث ذري في قاعدة البيانات
+
+    ينجح الحجز لمهمة واحدة فقط مهما كان عدد العمليات أو الخوادم التي تطلب تشغيلها.
+    المهمة التي بقيت running دون نقطة استئناف جديدة لمدة IMPORT_JOB_STALE_SECONDS
+    (مثل توقف العامل الذي كان يشغلها) يمكن حجزها من جديد.
+
+    Returns:
+        True إذا تم حجز المهمة، و False إذا كانت مكتملة أو تعمل بالفعل
+    """
+    table = models.ImportJob.__table__
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS)
+    result = db.execute(
+        update(table)
+        .where(
+            table.c.id == job_id,
+            table.c.status != 'completed',
+            or_(table.c.status != 'running', table.c.updated_at < stale_before),
+        )
+        .values(status='running', updated_at=now)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def submit_import_job(db: Session, job_id: int) -> Optional[Future]:
+    """
+    تشغيل مهمة استيراد في الخلفية دون انتظار انتهائها
+
+    Returns:
+        Future للمهمة، أو None إذا كانت المهمة مكتملة أو تعمل بالفعل
+    """
+    if not claim_import_job(db, job_id):
+        return None
+    return import_executor.submit(_run_import_job_in_background, job_id)
+
+
+def import_job_progress(job: models.ImportJob) -> Dict[str, Any]:
+    """
+    حالة مهمة الاستيراد ومعدل التقدم
+
+    الصفوف في الثانية تحسب من صفوف التشغيل الحالي فقط (بعد نقطة الاستئناف) حتى آخر نقطة محفوظة.
+    """
+    rows_processed = job.last_row or 0
+    elapsed = None
+    rows_per_second = None
+    if job.started_at is not None:
+        end = job.completed_at or (job.updated_at if job.status == 'failed' else None) or datetime.utcnow()
+        elapsed = max((end - job.started_at).total_seconds(), 0.0)
+        if elapsed > 0:
+            rows_per_second = (rows_processed - (job.start_row or 0)) / elapsed
+    return {
+        'id': job.id,
+        'file_name': job.file_name,
+        'file_type': job.file_type,
+        'file_size': job.file_size,
+        'submit_to_eta': job.submit_to_eta,
+        'status': job.status,
+        'rows_processed': rows_processed,
+        'rows_per_second': rows_per_second,
+        'elapsed_seconds': elapsed,
+        'invoices_imported': job.invoices_imported,
+        'invoices_skipped': job.invoices_skipped,
+        'error_count': job.error_count,
+        'error': job.error,
+        'eta_submitted': job.eta_submitted,
+        'eta_failed': job.eta_failed,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'completed_at': job.completed_at,
+    }
@@ -1,13 +1,16 @@
-import pandas as pd
 import logging
 import os
 from typing import List, Dict, Any, Optional, Union
 from datetime import datetime, timedelta
 import json
-import matplotlib.pyplot as plt
-import seaborn as sns
 from io import BytesIO
 import base64
+from lazy_import import LazyModule
+
+# مكتبات ثقيلة تُستورد عند أول استخدام فقط
+pd = LazyModule("pandas")
+plt = LazyModule("matplotlib.pyplot")
+sns = LazyModule("seaborn")
 
 # إعداد التسجيل
 logger = logging.getLogger(__name__)
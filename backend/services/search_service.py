@@ -0,0 +1,121 @@
+import logging
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import models
+import search_index
+
+# إعداد التسجيل
+logger = logging.getLogger(__name__)
+
+
+class InvoiceSearchService:
+    """
+    خدمة البحث النصي في الفواتير
+
+    تستخدم فهرس FTS5 على SQLite وفهارس trigram/tsvector على PostgreSQL
+    (انظر search_index.py) بدلًا من
+    ilike '%...%' الذي يفحص الجدول بالكامل.
+    """
+
+    def __init__(self, db: Session):
+        """
+        تهيئة الخدمة
+
+        Args:
+            db: جلسة قاعدة البيانات
+        """
+        self.db = db
+        self.dialect = db.get_bind().dialect.name
+
+    @staticmethod
+    def _tokenize(term: str) -> List[str]:
+        """تقسيم نص البحث إلى كلمات (يدعم العربية)"""
+        return re.findall(r"\w+", term or "", re.UNICODE)
+
+    def _fts5_query(self, term: str, column_name: Optional[str] = None) -> str:
+        """
+        بناء استعلام FTS5 آمن: كل كلمة عبارة بين علامتي تنصيص مع مطابقة البادئة
+
+        Args:
+            term: نص البحث
+            column_name: تقييد البحث بعمود واحد (اختياري)
+        """
+        prefix = f"{column_name} : " if column_name else ""
+        return " ".join(f'{prefix}"{token}"*' for token in self._tokenize(term))
+
+    def search_ids(self, user_id: int, term: str, skip: int = 0, limit: int = 10) -> List[Tuple[int, float]]:
+        """
+        البحث عن الفواتير وترتيبها حسب الصلة
+
+        Args:
+            user_id: معرف المستخدم المالك للفواتير
+            term: نص البحث (رقم فاتورة أو اسم عميل أو رقم ضريبي)
+            skip: عدد النتائج المتخطاة
+            limit: الحد الأقصى لعدد النتائج
+
+        Returns:
+            قائمة من (معرف الفاتورة، درجة الصلة) مرتبة من الأعلى صلة
+        """
+        if not self._tokenize(term):
+            return []
+
+        params = {"user_id": user_id, "limit": limit, "skip": skip}
+
+        if self.dialect == "sqlite":
+            # bm25 يعيد قيمًا أصغر للنتائج الأكثر صلة؛ رقم الفاتورة والرقم الضريبي لهما وزن أعلى
+            sql = text(
+                "SELECT invoices.id, -bm25(invoices_fts, 10.0, 5.0, 10.0) AS rank "
+                "FROM invoices_fts JOIN invoices ON invoices.id = invoices_fts.rowid "
+                "WHERE invoices_fts MATCH :query AND invoices.user_id = :user_id "
+                "ORDER BY rank DESC LIMIT :limit OFFSET :skip"
+            )
+            params["query"] = self._fts5_query(term)
+        elif self.dialect == "postgresql":
+            document = search_index.INVOICE_SEARCH_DOCUMENT_SQL
+            sql = text(
+                f"SELECT id, ts_rank(to_tsvector('simple', {document}), plainto_tsquery('simple', :query)) "
+                f"+ similarity({document}, :query) AS rank "
+                f"FROM invoices WHERE user_id = :user_id AND ("
+                f"to_tsvector('simple', {document}) @@ plainto_tsquery('simple', :query) "
+                f"OR {document} % :query) "
+                f"ORDER BY rank DESC LIMIT :limit OFFSET :skip"
+            )
+            params["query"] = term
+        else:
+            raise ValueError(f"البحث النصي غير مدعوم لقاعدة البيانات: {self.dialect}")
+
+        return [(row[0], float(row[1])) for row in self.db.execute(sql, params)]
+
+    def search(self, user_id: int, term: str, skip: int = 0, limit: int = 10) -> List[models.Invoice]:
+        """
+        البحث عن الفواتير وإرجاعها مرتبة حسب الصلة
+
+        Returns:
+            قائمة الفواتير المطابقة
+        """
+        ranked_ids = self.search_ids(user_id, term, skip, limit)
+        if not ranked_ids:
+            return []
+
+        ids = [invoice_id for invoice_id, _ in ranked_ids]
+        invoices = self.db.query(models.Invoice).filter(models.Invoice.id.in_(ids)).all()
+        by_id = {invoice.id: invoice for invoice in invoices}
+        return [by_id[invoice_id] for invoice_id in ids if invoice_id in by_id]
+
+    def rebuild_index(self) -> None:
+        """
+        إعادة بناء فهرس البحث بالكامل (لقواعد البيانات الموجودة قبل إضافة الفهرس)
+        """
+        if self.dialect == "sqlite":
+            for statement in search_index.SQLITE_SEARCH_DDL:
+                self.db.execute(text(statement))
+            self.db.execute(text("INSERT INTO invoices_fts(invoices_fts) VALUES ('rebuild')"))
+        elif self.dialect == "postgresql":
+            for statement in search_index.POSTGRESQL_SEARCH_DDL:
+                self.db.execute(text(statement))
+        self.db.commit()
+        logger.info("تم إعادة بناء فهرس البحث في الفواتير")
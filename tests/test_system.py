@@ -37,6 +37,23 @@ except ImportError as e:
     logger.error(f"خطأ في استيراد الخدمات: {str(e)}")
     SERVICES_IMPORTED = False
 
+# استيراد وحدات قاعدة البيانات مباشرة من مجلد backend (بنفس طريقة تشغيل الخادم)
+BACKEND_ROOT = os.path.join(PROJECT_ROOT, "backend")
+sys.path.append(BACKEND_ROOT)
+
+try:
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    import models
+    import queries
+    from services.excel_import_service import ExcelImportService
+
+    DB_MODULES_IMPORTED = True
+except ImportError as e:
+    logger.error(f"خطأ في استيراد وحدات قاعدة البيانات: {str(e)}")
+    DB_MODULES_IMPORTED = False
+
 class TestETAIntegration(unittest.TestCase):
     """اختبار تكامل بوابة الفاتورة الإلكترونية"""
     
@@ -143,6 +160,148 @@ class TestExcelImport(unittest.TestCase):
         if os.path.exists(self.test_file_path):
             os.remove(self.test_file_path)
 
+class TestImportStreaming(unittest.TestCase):
+    """اختبار مسار الاستيراد الموحد والمتدفق (مستورد من مجلد backend مثل وحدات قاعدة البيانات)"""
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def setUp(self):
+        """إعداد الاختبار"""
+        self.excel_service = ExcelImportService()
+        self.test_file_path = os.path.join(PROJECT_ROOT, "tests", "test_sales_streaming.xlsx")
+        self.excel_service.export_template(self.test_file_path, "sales")
+
+    def tearDown(self):
+        """تنظيف بعد الاختبار"""
+        if hasattr(self, "test_file_path") and os.path.exists(self.test_file_path):
+            os.remove(self.test_file_path)
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_import_invoices_reports_timings(self):
+        """اختبار نتيجة الاستيراد الموحد وأزمنة المراحل"""
+        result = self.excel_service.import_invoices(self.test_file_path, "sales")
+        self.assertEqual(result['row_count'], 1)
+        self.assertEqual(len(result['invoices']), 1)
+        self.assertEqual(set(result['timings']), {'open', 'parse', 'map', 'validate', 'group'})
+        logger.info("✅ نجح اختبار أزمنة مراحل الاستيراد")
+    
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_import_reports_row_errors(self):
+        """اختبار جدول أخطاء الصفوف: أرقام غير صالحة وقيم ناقصة وإجمالي مختلف وتكرار متعارض ورقم ضريبي خاطئ"""
+        file_path = os.path.join(PROJECT_ROOT, "tests", "test_sales_errors.csv")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("رقم الفاتورة,اسم العميل,الرقم الضريبي للعميل,وصف المنتج,الكمية,سعر الوحدة,الخصم,نسبة الضريبة,الإجمالي\n")
+            f.write("INV-1,عميل,123456789,منتج,2,100,0,14,228\n")
+            f.write("INV-1,عميل آخر,123456789,منتج,abc,100,0,14,114\n")
+            f.write("INV-2,عميل,12345,,1,100,0,14,500\n")
+        try:
+            validation = self.excel_service.import_invoices(file_path, "sales")['validation']
+            self.assertEqual(validation['summary'], {
+                'conflicting_duplicate': 1, 'invalid_number': 1, 'invalid_tax_number': 1,
+                'missing_value': 1, 'total_mismatch': 1,
+            })
+            self.assertEqual([error['row'] for error in validation['errors']], [3, 3, 4, 4, 4])
+            logger.info("✅ نجح اختبار جدول أخطاء الصفوف")
+        finally:
+            os.remove(file_path)
+    
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_import_reports_split_invoices_and_keeps_tax_zeros(self):
+        """اختبار الإبلاغ عن رقم فاتورة متكرر في صفوف غير متتالية، وقبول رقم ضريبي يبدأ بصفر"""
+        file_path = os.path.join(PROJECT_ROOT, "tests", "test_sales_split.csv")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("رقم الفاتورة,اسم العميل,الرقم الضريبي للعميل,وصف المنتج,الكمية,سعر الوحدة\n")
+            f.write("INV-1,عميل,012345678,منتج,1,100\n")
+            f.write("INV-2,عميل,012345678,منتج,1,100\n")
+            f.write("INV-1,عميل,012345678,منتج,1,100\n")
+        try:
+            validation = self.excel_service.import_invoices(file_path, "sales")['validation']
+            self.assertEqual(validation['summary'], {'non_contiguous_duplicate': 1})
+            self.assertEqual([(error['row'], error['value']) for error in validation['errors']], [(4, "INV-1")])
+            logger.info("✅ نجح اختبار الفواتير المقسمة على صفوف غير متتالية")
+        finally:
+            os.remove(file_path)
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_import_batch_detects_duplicates(self):
+        """اختبار الاستيراد المتوازي لعدة ملفات واكتشاف الفواتير المكررة بينها"""
+        second_file_path = os.path.join(PROJECT_ROOT, "tests", "test_sales_2.csv")
+        self.excel_service.export_template(second_file_path, "sales")
+        try:
+            report = self.excel_service.import_batch([self.test_file_path, second_file_path], "sales", max_workers=2)
+            self.assertEqual(report['totals']['invoices'], 1)
+            self.assertEqual(report['totals']['duplicates'], 1)
+            self.assertEqual(report['duplicates'][0]['first']['file'], self.test_file_path)
+            logger.info("✅ نجح اختبار الاستيراد المتوازي")
+        finally:
+            os.remove(second_file_path)
+    
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_csv_read_paths_keep_text_columns(self):
+        """اختبار أن كل مسارات قراءة CSV تحفظ الأصفار البادئة في رقم الفاتورة والرقم الضريبي"""
+        import importlib.util
+        from config import settings
+        file_path = os.path.join(PROJECT_ROOT, "tests", "test_sales_text.csv")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("رقم الفاتورة,اسم العميل,الرقم الضريبي للعميل,وصف المنتج,الكمية,سعر الوحدة\n")
+            f.write("0012,عميل,012345678,منتج,1,100\n")
+        original_engine = settings.IMPORT_CSV_ENGINE
+        try:
+            streamed = list(self.excel_service.iter_invoices(file_path, "sales", chunk_rows=1))
+            self.assertEqual([(i['invoice_number'], i['client_tax_number']) for i in streamed], [("0012", "012345678")])
+            for engine in ("pandas", "pyarrow"):
+                if engine == "pyarrow" and importlib.util.find_spec("pyarrow") is None:
+                    continue
+                settings.IMPORT_CSV_ENGINE = engine
+                invoices = self.excel_service.import_invoices(file_path, "sales")['invoices']
+                self.assertEqual([(i['invoice_number'], i['client_tax_number']) for i in invoices], [("0012", "012345678")])
+            logger.info("✅ نجح اختبار الأعمدة النصية في مسارات قراءة CSV")
+        finally:
+            settings.IMPORT_CSV_ENGINE = original_engine
+            os.remove(file_path)
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_iter_invoices_streaming(self):
+        """اختبار الاستيراد المتدفق على دفعات"""
+        try:
+            invoices = list(self.excel_service.iter_invoices(self.test_file_path, "sales", chunk_rows=1))
+            self.assertEqual(len(invoices), 1)
+            self.assertEqual(invoices[0]['source_row'], 2)
+            self.assertTrue(len(invoices[0]['items']) > 0)
+            logger.info("✅ نجح اختبار الاستيراد المتدفق")
+        except Exception as e:
+            logger.error(f"❌ فشل اختبار الاستيراد المتدفق: {str(e)}")
+            self.fail(f"فشل اختبار الاستيراد المتدفق: {str(e)}")
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_iter_invoices_xlsx_counts_blank_rows(self):
+        """اختبار أن الصفوف الفارغة في xlsx تحسب في أرقام السطور ونقطة الاستئناف، وأن الأعمدة النصية تقرأ كنصوص"""
+        import openpyxl
+        file_path = os.path.join(PROJECT_ROOT, "tests", "test_sales_blank_rows.xlsx")
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(["رقم الفاتورة", "اسم العميل", "الرقم الضريبي للعميل", "وصف المنتج", "الكمية", "سعر الوحدة"])
+        sheet.append([1001, "عميل", 123456789, "منتج", 1, 100])
+        sheet.append([None] * 6)
+        sheet.append([1001, "عميل", 123456789, "منتج", 2, 100])
+        sheet.append([None] * 6)
+        sheet.append([1002, "عميل", 123456789, "منتج", "abc", 100])
+        workbook.save(file_path)
+        try:
+            errors = []
+            invoices = list(self.excel_service.iter_invoices(file_path, "sales", chunk_rows=2, errors=errors))
+            self.assertEqual(
+                [(i['invoice_number'], i['client_tax_number'], i['source_row'], i['source_end_row']) for i in invoices],
+                [("1001", "123456789", 2, 4), ("1002", "123456789", 6, 6)],
+            )
+            self.assertEqual([(error['row'], error['code']) for error in errors], [(6, 'invalid_number')])
+
+            # الاستئناف بعد آخر صف للفاتورة الأولى (3 صفوف بيانات بما فيها الصف الفارغ)
+            resumed = list(self.excel_service.iter_invoices(file_path, "sales", chunk_rows=2, start_row=3))
+            self.assertEqual([(i['invoice_number'], i['source_row']) for i in resumed], [("1002", 6)])
+            logger.info("✅ نجح اختبار الصفوف الفارغة في xlsx")
+        finally:
+            os.remove(file_path)
+
 class TestReports(unittest.TestCase):
     """اختبار التقارير"""
     
@@ -224,6 +383,672 @@ class TestSecurity(unittest.TestCase):
             logger.error(f"❌ فشل اختبار إنشاء والتحقق من التوكن: {str(e)}")
             self.fail(f"فشل اختبار إنشاء والتحقق من التوكن: {str(e)}")
 
+class TestUserCache(unittest.TestCase):
+    """اختبار إبطال ذاكرة المستخدمين المؤقتة بعد حفظ التعديلات"""
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def setUp(self):
+        """إنشاء قاعدة بيانات SQLite في الذاكرة بمستخدم واحد"""
+        import security
+        self.security = security
+        self.engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        models.Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.db.add(models.User(email="user@example.com", username="user", hashed_password="x"))
+        self.db.commit()
+        security.user_cache.clear()
+
+    def tearDown(self):
+        """تنظيف بعد الاختبار"""
+        if hasattr(self, "db"):
+            self.db.close()
+            self.engine.dispose()
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_user_cache_invalidated_after_commit(self):
+        """اختبار أن الإبطال يحدث بعد الـ commit فقط، وأن التعديل الجماعي يبطل الذاكرة أيضًا"""
+        user_cache = self.security.user_cache
+        user = self.security.get_cached_user(self.db, "user")
+        user.full_name = "مستخدم"
+        self.db.flush()
+        self.assertIsNotNone(user_cache.get("user"))
+        self.db.commit()
+        self.assertIsNone(user_cache.get("user"))
+
+        self.security.get_cached_user(self.db, "user")
+        self.db.query(models.User).filter(models.User.username == "user").update({"is_active": False})
+        self.db.commit()
+        self.assertIsNone(user_cache.get("user"))
+        self.assertFalse(self.security.get_cached_user(self.db, "user").is_active)
+        logger.info("✅ نجح اختبار إبطال ذاكرة المستخدمين")
+
+class TestQueryPlans(unittest.TestCase):
+    """اختبار استخدام الفهارس في استعلامات الفواتير الأكثر استخدامًا"""
+    
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def setUp(self):
+        """إنشاء قاعدة بيانات SQLite في الذاكرة بنفس مخطط التطبيق"""
+        self.engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        models.Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+    
+    def tearDown(self):
+        """تنظيف بعد الاختبار"""
+        if hasattr(self, "db"):
+            self.db.close()
+            self.engine.dispose()
+    
+    def _query_plan(self, query):
+        """الحصول على خطة تنفيذ SQLite للاستعلام كنص واحد"""
+        compiled = query.statement.compile(dialect=self.engine.dialect)
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        with self.engine.connect() as connection:
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+        return " | ".join(str(row[-1]) for row in rows)
+    
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_user_status_query_uses_composite_index(self):
+        """اختبار استخدام الفهرس المركب (user_id, status) في قائمة الفواتير"""
+        plan = self._query_plan(queries.user_invoices_query(self.db, 1, status="paid").offset(0).limit(10))
+        self.assertIn("ix_invoices_user_status", plan)
+        logger.info("✅ نجح اختبار فهرس المستخدم والحالة")
+    
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_user_date_range_query_uses_composite_index(self):
+        """اختبار استخدام الفهرس المركب (user_id, issue_date) في تصفية الفترة"""
+        query = queries.user_invoices_query(
+            self.db, 1, start_date=datetime(2025, 1, 1), end_date=datetime(2025, 1, 31)
+        )
+        plan = self._query_plan(query)
+        self.assertIn("ix_invoices_user_issue_date", plan)
+        logger.info("✅ نجح اختبار فهرس المستخدم وتاريخ الإصدار")
+    
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_changes_query_uses_updated_at_index(self):
+        """اختبار استخدام الفهرس المركب (user_id, updated_at) في قائمة التغييرات"""
+        plan = self._query_plan(queries.invoice_changes_query(self.db, 1, datetime(2025, 1, 1)))
+        self.assertIn("ix_invoices_user_updated_at", plan)
+        plan = self._query_plan(queries.invoice_changes_query(self.db, 1, datetime(2025, 1, 1), after_id=5))
+        self.assertIn("ix_invoices_user_updated_at", plan)
+        logger.info("✅ نجح اختبار فهرس تغييرات الفواتير")
+    
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_changes_query_pages_through_equal_timestamps(self):
+        """اختبار أن مؤشر (updated_at, id) لا يتخطى الفواتير التي تشترك في نفس وقت التعديل"""
+        changed_at = datetime(2025, 1, 2)
+        for number in ("INV-1", "INV-2", "INV-3"):
+            self.db.add(models.Invoice(invoice_number=number, user_id=1, created_at=changed_at, updated_at=changed_at))
+        self.db.commit()
+
+        seen, since, after_id = [], datetime(2025, 1, 1), None
+        while True:
+            page = queries.invoice_changes_query(self.db, 1, since, after_id, limit=2).all()
+            if not page:
+                break
+            seen.extend(row.invoice_number for row in page)
+            since, after_id = page[-1].updated_at, page[-1].id
+        self.assertEqual(seen, ["INV-1", "INV-2", "INV-3"])
+        logger.info("✅ نجح اختبار ترقيم تغييرات الفواتير")
+    
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_commit_with_retry_reapplies_on_stale_version(self):
+        """اختبار إعادة تطبيق التعديل على أحدث إصدار بدل StaleDataError عند تعديل متزامن"""
+        import database
+        self.db.add(models.Invoice(invoice_number="INV-1", user_id=1))
+        self.db.commit()
+        invoice = self.db.query(models.Invoice).one()
+
+        other = sessionmaker(bind=self.engine)()
+        other.query(models.Invoice).one().status = "paid"
+        other.commit()
+        other.close()
+
+        def apply():
+            invoice.eta_status = "Submitted"
+
+        database.commit_with_retry(self.db, apply)
+        self.db.refresh(invoice)
+        self.assertEqual((invoice.status, invoice.eta_status, invoice.version), ("paid", "Submitted", 3))
+        logger.info("✅ نجح اختبار إعادة المحاولة عند التعديل المتزامن")
+    
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_migrations_keep_search_triggers(self):
+        """اختبار بقاء triggers فهرس البحث بعد الترحيلات التي تعيد إنشاء جدول invoices على SQLite"""
+        import tempfile
+        from alembic import command
+        import database
+        from config import settings
+
+        db_dir = tempfile.mkdtemp(prefix="migrations-")
+        original_url = settings.DATABASE_URL
+        settings.DATABASE_URL = f"sqlite:///{os.path.join(db_dir, 'app.db')}"
+        try:
+            command.upgrade(database._alembic_config(), "heads")
+            engine = create_engine(settings.DATABASE_URL)
+            with engine.begin() as connection:
+                triggers = {row[0] for row in connection.exec_driver_sql(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'invoices'"
+                )}
+                connection.exec_driver_sql("INSERT INTO invoices (invoice_number, client_name, version) VALUES ('INV-1', 'عميل', 1)")
+                matches = connection.exec_driver_sql("SELECT rowid FROM invoices_fts WHERE invoices_fts MATCH '\"INV\"*'").fetchall()
+            engine.dispose()
+            self.assertEqual(triggers, {"invoices_fts_ai", "invoices_fts_ad", "invoices_fts_au"})
+            self.assertEqual(len(matches), 1)
+            logger.info("✅ نجح اختبار triggers فهرس البحث بعد الترحيلات")
+        finally:
+            settings.DATABASE_URL = original_url
+
+class TestRollups(unittest.TestCase):
+    """اختبار تحديث جدول الملخص اليومي مع تعديل الفواتير وحذفها"""
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def setUp(self):
+        """إنشاء قاعدة بيانات SQLite في الذاكرة بنفس مخطط التطبيق"""
+        import rollups  # noqa: F401 - تسجيل أحداث الـ flush
+        self.engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        models.Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        """تنظيف بعد الاختبار"""
+        if hasattr(self, "db"):
+            self.db.close()
+            self.engine.dispose()
+
+    def _rollups(self):
+        """الملخص كقاموس (status, eta_status) -> (العدد، الإجمالي) مع تجاهل الصفوف الصفرية"""
+        rows = self.db.query(models.InvoiceDailyRollup).all()
+        return {(row.status, row.eta_status): (row.invoice_count, row.total_amount) for row in rows if row.invoice_count}
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_rollups_follow_status_changes_and_deletes(self):
+        """اختبار نقل الفاتورة بين مفاتيح الملخص عند تغيير الحالة وطرحها عند الحذف"""
+        invoice = models.Invoice(
+            invoice_number="INV-1", user_id=1, issue_date=datetime(2025, 5, 17), status="pending",
+            amount=100.0, tax_amount=14.0, total_amount=114.0,
+        )
+        self.db.add(invoice)
+        self.db.add(models.Invoice(
+            invoice_number="INV-2", user_id=1, issue_date=datetime(2025, 5, 17), status="pending",
+            amount=10.0, tax_amount=1.4, total_amount=11.4,
+        ))
+        self.db.commit()
+        self.assertEqual(self._rollups(), {("pending", "pending"): (2, 125.4)})
+
+        invoice.status = "paid"
+        invoice.eta_status = "Valid"
+        self.db.commit()
+        self.assertEqual(self._rollups(), {("pending", "pending"): (1, 11.4), ("paid", "Valid"): (1, 114.0)})
+
+        self.db.delete(invoice)
+        self.db.commit()
+        self.assertEqual(self._rollups(), {("pending", "pending"): (1, 11.4)})
+        logger.info("✅ نجح اختبار تحديث الملخص اليومي")
+
+class TestArchive(unittest.TestCase):
+    """اختبار نقل الفواتير القديمة إلى طبقة الأرشيف"""
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def setUp(self):
+        """إنشاء قاعدة بيانات SQLite في الذاكرة وفواتير مؤهلة وغير مؤهلة للأرشفة"""
+        import eta_events
+        from services.archive_service import InvoiceArchiveService
+        self.engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        models.Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        for number, issue_date, status, eta_status in [
+            ("INV-1", datetime(2020, 1, 10), "paid", "Valid"),
+            ("INV-2", datetime(2020, 2, 10), "closed", "Cancelled"),
+            ("INV-3", datetime(2020, 2, 11), "pending", "pending"),
+            ("INV-4", datetime(2024, 12, 1), "paid", "Valid"),
+        ]:
+            invoice = models.Invoice(
+                invoice_number=number, user_id=1, issue_date=issue_date, status=status, eta_status=eta_status,
+                amount=100.0, tax_amount=14.0, total_amount=114.0,
+                items=[models.InvoiceItem(description="منتج", quantity=1, unit_price=100, total=114.0, tax_amount=14.0)],
+            )
+            self.db.add(invoice)
+            self.db.flush()
+            eta_events.record_eta_event(self.db, invoice, "submission", {"submissionId": f"S-{number}"})
+        self.db.commit()
+        self.service = InvoiceArchiveService(self.db)
+
+    def tearDown(self):
+        """تنظيف بعد الاختبار"""
+        if hasattr(self, "db"):
+            self.db.close()
+            self.engine.dispose()
+
+    def _archive(self):
+        return self.service.archive_invoices(retention_days=365, batch_size=1, now=datetime(2025, 1, 1))
+
+    def _partition_counts(self):
+        """عدد الصفوف في كل جدول فترة"""
+        names = [row[0] for row in self.db.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'invoices_archive_p%' ORDER BY name"
+        ))]
+        return {name: self.db.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar() for name in names}
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_archive_moves_invoices_into_monthly_partitions(self):
+        """اختبار نسخ الفواتير المؤهلة إلى قسم شهرها ثم حذفها مع بنودها وأحداثها"""
+        result = self._archive()
+        self.assertEqual(result["archived"], 2)
+        self.assertEqual(self._partition_counts(), {"invoices_archive_p202001": 1, "invoices_archive_p202002": 1})
+
+        remaining = {invoice.invoice_number for invoice in self.db.query(models.Invoice)}
+        self.assertEqual(remaining, {"INV-3", "INV-4"})
+        self.assertEqual(self.db.query(models.InvoiceItem).count(), 2)
+        self.assertEqual(self.db.query(models.EtaEvent).count(), 2)
+        logger.info("✅ نجح اختبار نقل الفواتير إلى أقسام الأرشيف")
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_list_and_get_archived(self):
+        """اختبار البحث في الأرشيف واسترجاع الفاتورة كاملة مع بنودها وردود البوابة"""
+        self._archive()
+        listed = self.service.list_archived(1)
+        self.assertEqual([row["invoice_number"] for row in listed], ["INV-2", "INV-1"])
+        self.assertNotIn("payload", listed[0])
+        self.assertEqual(len(self.service.list_archived(1, invoice_number="INV-1")), 1)
+        self.assertEqual(self.service.list_archived(1, start_date=datetime(2020, 2, 1))[0]["invoice_number"], "INV-2")
+
+        invoice = self.service.get_archived(1, listed[1]["invoice_id"])
+        self.assertEqual(invoice["invoice_number"], "INV-1")
+        self.assertEqual(len(invoice["items"]), 1)
+        self.assertEqual(invoice["eta_events"][0]["payload"], {"submissionId": "S-INV-1"})
+        self.assertIsNone(self.service.get_archived(2, listed[1]["invoice_id"]))
+        logger.info("✅ نجح اختبار البحث في الأرشيف")
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_archive_rerun_is_idempotent(self):
+        """اختبار أن إعادة التشغيل لا تكرر الفواتير المؤرشفة ولا تفشل عليها"""
+        self._archive()
+        self.assertEqual(self._archive()["archived"], 0)
+        self.assertEqual(self._partition_counts(), {"invoices_archive_p202001": 1, "invoices_archive_p202002": 1})
+        logger.info("✅ نجح اختبار إعادة تشغيل الأرشفة")
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_archive_run_is_claimed_once(self):
+        """اختبار أن حجز الأرشفة في قاعدة البيانات يمنع تشغيلين معًا ويسمح بإعادة حجز التشغيل المتوقف"""
+        from config import settings
+        from services.archive_service import ARCHIVE_RUN_ID, claim_archive_run, _finish_archive_run
+        self.assertTrue(claim_archive_run(self.db))
+        self.assertFalse(claim_archive_run(self.db))
+
+        self.service.archive_invoices(retention_days=365, batch_size=1, now=datetime(2025, 1, 1), run_id=ARCHIVE_RUN_ID)
+        run = self.db.get(models.ArchiveRun, ARCHIVE_RUN_ID)
+        self.assertEqual((run.status, run.archived), ("running", 2))
+
+        run.updated_at = datetime.utcnow() - timedelta(seconds=settings.ARCHIVE_RUN_STALE_SECONDS + 1)
+        self.db.commit()
+        self.assertTrue(claim_archive_run(self.db))
+        _finish_archive_run(self.db, "completed")
+        self.assertTrue(claim_archive_run(self.db))
+        logger.info("✅ نجح اختبار حجز تشغيل الأرشفة")
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_archived_numbers_are_not_reused_by_imports(self):
+        """اختبار أن الاستيراد يتخطى أرقام الفواتير المؤرشفة"""
+        from services.import_pipeline import InvoiceImportPipeline
+        self._archive()
+        self.assertEqual(self.service.archived_invoice_numbers(["INV-1", "INV-3", "INV-9"]), {"INV-1"})
+
+        report = InvoiceImportPipeline(self.db, user_id=1).run([
+            {"invoice_number": number, "issue_date": "2025-05-17",
+             "items": [{"item_description": "منتج", "quantity": 1, "unit_price": 10}]}
+            for number in ("INV-1", "INV-9")
+        ])
+        self.assertEqual((report["inserted"], report["skipped"]), (1, 1))
+        self.assertIsNone(self.db.query(models.Invoice).filter_by(invoice_number="INV-1").first())
+        logger.info("✅ نجح اختبار تفرد أرقام الفواتير مع الأرشيف")
+
+class TestImportPipeline(unittest.TestCase):
+    """اختبار حفظ الفواتير المستوردة على دفعات"""
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def setUp(self):
+        """إنشاء قاعدة بيانات SQLite في الذاكرة بنفس مخطط التطبيق"""
+        from services.import_pipeline import InvoiceImportPipeline
+        self.engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        models.Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.pipeline = InvoiceImportPipeline(self.db, user_id=1, batch_size=2)
+
+    def tearDown(self):
+        """تنظيف بعد الاختبار"""
+        if hasattr(self, "db"):
+            self.db.close()
+            self.engine.dispose()
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_run_inserts_and_skips_existing(self):
+        """اختبار حساب الإجماليات وتخطي الأرقام المكررة والموجودة"""
+        invoices = [
+            {"invoice_number": f"INV-{i}", "issue_date": "2025-05-17", "client_name": "عميل",
+             "items": [{"item_description": "منتج", "quantity": 2, "unit_price": 50, "discount": 10, "tax_rate": 14}]}
+            for i in (1, 2, 3, 1)
+        ]
+        report = self.pipeline.run(invoices)
+        self.assertEqual((report["inserted"], report["skipped"], report["items"]), (3, 1, 3))
+
+        invoice = self.db.query(models.Invoice).filter_by(invoice_number="INV-1").one()
+        self.assertEqual((invoice.amount, invoice.tax_amount, invoice.total_amount), (90.0, 12.6, 102.6))
+        rollup = self.db.query(models.InvoiceDailyRollup).one()
+        self.assertEqual(rollup.invoice_count, 3)
+
+        self.assertEqual(self.pipeline.run(invoices[:2])["skipped"], 2)
+        logger.info("✅ نجح اختبار حفظ الفواتير المستوردة")
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_import_job_resumes_from_checkpoint(self):
+        """اختبار استئناف مهمة الاستيراد بعد آخر صف محفوظ دون إعادة قراءة ما قبله"""
+        from services.import_pipeline import create_import_job, run_import_job
+        file_path = os.path.join(PROJECT_ROOT, "tests", "test_import_job.csv")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("رقم الفاتورة,تاريخ الإصدار,اسم العميل,وصف المنتج,الكمية,سعر الوحدة\n")
+            f.write("INV-1,2025-05-17,عميل,منتج,1,100\n" * 2)
+            f.write("INV-2,2025-05-17,عميل,منتج,1,100\n" * 2)
+        try:
+            job = create_import_job(self.db, 1, file_path, "sales")
+            job.last_row = 2  # الفاتورة الأولى محفوظة قبل توقف سابق
+            self.db.commit()
+
+            report = run_import_job(self.db, job.id, chunk_rows=1)
+            self.db.refresh(job)
+            self.assertEqual(report["inserted"], 1)
+            self.assertEqual((job.status, job.last_row, job.invoices_imported), ("completed", 4, 1))
+            self.assertIsNone(self.db.query(models.Invoice).filter_by(invoice_number="INV-1").first())
+            logger.info("✅ نجح اختبار استئناف مهمة الاستيراد")
+        finally:
+            os.remove(file_path)
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_import_job_rejects_purchases(self):
+        """اختبار رفض استيراد فواتير المشتريات حتى لا تحفظ في جدول فواتير المبيعات"""
+        from services.import_pipeline import create_import_job
+        file_path = os.path.join(PROJECT_ROOT, "tests", "test_purchases_job.csv")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("رقم الفاتورة,اسم المورد,وصف المنتج,الكمية,سعر الوحدة\n")
+            f.write("PINV-1,مورد,منتج,1,100\n")
+        try:
+            with self.assertRaises(ValueError):
+                create_import_job(self.db, 1, file_path, "purchases")
+            self.assertEqual(self.db.query(models.ImportJob).count(), 0)
+            logger.info("✅ نجح اختبار رفض استيراد المشتريات")
+        finally:
+            os.remove(file_path)
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_submission_pipeline_batches_new_invoices(self):
+        """اختبار إرسال الفواتير المستوردة الجديدة فقط إلى ETA على دفعات محدودة العدد"""
+        from services.import_pipeline import InvoiceSubmissionPipeline
+
+        class FakeETAService:
+            def __init__(self):
+                self.batches = []
+
+            def prepare_invoice_data(self, data):
+                return {"internalID": data["invoice_number"], "lines": data["items"]}
+
+            def submit_prepared_documents(self, documents):
+                self.batches.append([document["internalID"] for document in documents])
+                return {
+                    "submissionId": f"S-{len(self.batches)}",
+                    "acceptedDocuments": [{"internalId": d["internalID"], "uuid": f"U-{d['internalID']}"}
+                                          for d in documents if d["internalID"] != "INV-3"],
+                    "rejectedDocuments": [{"internalId": "INV-3", "error": {"message": "invalid"}}],
+                }
+
+        self.pipeline.run([{"invoice_number": "INV-1", "issue_date": "2025-05-17", "items": [{"item_description": "منتج", "quantity": 1, "unit_price": 10}]}])
+        eta = FakeETAService()
+        invoices = [
+            {"invoice_number": f"INV-{i}", "issue_date": "2025-05-17",
+             "items": [{"item_description": "منتج", "quantity": 1, "unit_price": 10, "tax_rate": 14}]}
+            for i in (1, 2, 3, 4, 2)
+        ]
+        report = InvoiceSubmissionPipeline(self.db, 1, eta_service=eta, max_documents=2, linger_seconds=5).run(invoices)
+
+        self.assertEqual(eta.batches, [["INV-2"], ["INV-3", "INV-4"]])
+        self.assertEqual((report["inserted"], report["skipped"]), (3, 2))
+        self.assertEqual((report["eta_submitted"], report["eta_failed"]), (2, 1))
+        invoice = self.db.query(models.Invoice).filter_by(invoice_number="INV-4").one()
+        self.assertEqual((invoice.eta_status, invoice.eta_submission_id), ("Submitted", "U-INV-4"))
+        self.assertEqual(self.db.query(models.Invoice).filter_by(invoice_number="INV-3").one().eta_status, "error")
+        logger.info("✅ نجح اختبار إرسال الفواتير المستوردة إلى ETA")
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_submission_pipeline_with_real_eta_documents(self):
+        """اختبار الإرسال بمستندات ETAService.prepare_invoice_data الحقيقية مع استبدال طلبات HTTP فقط"""
+        from unittest import mock
+        from config import settings
+        from services.import_pipeline import InvoiceSubmissionPipeline
+        import services.eta_service as eta_module
+
+        posted = []
+
+        def fake_post(url, **kwargs):
+            response = mock.Mock(status_code=200)
+            if url.endswith("/connect/token"):
+                response.json.return_value = {"access_token": "token", "expires_in": 3600}
+            else:
+                documents = kwargs["json"]["documents"]
+                posted.extend(documents)
+                response.json.return_value = {
+                    "submissionId": "S-1",
+                    "acceptedDocuments": [{"internalId": d["internalID"], "uuid": f"U-{d['internalID']}"} for d in documents],
+                    "rejectedDocuments": [],
+                }
+            return response
+
+        company = {
+            "ETA_CLIENT_ID": "client", "ETA_CLIENT_SECRET": "secret", "COMPANY_TAX_NUMBER": "100200300",
+            "COMPANY_NAME": "الشركة", "COMPANY_ADDRESS": "القاهرة", "COMPANY_BRANCH_ID": "0",
+            "DEFAULT_ACTIVITY_CODE": "4620",
+        }
+        invoices = [
+            {"invoice_number": "INV-1", "issue_date": "2025-05-17", "client_name": "عميل", "client_tax_number": "012345678",
+             "items": [{"item_description": "منتج", "quantity": 2, "unit_price": 50}]},
+        ]
+        with mock.patch.multiple(settings, **company), mock.patch.object(eta_module.requests, "post", side_effect=fake_post):
+            report = InvoiceSubmissionPipeline(self.db, 1, max_documents=10, linger_seconds=0.1).run(invoices)
+
+        self.assertEqual((report["inserted"], report["eta_submitted"], report["eta_failed"]), (1, 1, 0))
+        document = posted[0]
+        self.assertEqual(document["issuer"]["address"]["branchID"], "0")
+        self.assertEqual(document["taxpayerActivityCode"], "4620")
+        self.assertEqual(document["receiver"]["id"], "012345678")
+        self.assertAlmostEqual(document["invoiceLines"][0]["taxableItems"][0]["rate"], 14.0)
+        invoice = self.db.query(models.Invoice).filter_by(invoice_number="INV-1").one()
+        self.assertEqual((invoice.eta_status, invoice.eta_submission_id), ("Submitted", "U-INV-1"))
+        logger.info("✅ نجح اختبار الإرسال بمستندات ETA الحقيقية")
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_resumed_eta_job_sends_invoices_saved_before_a_crash(self):
+        """اختبار أن استئناف مهمة الإرسال بعد توقف العامل بين الحفظ والإرسال يرسل الفواتير المحفوظة"""
+        from unittest import mock
+        from config import settings
+        from services.import_pipeline import create_import_job, run_import_job
+        import services.eta_service as eta_module
+
+        class WorkerDied(BaseException):
+            """توقف العامل (لا يلتقطه أي except Exception)"""
+
+        posted = []
+
+        def fake_post(url, **kwargs):
+            response = mock.Mock(status_code=200)
+            if url.endswith("/connect/token"):
+                response.json.return_value = {"access_token": "token", "expires_in": 3600}
+                return response
+            if not posted:
+                posted.append(None)
+                raise WorkerDied()
+            documents = kwargs["json"]["documents"]
+            posted.extend(document["internalID"] for document in documents)
+            response.json.return_value = {
+                "submissionId": "S-1",
+                "acceptedDocuments": [{"internalId": d["internalID"], "uuid": f"U-{d['internalID']}"} for d in documents],
+                "rejectedDocuments": [],
+            }
+            return response
+
+        file_path = os.path.join(PROJECT_ROOT, "tests", "test_eta_resume.csv")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("رقم الفاتورة,تاريخ الإصدار,اسم العميل,وصف المنتج,الكمية,سعر الوحدة\n")
+            f.write("INV-1,2025-05-17,عميل,منتج,1,100\n")
+            f.write("INV-2,2025-05-17,عميل,منتج,1,100\n")
+        company = {
+            "ETA_CLIENT_ID": "client", "ETA_CLIENT_SECRET": "secret", "COMPANY_TAX_NUMBER": "100200300",
+            "COMPANY_NAME": "الشركة", "COMPANY_ADDRESS": "القاهرة", "ETA_BATCH_LINGER_SECONDS": 0.1,
+        }
+        try:
+            with mock.patch.multiple(settings, **company), mock.patch.object(eta_module.requests, "post", side_effect=fake_post):
+                job = create_import_job(self.db, 1, file_path, "sales", submit_to_eta=True)
+                with self.assertRaises(WorkerDied):
+                    run_import_job(self.db, job.id)
+                self.db.refresh(job)
+                self.assertEqual((job.last_row, job.invoices_imported), (0, 0))
+                # محفوظة ولم ترسل (دفعة واحدة أو دفعتان حسب توقيت القراءة)
+                self.assertGreater(self.db.query(models.Invoice).filter_by(eta_status="pending").count(), 0)
+
+                report = run_import_job(self.db, job.id)
+
+            self.db.refresh(job)
+            self.assertEqual(posted[1:], ["INV-1", "INV-2"])
+            self.assertEqual((report["inserted"], report["eta_submitted"]), (2, 2))
+            self.assertEqual((job.status, job.last_row, job.invoices_imported, job.eta_submitted), ("completed", 2, 2, 2))
+            self.assertEqual(self.db.query(models.Invoice).filter_by(eta_status="Submitted").count(), 2)
+            logger.info("✅ نجح اختبار استئناف مهمة الإرسال إلى ETA بعد توقف العامل")
+        finally:
+            os.remove(file_path)
+
+class TestImportEndpoints(unittest.TestCase):
+    """اختبار نقاط نهاية مهام الاستيراد /imports مع تشغيل المهام في الخلفية"""
+
+    CSV = (
+        "رقم الفاتورة,تاريخ الإصدار,اسم العميل,وصف المنتج,الكمية,سعر الوحدة\n"
+        "INV-1,2025-05-17,عميل,منتج,1,100\n"
+        "INV-2,2025-05-17,عميل,منتج,2,50\n"
+    ).encode("utf-8")
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def setUp(self):
+        """قاعدة بيانات SQLite في ملف مؤقت حتى تعمل مهمة الخلفية باتصال مستقل"""
+        import shutil
+        import tempfile
+        from unittest import mock
+        from fastapi.testclient import TestClient
+        import database
+        import security
+        from config import settings
+        from main import app
+
+        self.tmp_dir = tempfile.mkdtemp(prefix="imports-")
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+        self.upload_dir = os.path.join(self.tmp_dir, "uploads")
+        self.engine = create_engine(
+            f"sqlite:///{os.path.join(self.tmp_dir, 'app.db')}",
+            connect_args={"check_same_thread": False},
+        )
+        self.addCleanup(self.engine.dispose)
+        models.Base.metadata.create_all(bind=self.engine)
+        session_factory = sessionmaker(bind=self.engine)
+        self.db = session_factory()
+        self.addCleanup(self.db.close)
+        user = models.User(username="importer", email="importer@example.com", is_active=True)
+        self.db.add(user)
+        self.db.commit()
+
+        for patcher in (
+            mock.patch.object(database, "SessionLocal", session_factory),
+            mock.patch.object(settings, "IMPORT_UPLOAD_DIR", self.upload_dir),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        app.dependency_overrides[security.get_current_active_user] = lambda: user
+        self.addCleanup(app.dependency_overrides.clear)
+        self.client = TestClient(app)
+
+    def _upload(self, file_type="sales"):
+        return self.client.post(
+            "/imports/",
+            data={"file_type": file_type},
+            files={"file": ("invoices.csv", self.CSV, "text/csv")},
+        )
+
+    def _wait_for(self, job_id, timeout=10.0):
+        """انتظار انتهاء مهمة الخلفية"""
+        import time
+        deadline = time.time() + timeout
+        while True:
+            job = self.client.get(f"/imports/{job_id}").json()
+            if job["status"] in ("completed", "failed") or time.time() > deadline:
+                return job
+            time.sleep(0.05)
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_create_import_runs_job_and_removes_upload(self):
+        """اختبار رفع ملف وتشغيل مهمته في الخلفية ثم حذف الملف المرفوع عند اكتمالها"""
+        response = self._upload()
+        self.assertEqual(response.status_code, 202)
+        job = self._wait_for(response.json()["id"])
+        self.assertEqual((job["status"], job["invoices_imported"], job["rows_processed"]), ("completed", 2, 2))
+        self.assertEqual(os.listdir(self.upload_dir), [])
+        self.assertEqual(self.db.query(models.Invoice).count(), 2)
+        logger.info("✅ نجح اختبار إنشاء مهمة استيراد")
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_create_import_rejects_purchases(self):
+        """اختبار رفض ملفات المشتريات قبل حفظها"""
+        self.assertEqual(self._upload("purchases").status_code, 400)
+        self.assertEqual(self.db.query(models.ImportJob).count(), 0)
+        logger.info("✅ نجح اختبار رفض رفع ملف مشتريات")
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_read_import_not_found(self):
+        """اختبار مهمة غير موجودة"""
+        self.assertEqual(self.client.get("/imports/999").status_code, 404)
+        self.assertEqual(self.client.post("/imports/999/resume").status_code, 404)
+        logger.info("✅ نجح اختبار مهمة استيراد غير موجودة")
+
+    @unittest.skipIf(not DB_MODULES_IMPORTED, "لم يتم استيراد وحدات قاعدة البيانات")
+    def test_resume_import_claims_job_once(self):
+        """اختبار أن الاستئناف لا يشغل مهمة تعمل بالفعل، ويستأنف المهمة المتوقفة"""
+        from services.import_pipeline import save_upload, create_import_job
+        import io
+        file_path, file_hash, _ = save_upload(io.BytesIO(self.CSV), "invoices.csv")
+        job = create_import_job(self.db, 1, file_path, "sales", file_hash=file_hash)
+        job.status = "running"
+        self.db.commit()
+        self.assertEqual(self.client.post(f"/imports/{job.id}/resume").status_code, 409)
+
+        job.status = "failed"
+        self.db.commit()
+        self.assertEqual(self.client.post(f"/imports/{job.id}/resume").status_code, 202)
+        self.assertEqual(self._wait_for(job.id)["status"], "completed")
+        self.assertEqual(self.client.post(f"/imports/{job.id}/resume").status_code, 409)
+        logger.info("✅ نجح اختبار استئناف مهمة الاستيراد عبر API")
+
 class TestAPIEndpoints(unittest.TestCase):
     """اختبار نقاط نهاية API"""
     
@@ -321,8 +1146,15 @@ def run_tests():
     
     test_suite.addTest(test_loader.loadTestsFromTestCase(TestETAIntegration))
     test_suite.addTest(test_loader.loadTestsFromTestCase(TestExcelImport))
+    test_suite.addTest(test_loader.loadTestsFromTestCase(TestImportStreaming))
     test_suite.addTest(test_loader.loadTestsFromTestCase(TestReports))
     test_suite.addTest(test_loader.loadTestsFromTestCase(TestSecurity))
+    test_suite.addTest(test_loader.loadTestsFromTestCase(TestUserCache))
+    test_suite.addTest(test_loader.loadTestsFromTestCase(TestQueryPlans))
+    test_suite.addTest(test_loader.loadTestsFromTestCase(TestRollups))
+    test_suite.addTest(test_loader.loadTestsFromTestCase(TestArchive))
+    test_suite.addTest(test_loader.loadTestsFromTestCase(TestImportPipeline))
+    test_suite.addTest(test_loader.loadTestsFromTestCase(TestImportEndpoints))
     test_suite.addTest(test_loader.loadTestsFromTestCase(TestAPIEndpoints))
     test_suite.addTest(test_loader.loadTestsFromTestCase(TestFrontendComponents))
     